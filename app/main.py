@@ -6,6 +6,7 @@ from PyQt5.QtWidgets import QApplication
 
 from app.models.database import EmployeeDatabase
 from app.models.score_database import ScoreDatabase
+from app.utils import profiler
 from app.views.main_window import MainWindow
 
 
@@ -23,10 +24,9 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-def main():
-    """应用入口"""
-    # 创建应用
-    app = QApplication(sys.argv)
+def create_application(argv=None):
+    """创建应用并设置名称、图标和样式表"""
+    app = QApplication(sys.argv if argv is None else argv)
 
     # 应用名称
     app.setApplicationName("员工管理系统")
@@ -44,19 +44,35 @@ def main():
                 app.setStyleSheet(f.read())
     except Exception as e:
         print(f"加载样式表失败: {e}")
+    return app
 
+
+def create_main_window(db_path="employee_db.sqlite"):
+    """连接数据库并创建主窗口，默认显示员工管理页面"""
     # 连接数据库
-    db = EmployeeDatabase("employee_db.sqlite")
-    score_db = ScoreDatabase("employee_db.sqlite")
+    with profiler.span("连接数据库"):
+        db = EmployeeDatabase(db_path)
+        score_db = ScoreDatabase(db_path)
 
-    # 创建并显示主窗口
-    window = MainWindow(db, score_db)
+    # 创建主窗口
+    with profiler.span("创建主窗口"):
+        window = MainWindow(db, score_db)
 
     # 设置默认显示员工管理页面，导航栏也选中员工管理项
     window.navigationInterface.setCurrentItem('employees')
     window.stackedWidget.setCurrentWidget(window.employee_list_view)
+    return window
+
+
+def main():
+    """应用入口"""
+    with profiler.span("启动"):
+        # 创建应用
+        app = create_application()
 
-    window.show()
+        # 创建并显示主窗口
+        window = create_main_window()
+        window.show()
 
     # 运行应用
     sys.exit(app.exec_())
@@ -0,0 +1,157 @@
+import json
+
+from app.models.grades import legacy_grade_years
+
+# 汇总表结构或触发器逻辑变化时加一，连接时会重建触发器和汇总数据
+AGGREGATES_VERSION = 3
+
+# 汇总触发器的名称前缀，重建时按前缀删除
+_TRIGGER_PREFIX = 'trg_stats_'
+
+_TABLES = [
+    # 各部门人数（部门为空时记为''）
+    '''
+    CREATE TABLE IF NOT EXISTS stats_department_headcount (
+        department TEXT PRIMARY KEY,
+        headcount INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    # 职级历史表中各年各职级人数（员工表的年份列与职级历史表同步，不再单独统计）
+    '''
+    CREATE TABLE IF NOT EXISTS stats_grade_history (
+        year INTEGER NOT NULL,
+        grade TEXT NOT NULL,
+        headcount INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (year, grade)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''',
+]
+
+
+def _existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _bump(table, keys, values, delta, condition):
+    """生成按分组键增减人数的语句，condition 不成立时不修改"""
+    return f"""
+        INSERT INTO {table} ({', '.join(keys)}, headcount)
+        SELECT {', '.join(values)}, {delta} WHERE {condition}
+        ON CONFLICT({', '.join(keys)}) DO UPDATE SET headcount = headcount + excluded.headcount;"""
+
+
+def _employee_statements(row, delta):
+    return [_bump(
+        'stats_department_headcount', ['department'],
+        [f"COALESCE({row}.department, '')"], delta, '1'
+    )]
+
+
+def _grade_history_statements(row, delta):
+    return [_bump(
+        'stats_grade_history', ['year', 'grade'],
+        [f"{row}.year", f"{row}.grade"], delta, f"COALESCE({row}.grade, '') != ''"
+    )]
+
+
+def _create_triggers(conn, table, statements, update_columns):
+    """为表创建插入、删除和更新时维护汇总表的触发器"""
+    name = f"{_TRIGGER_PREFIX}{table}"
+    conn.execute(f"""
+    CREATE TRIGGER {name}_insert AFTER INSERT ON {table} BEGIN{''.join(statements('NEW', 1))}
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER {name}_delete AFTER DELETE ON {table} BEGIN{''.join(statements('OLD', -1))}
+    END""")
+    # 只在参与汇总的列变化时触发，修改备注等其他列不产生额外开销
+    conn.execute(f"""
+    CREATE TRIGGER {name}_update AFTER UPDATE OF {', '.join(update_columns)} ON {table} BEGIN{''.join(statements('OLD', -1) + statements('NEW', 1))}
+    END""")
+
+
+def rebuild_aggregates(conn):
+    """按当前数据重新计算全部汇总表（不提交）"""
+    tables = _existing_tables(conn)
+    for table in ('stats_department_headcount', 'stats_grade_history'):
+        conn.execute(f"DELETE FROM {table}")
+
+    if 'employees' in tables:
+        conn.execute("""
+        INSERT INTO stats_department_headcount (department, headcount)
+        SELECT COALESCE(department, ''), COUNT(*) FROM employees GROUP BY 1
+        """)
+
+    if 'employee_grades' in tables:
+        conn.execute("""
+        INSERT INTO stats_grade_history (year, grade, headcount)
+        SELECT year, grade, COUNT(*) FROM employee_grades
+        WHERE COALESCE(grade, '') != '' GROUP BY year, grade
+        """)
+
+
+def ensure_aggregates(conn):
+    """确保汇总表和维护它们的触发器存在
+
+    相关表是否存在或汇总逻辑版本变化时，
+    重建触发器并全量重新计算一次；其余情况下只做一次元数据查询。
+    """
+    for sql in _TABLES:
+        conn.execute(sql)
+
+    tables = _existing_tables(conn)
+    signature = json.dumps({
+        'version': AGGREGATES_VERSION,
+        'tables': sorted(tables & {'employees', 'employee_grades'}),
+    }, sort_keys=True)
+
+    row = conn.execute("SELECT value FROM stats_meta WHERE key = 'signature'").fetchone()
+    if row and row[0] == signature:
+        return False
+
+    triggers = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?", (f"{_TRIGGER_PREFIX}%",)
+    )]
+    for name in triggers:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    # 版本1按员工表年份列统计的职级分布表；版本2的预测职级晋升人数表没有界面读取，不再维护
+    for table in ('stats_grade_distribution', 'stats_promotion_counts', 'stats_grade_levels'):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+    if 'employees' in tables:
+        _create_triggers(conn, 'employees', _employee_statements, ['department'])
+    if 'employee_grades' in tables:
+        _create_triggers(conn, 'employee_grades', _grade_history_statements, ['year', 'grade'])
+
+    rebuild_aggregates(conn)
+    conn.execute(
+        "INSERT OR REPLACE INTO stats_meta (key, value) VALUES ('signature', ?)", (signature,)
+    )
+    conn.commit()
+    return True
+
+
+def read_statistics(conn):
+    """从汇总表读取统计数据，查询量只与分组数有关，与员工人数无关"""
+    stats = {}
+
+    departments = conn.execute(
+        "SELECT department, headcount FROM stats_department_headcount WHERE headcount > 0"
+    ).fetchall()
+    stats['total_employees'] = sum(count for _, count in departments)
+    stats['department_distribution'] = {department: count for department, count in departments}
+
+    # grade_distribution 沿用按员工表列名分组的格式，员工表没有对应列的年份也包括在内
+    stats['grade_distribution'] = {f'grade_{year}': {} for year in legacy_grade_years(conn)}
+    stats['grade_history_distribution'] = {}
+    for year, grade, count in conn.execute(
+        "SELECT year, grade, headcount FROM stats_grade_history WHERE headcount > 0 ORDER BY year"
+    ):
+        stats['grade_history_distribution'].setdefault(year, {})[grade] = count
+        stats['grade_distribution'].setdefault(f'grade_{year}', {})[grade] = count
+    return stats
@@ -0,0 +1,115 @@
+import datetime
+import sqlite3
+import time
+
+from app.models.data_events import INSERT
+
+# 日志与数据修改在同一事务中提交，两者要么都保存，要么都不保存（默认）。
+# 默认采用它是为了日志与数据一致，而不是为了速度：连接使用 WAL + synchronous=NORMAL，
+# 提交时不等待磁盘同步，省下的一次提交几乎没有收益。benchmark.py audit 实测此模式
+# 约4.8k次编辑/秒，略慢于数据和日志分开提交的约5.1k次/秒；synchronous=FULL 时
+# 才明显更快（约3.9k对2.7k次/秒）。需要吞吐量时使用批量模式（约6.5k次/秒）。
+DURABILITY_TRANSACTION = 'transaction'
+
+# 日志先缓存在内存中，所属的修改提交后才进入待写入队列，攒够一批或超过时间间隔后
+# 在修改提交之后用单独的事务写入；修改回滚时丢弃它的日志，不影响已缓存的其他日志。
+# 程序异常退出时可能丢失尚未写入的日志
+DURABILITY_BATCH = 'batch'
+
+DURABILITY_MODES = (DURABILITY_TRANSACTION, DURABILITY_BATCH)
+
+
+class AuditLogWriter:
+    """操作日志写入器
+
+    record() 只执行INSERT而不提交，由调用方在数据修改完成后统一提交，
+    这样一次编辑只需要一次提交。批量模式下 record() 只缓存日志，
+    由 ConnectionManager 在提交或回滚后调用 committed() / rolled_back()。
+    """
+
+    def __init__(self, manager, mode=DURABILITY_TRANSACTION, batch_size=100, flush_interval=5.0):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # 所属修改尚未提交的日志
+        self._uncommitted = []
+        # 所属修改已提交、等待写入的日志
+        self._buffer = []
+        self._first_buffered_at = None
+        self.mode = None
+        self.set_mode(mode)
+
+    def set_mode(self, mode, batch_size=None, flush_interval=None):
+        """设置持久化模式，切换前先写入已缓存的日志"""
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"不支持的日志持久化模式: {mode}")
+
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if self.mode is not None and mode != self.mode:
+            self.flush()
+        self.mode = mode
+
+    def record(self, user, operation, details):
+        """记录一条操作日志（不提交）"""
+        entry = (user, operation, details, datetime.datetime.now())
+        if self.mode == DURABILITY_TRANSACTION:
+            self._write([entry])
+            self.manager.record_change('operation_logs', None, INSERT)
+            return
+
+        self._uncommitted.append(entry)
+
+    def committed(self):
+        """所属修改已提交：日志进入待写入队列，攒够一批或超过时间间隔后写入"""
+        if not self._uncommitted:
+            return
+
+        if not self._buffer:
+            self._first_buffered_at = time.monotonic()
+        self._buffer.extend(self._uncommitted)
+        self._uncommitted = []
+        if (len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._first_buffered_at >= self.flush_interval):
+            self._write_buffer()
+
+    def rolled_back(self):
+        """所属修改已回滚：丢弃它的日志"""
+        self._uncommitted = []
+
+    def flush(self):
+        """写入并提交所有已提交修改的日志
+
+        处于未结束的事务中时不写入，以免提交其中尚未完成的修改；
+        缓存的日志留到下次 flush() 或达到批量阈值时写入。
+        """
+        if self._buffer and not self.manager.in_transaction and not self.manager.conn.in_transaction:
+            self._write_buffer()
+
+    @property
+    def pending_count(self):
+        """尚未写入数据库的日志条数"""
+        return len(self._uncommitted) + len(self._buffer)
+
+    def _write_buffer(self):
+        """在单独的事务中写入缓存的日志，失败时保留缓存下次重试"""
+        entries = self._buffer
+        try:
+            self._write(entries)
+            self.manager.conn.commit()
+        except sqlite3.Error as e:
+            self.manager.conn.rollback()
+            print(f"写入操作日志失败: {e}")
+            return
+
+        self._buffer = []
+        self._first_buffered_at = None
+        self.manager.record_change('operation_logs', None, INSERT)
+
+    def _write(self, entries):
+        self.manager.conn.executemany('''
+        INSERT INTO operation_logs (user, operation, details, timestamp)
+        VALUES (?, ?, ?, ?)
+        ''', entries)
@@ -0,0 +1,132 @@
+import numpy as np
+
+from .queries import QUERIES
+
+# AUT职级评定：一次取出某年全部技能评分，用NumPy按门槛同时计算所有员工的职级，
+# 再用一条批量UPDATE写回技能评分表、一条 INSERT ... SELECT 写入职级历史表。
+
+# 职级从高到低
+GRADE_ORDER = ['G4B', 'G4A', 'G3', 'G2', 'G1']
+
+# 不满足任何门槛时的职级
+LOWEST_GRADE = 'G1'
+
+# 技能评分表中参与评定的分数列，与阈值表的最低分列一一对应
+SCORE_COLUMNS = [
+    'basic_knowledge_score', 'position_skill_score', 'cross_department_score',
+    'technician_skill_score', 'management_skill_score', 'total_score',
+]
+THRESHOLD_COLUMNS = [
+    'basic_knowledge_min', 'position_skill_min', 'cross_department_min',
+    'technician_skill_min', 'management_skill_min', 'total_min',
+]
+
+# skill_thresholds 表中没有该年份阈值时使用的默认阈值，顺序与 THRESHOLD_COLUMNS 一致
+DEFAULT_THRESHOLDS = [
+    ('G4B', 100, 183.6, 0, 0, 100, 102),
+    ('G4A', 100, 163.2, 0, 100, 0, 94),
+    ('G3', 100, 102, 0, 0, 0, 60),
+    ('G2', 100, 61.2, 0, 0, 0, 44),
+    ('G1', 100, 0, 0, 0, 0, 20),
+]
+
+# 除总分、基础知识和岗位技能外，各职级还要求的分数列
+_EXTRA_REQUIREMENTS = {
+    'G4B': 'management_skill',
+    'G4A': 'technician_skill',
+    'G3': None,
+    'G2': None,
+    'G1': None,
+}
+
+# 按岗位技能系数和制度要求比例评定的门槛（AUT成绩录入界面使用）：
+# (职级, 岗位技能系数下限%, 制度要求比例下限%, 制度要求比例上限%)，从高到低依次判断
+COEFFICIENT_RULES = [
+    ('G4B', 90, 0, 5),
+    ('G4A', 80, 10, 20),
+    ('G3', 50, 40, 50),
+    ('G2', 30, 20, 40),
+]
+
+
+def grade_by_coefficient(skill_coefficient, requirement_ratio):
+    """根据岗位技能系数和制度要求比例确定职级
+
+    参数可以是单个数值或数组：传入数值时返回职级字符串，传入数组时返回职级数组。
+    """
+    coefficient = np.asarray(skill_coefficient, dtype=float)
+    ratio = np.asarray(requirement_ratio, dtype=float)
+    conditions = [
+        (coefficient >= coefficient_min) & (ratio >= ratio_min) & (ratio <= ratio_max)
+        for _, coefficient_min, ratio_min, ratio_max in COEFFICIENT_RULES
+    ]
+    grades = np.select(conditions, [rule[0] for rule in COEFFICIENT_RULES], default=LOWEST_GRADE)
+    return str(grades) if grades.ndim == 0 else grades
+
+
+def grade_by_thresholds(scores, thresholds):
+    """根据职级阈值计算所有员工的职级
+
+    scores: {分数列名: 数组}，列名见 SCORE_COLUMNS，空值按0处理
+    thresholds: [(职级, 各项最低分...)]，最低分顺序与 THRESHOLD_COLUMNS 一致
+    返回职级数组。按总分门槛从高到低判断，员工取满足的第一个职级，都不满足时为 LOWEST_GRADE。
+    """
+    scores = {name: np.nan_to_num(np.asarray(values, dtype=float)) for name, values in scores.items()}
+    conditions = []
+    grades = []
+    for threshold in sorted(thresholds, key=lambda row: row[-1] or 0, reverse=True):
+        grade = threshold[0]
+        if grade not in _EXTRA_REQUIREMENTS:
+            continue
+        minimums = dict(zip(THRESHOLD_COLUMNS, (value or 0 for value in threshold[1:])))
+        mask = (
+            (scores['total_score'] >= minimums['total_min'])
+            & (scores['basic_knowledge_score'] >= minimums['basic_knowledge_min'])
+            & (scores['position_skill_score'] >= minimums['position_skill_min'])
+        )
+        extra = _EXTRA_REQUIREMENTS[grade]
+        if extra:
+            mask &= scores[f'{extra}_score'] >= minimums[f'{extra}_min']
+        conditions.append(mask)
+        grades.append(grade)
+    if not conditions:
+        return np.full(len(scores['total_score']), LOWEST_GRADE)
+    return np.select(conditions, grades, default=LOWEST_GRADE)
+
+
+def load_thresholds(conn, year):
+    """某年份的职级阈值，没有时返回 DEFAULT_THRESHOLDS"""
+    rows = conn.execute(QUERIES['skill_thresholds.by_year'], (year,)).fetchall()
+    return [tuple(row) for row in rows] or DEFAULT_THRESHOLDS
+
+
+def load_skill_scores(conn, year):
+    """某年份的全部技能评分，返回 (记录ID数组, {分数列名: 数组})"""
+    rows = conn.execute(QUERIES['skill_scores.grading_by_year'], (year,)).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), {name: np.empty(0) for name in SCORE_COLUMNS}
+    matrix = np.array(rows, dtype=float)
+    ids = matrix[:, 0].astype(np.int64)
+    return ids, {name: matrix[:, index + 1] for index, name in enumerate(SCORE_COLUMNS)}
+
+
+def evaluate_year(conn, year, comment='AUT职级评定'):
+    """计算某年份所有员工的评定职级，写回技能评分表和职级历史表（不提交）
+
+    总分不大于0的记录不参与评定。返回 {职级: 人数}。
+    """
+    ids, scores = load_skill_scores(conn, year)
+    evaluated = scores['total_score'] > 0
+    ids = ids[evaluated]
+    if not len(ids):
+        return {}
+    grades = grade_by_thresholds({name: values[evaluated] for name, values in scores.items()},
+                                 load_thresholds(conn, year))
+
+    grade_list = grades.tolist()
+    conn.executemany(QUERIES['skill_scores.set_grade'], zip(grade_list, ids.tolist(), grade_list))
+    # 员工表中对应年份的职级字段由触发器同步
+    conn.execute(QUERIES['employee_grades.upsert_from_skill_scores'], (comment, year))
+
+    names, counts = np.unique(grades, return_counts=True)
+    return dict(zip(names.tolist(), counts.tolist()))
@@ -0,0 +1,313 @@
+import numbers
+
+import pandas as pd
+
+# AUT部门.csv技能评分导入：import_aut.py 脚本和技能评分界面（经 min_database）共用。
+# 文件按块流式读取，每块的员工、技能评分和技能明细分别用 executemany 批量写入，
+# 写入不提交，由调用方与操作日志一起提交。
+
+# 技能代码行中出现的标记，用于定位技能代码行
+SKILL_CODE_MARKERS = ('C01', 'RUB', 'USB', 'AQR')
+
+# 各项评分在行尾的默认位置
+AUT_SCORE_COLUMNS = {
+    'basic_knowledge_score': -7,
+    'position_skill_score': -6,
+    'cross_department_score': -5,
+    'technician_skill_score': -4,
+    'management_skill_score': -3,
+    'total_score': -2
+}
+
+
+def sniff_encoding(file_path, sample_size=64 * 1024):
+    """根据文件开头的字节判断编码，避免用不同编码反复读取整个文件"""
+    with open(file_path, 'rb') as f:
+        prefix = f.read(sample_size)
+
+    for encoding in ('utf-8', 'gb18030'):
+        try:
+            prefix.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # 样本末尾截断了多字节字符时不算解码失败
+            if len(prefix) == sample_size and len(prefix) - e.start < 4:
+                return encoding
+    return 'latin1'
+
+
+def _count_lines(file_path, block_size=1024 * 1024):
+    """快速统计文件行数，用于估算导入进度"""
+    count = 0
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            count += block.count(b'\n')
+    return count
+
+
+def _iter_chunks(file_path, chunk_size):
+    """按块读取导入文件，CSV以流式方式读取"""
+    if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
+        df = pd.read_excel(file_path, engine='openpyxl')
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        yield from pd.read_csv(file_path, encoding=sniff_encoding(file_path), chunksize=chunk_size)
+
+
+def _is_number_cell(value):
+    """判断单元格是否为数字（数据行第一列为序号）"""
+    return pd.notna(value) and (isinstance(value, numbers.Number) or
+                                (isinstance(value, str) and value.isdigit()))
+
+
+def _find_skill_codes(header):
+    """在数据起始行之前的表头区域中查找技能代码行"""
+    for i in range(len(header)):
+        row_values = header.iloc[i].astype(str).values
+        if any(marker in row_values for marker in SKILL_CODE_MARKERS):
+            print(f"找到技能代码行: {header.index[i]}")
+            return tuple(header.iloc[i])
+    return None
+
+
+def _skill_type(column):
+    """根据技能所在列确定技能类型"""
+    if column < 13:
+        return "基础知识"
+    elif column < 45:
+        return "岗位技能"
+    elif column < 48:
+        return "跨部门技能"
+    elif column < 50:
+        return "技师技能"
+    return "一线管理技能"
+
+
+def _extract_aut_scores(values):
+    """从一行数据中提取各项评分 - AUT部门.csv中通常在最后几列"""
+    scores = {}
+    for field, idx in AUT_SCORE_COLUMNS.items():
+        try:
+            value = values[idx]
+            if pd.notna(value):
+                # 处理可能的格式问题，比如有空格的字符串
+                if isinstance(value, str):
+                    value = value.strip()
+                scores[field] = float(value)
+            else:
+                scores[field] = 0
+        except (ValueError, IndexError, TypeError):
+            scores[field] = 0
+
+    # 验证是否提取到合理的分数
+    total_score_idx = AUT_SCORE_COLUMNS['total_score']
+    if scores['total_score'] <= 0 or scores['total_score'] > 200:
+        # 重新尝试找总分，通常是一个较大的数（如70-200）
+        for i in range(-10, 0):
+            try:
+                value = values[i]
+                if pd.notna(value):
+                    val = float(str(value).strip())
+                    if 20 <= val <= 200:
+                        scores['total_score'] = val
+                        total_score_idx = i
+                        break
+            except (ValueError, IndexError):
+                continue
+
+    # 如果已找到总分，尝试向前寻找其他分数
+    if scores['total_score'] > 0:
+        # 基础知识分数通常是一个接近90的值
+        for i in range(total_score_idx - 5, total_score_idx):
+            try:
+                value = values[i]
+                if pd.notna(value):
+                    val = float(str(value).strip())
+                    if 70 <= val <= 100:
+                        scores['basic_knowledge_score'] = val
+                        break
+            except (ValueError, IndexError):
+                continue
+
+    return scores
+
+
+def _extract_skill_details(values, skill_codes):
+    """提取技能明细分数，返回(技能代码, 技能名称, 技能类型, 分数)列表"""
+    details = []
+    # 跳过序号、工号、姓名和总分列
+    for i in range(3, min(len(values) - 7, len(skill_codes))):
+        skill_value = values[i]
+        if pd.isna(skill_value) or skill_value == '':
+            continue
+        try:
+            skill_score = int(skill_value)
+        except (ValueError, TypeError) as e:
+            print(f"添加技能{i}失败: {e}")
+            continue
+        skill_code = str(skill_codes[i]).strip() if pd.notna(skill_codes[i]) else f"技能{i}"
+        details.append((skill_code, skill_code, _skill_type(i), skill_score))
+    return details
+
+
+def _import_aut_rows(cursor, rows, year, skill_codes, employee_ids):
+    """把一批数据行写入技能评分表（不提交），返回写入的员工数"""
+    records = {}
+    new_employees = {}
+
+    for values in rows.itertuples(index=False, name=None):
+        # 检查员工号是否存在
+        if len(values) < 2 or pd.isna(values[1]) or str(values[1]).strip() == "":
+            continue
+
+        # 获取员工号
+        try:
+            employee_no = str(int(values[1]))
+        except (ValueError, TypeError):
+            employee_no = str(values[1]).strip()
+
+        if not employee_no:
+            continue
+
+        if employee_no not in employee_ids and employee_no not in new_employees:
+            print(f"未找到工号为{employee_no}的员工，尝试创建...")
+            new_employees[employee_no] = str(values[2]) if len(values) > 2 and pd.notna(values[2]) else "未知"
+
+        details = _extract_skill_details(values, skill_codes) if skill_codes is not None else []
+        # 同一员工在文件中出现多次时以最后一行为准
+        records[employee_no] = (_extract_aut_scores(values), details)
+
+    # 批量创建不存在的员工，并补充工号到ID的映射
+    if new_employees:
+        cursor.executemany("""
+        INSERT INTO employees
+        (employee_no, name, department, status)
+        VALUES (?, ?, ?, ?)
+        """, [(employee_no, name, "AUT", "在职") for employee_no, name in new_employees.items()])
+        placeholders = ', '.join(['?'] * len(new_employees))
+        cursor.execute(f"SELECT employee_no, id FROM employees WHERE employee_no IN ({placeholders})",
+                       list(new_employees))
+        employee_ids.update((str(employee_no), employee_id) for employee_no, employee_id in cursor.fetchall())
+
+    records = {employee_ids[employee_no]: record for employee_no, record in records.items()
+               if employee_no in employee_ids}
+    if not records:
+        return 0
+
+    # 插入或更新技能评分记录
+    cursor.executemany("""
+    INSERT INTO skill_scores
+    (employee_id, year, basic_knowledge_score, position_skill_score,
+    cross_department_score, technician_skill_score, management_skill_score,
+    total_score, evaluated_grade)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(employee_id, year)
+    DO UPDATE SET
+        basic_knowledge_score = excluded.basic_knowledge_score,
+        position_skill_score = excluded.position_skill_score,
+        cross_department_score = excluded.cross_department_score,
+        technician_skill_score = excluded.technician_skill_score,
+        management_skill_score = excluded.management_skill_score,
+        total_score = excluded.total_score,
+        evaluated_grade = excluded.evaluated_grade,
+        updated_at = CURRENT_TIMESTAMP
+    """, [
+        (employee_id, year, scores['basic_knowledge_score'], scores['position_skill_score'],
+         scores['cross_department_score'], scores['technician_skill_score'],
+         scores['management_skill_score'], scores['total_score'], 'G1')  # 暂时使用G1
+        for employee_id, (scores, _) in records.items()
+    ])
+
+    # 获取skill_score_id
+    placeholders = ', '.join(['?'] * len(records))
+    cursor.execute(f"""
+    SELECT employee_id, id FROM skill_scores
+    WHERE year = ? AND employee_id IN ({placeholders})
+    """, [year, *records])
+    skill_score_ids = dict(cursor.fetchall())
+
+    # 先用一条语句清除这批员工旧的技能明细分数，再批量写入新的
+    placeholders = ', '.join(['?'] * len(skill_score_ids))
+    cursor.execute(f"DELETE FROM skill_detail_scores WHERE skill_score_id IN ({placeholders})",
+                   list(skill_score_ids.values()))
+    cursor.executemany("""
+    INSERT INTO skill_detail_scores
+    (skill_score_id, skill_code, skill_name, skill_type, skill_score)
+    VALUES (?, ?, ?, ?, ?)
+    """, [
+        (skill_score_ids[employee_id], *detail)
+        for employee_id, (_, details) in records.items()
+        for detail in details
+    ])
+
+    return len(records)
+
+
+def import_department_scores(conn, file_path, year, chunk_size=500, progress=None):
+    """导入AUT部门.csv的技能评分数据（不提交），返回添加或更新的员工数
+
+    CSV只嗅探一次编码并按块流式读取，工号到员工ID的映射一次性预加载。
+    progress(已处理行数, 估计总行数)用于显示进度，可以抛出异常中止导入。
+    """
+    if not file_path.endswith(('.xlsx', '.xls', '.csv')):
+        raise ValueError(f"不支持的文件格式: {file_path}")
+
+    cursor = conn.cursor()
+    total_rows = _count_lines(file_path) if file_path.endswith('.csv') else 0
+
+    # 预加载工号到员工ID的映射
+    cursor.execute("SELECT employee_no, id FROM employees")
+    employee_ids = {str(employee_no): employee_id for employee_no, employee_id in cursor.fetchall()}
+
+    count_added = 0
+    processed_rows = 0
+    header_chunks = []
+    skill_codes = None
+    data_started = False
+
+    def report_progress():
+        if progress:
+            progress(processed_rows, max(total_rows, processed_rows))
+
+    for chunk in _iter_chunks(file_path, chunk_size):
+        processed_rows += len(chunk)
+
+        if data_started:
+            count_added += _import_aut_rows(cursor, chunk, year, skill_codes, employee_ids)
+            report_progress()
+            continue
+
+        # 查找数据起始行：第一列含有数字的第一行
+        header_chunks.append(chunk)
+        number_rows = chunk.iloc[:, 0].map(_is_number_cell)
+        if not number_rows.any():
+            report_progress()
+            continue
+
+        header = pd.concat(header_chunks)
+        start_row = header.index.get_loc(number_rows.idxmax())
+        print(f"数据起始行: {start_row}")
+
+        skill_codes = _find_skill_codes(header.iloc[:start_row])
+        count_added += _import_aut_rows(cursor, header.iloc[start_row:], year, skill_codes, employee_ids)
+        header_chunks = []
+        data_started = True
+        report_progress()
+
+    if not data_started and header_chunks:
+        # 没有找到数字行时，尝试查找"序号"行的下一行，仍找不到则默认使用第20行
+        # (AUT部门.csv通常在这一行开始数据)
+        header = pd.concat(header_chunks)
+        start_row = 20
+        for i, value in enumerate(header.iloc[:, 0]):
+            if pd.notna(value) and str(value).strip() == "序号":
+                start_row = i + 1
+                break
+        print(f"数据起始行: {start_row}")
+
+        skill_codes = _find_skill_codes(header.iloc[:start_row])
+        count_added += _import_aut_rows(cursor, header.iloc[start_row:], year, skill_codes, employee_ids)
+        report_progress()
+
+    return count_added
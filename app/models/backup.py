@@ -0,0 +1,132 @@
+import glob
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from app.models.connection import BUSY_TIMEOUT_MS
+
+# 每步复制的页数（默认页大小4KB时约16MB），两步之间其他连接可以继续读写
+BACKUP_PAGES_PER_STEP = 4096
+
+# 压缩备份文件的扩展名
+COMPRESSED_SUFFIX = '.gz'
+
+# gzip压缩级别，兼顾速度和压缩率（最高级别9在大数据库上明显更慢）
+COMPRESS_LEVEL = 6
+
+# 记录备份内容哈希值的附属文件扩展名，用于去重
+DIGEST_SUFFIX = '.sha256'
+
+
+def _copy_database(source_path, target_path, progress=None, pages=BACKUP_PAGES_PER_STEP):
+    """通过SQLite在线备份接口复制数据库
+
+    progress(已复制页数, 总页数) 在每一步后调用。
+    """
+    source = sqlite3.connect(source_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    target = sqlite3.connect(target_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        # 在源连接上保持读事务，使各步复制同一个快照；
+        # 否则其他连接在两步之间写入时，备份会从头重新开始
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        def on_progress(status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+
+        source.backup(target, pages=pages, progress=on_progress)
+        source.rollback()
+    finally:
+        target.close()
+        source.close()
+
+
+def _file_digest(file_path):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _find_duplicate(directory, digest):
+    """在备份目录中查找内容相同的已有备份，返回其路径"""
+    for digest_path in glob.glob(os.path.join(directory, f"*{DIGEST_SUFFIX}")):
+        backup_path = digest_path[:-len(DIGEST_SUFFIX)]
+        try:
+            with open(digest_path, 'r', encoding='utf-8') as f:
+                if f.read().strip() == digest and os.path.exists(backup_path):
+                    return backup_path
+        except OSError:
+            continue
+    return None
+
+
+def backup_database(db_path, backup_path, compress=False, dedupe=False, progress=None,
+                    pages=BACKUP_PAGES_PER_STEP):
+    """在线备份数据库，无需关闭正在使用的连接
+
+    compress为True时写入gzip压缩文件（自动补全.gz扩展名）；
+    dedupe为True时，如果备份目录中已有内容相同的备份，则不再写入新文件。
+    返回 (备份文件路径, 是否因内容重复而跳过)。
+    """
+    if compress and not backup_path.endswith(COMPRESSED_SUFFIX):
+        backup_path += COMPRESSED_SUFFIX
+    directory = os.path.dirname(os.path.abspath(backup_path))
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.sqlite', dir=directory)
+    os.close(fd)
+    try:
+        _copy_database(db_path, snapshot_path, progress, pages)
+        digest = _file_digest(snapshot_path)
+
+        if dedupe:
+            duplicate = _find_duplicate(directory, digest)
+            if duplicate:
+                return duplicate, True
+
+        if compress:
+            with open(snapshot_path, 'rb') as source, gzip.GzipFile(backup_path, 'wb', compresslevel=COMPRESS_LEVEL, mtime=0) as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        else:
+            os.replace(snapshot_path, backup_path)
+
+        with open(backup_path + DIGEST_SUFFIX, 'w', encoding='utf-8') as f:
+            f.write(digest)
+        return backup_path, False
+    finally:
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def restore_database(backup_path, db_path, progress=None, pages=BACKUP_PAGES_PER_STEP):
+    """通过在线备份接口将备份文件恢复到数据库，其他连接无需关闭
+
+    支持gzip压缩的备份文件。恢复前先检查备份文件的完整性。
+    """
+    snapshot_path = None
+    try:
+        source_path = backup_path
+        if backup_path.endswith(COMPRESSED_SUFFIX):
+            fd, snapshot_path = tempfile.mkstemp(suffix='.sqlite')
+            with os.fdopen(fd, 'wb') as target, gzip.open(backup_path, 'rb') as source:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            source_path = snapshot_path
+
+        check = sqlite3.connect(source_path)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            check.close()
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f"备份文件已损坏: {result}")
+
+        _copy_database(source_path, db_path, progress, pages)
+    finally:
+        if snapshot_path and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
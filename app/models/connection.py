@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+from app.models.audit_log import AuditLogWriter
+from app.models.data_events import UPDATE, data_events_for
+from app.models.grade_formula import FormulaCache
+from app.models.lookup_cache import lookup_cache_for
+from app.models.tracing import TracingConnection
+
+# 等待其他连接释放锁的最长时间（毫秒）
+BUSY_TIMEOUT_MS = 5000
+
+# 页缓存大小（KB），对应 PRAGMA cache_size 的负值
+CACHE_SIZE_KB = 20000
+
+# 内存映射读取的最大字节数
+MMAP_SIZE = 256 * 1024 * 1024
+
+# 每个连接缓存的已编译语句数量（sqlite3默认128）。
+# 各数据库类和视图使用的不同语句合计已超过默认值，缓存过小时常用语句会被挤出而重新编译
+STATEMENT_CACHE_SIZE = 512
+
+
+def configure_connection(conn):
+    """为连接设置WAL模式和性能相关参数"""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    # WAL模式下读写互不阻塞；内存数据库不支持WAL，会保持memory模式
+    conn.execute("PRAGMA journal_mode = WAL")
+    # WAL模式下NORMAL可保证数据库一致性，只在断电时可能丢失最近的提交
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    # INSERT OR REPLACE 删除旧行时也触发删除触发器，汇总表才能保持准确
+    conn.execute("PRAGMA recursive_triggers = ON")
+
+
+class ConnectionManager:
+    """同一数据库文件共用的连接
+
+    提供可嵌套的事务：在 transaction() 内部调用 commit() 不会立即提交，
+    而是在最外层事务结束时统一提交一次；内部任一操作失败则整个事务回滚。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # 所有语句经过跟踪游标，记录耗时、行数和慢查询
+        self.conn = sqlite3.connect(
+            db_path, timeout=BUSY_TIMEOUT_MS / 1000, factory=TracingConnection,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        configure_connection(self.conn)
+        self.ref_count = 0
+        self._depth = 0
+        self._rollback_only = False
+
+        # 共用连接的各数据库类通过同一个写入器记录操作日志
+        self.audit_log = AuditLogWriter(self)
+        # 共用连接的各数据库类共用编译后的职级计算公式
+        self.formula_cache = FormulaCache()
+        # 同一数据库文件的所有连接共用员工、考核项目等查找结果的缓存
+        self.lookup_cache = lookup_cache_for(db_path)
+        # 事务中修改过的表，事务结束后再使查找缓存失效
+        self._modified_tables = set()
+        # 同一数据库文件的所有连接共用数据修改通知器
+        self.events = data_events_for(db_path)
+        # 尚未提交的修改 [(表名, 主键, 操作)]，提交后再通知，回滚时丢弃
+        self._pending_changes = []
+        # 共用本连接的各数据库对象准备表结构的方法（弱引用），恢复数据库后重新调用
+        self._schema_setups = []
+
+    @property
+    def in_transaction(self):
+        """是否处于 transaction() 块中"""
+        return self._depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """事务上下文，正常退出时提交，发生异常时回滚"""
+        self._depth += 1
+        failed = False
+        try:
+            yield self.conn
+        except BaseException:
+            failed = True
+            self._rollback_only = True
+            raise
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_transaction(raise_on_rollback=not failed)
+
+    def _finish_transaction(self, raise_on_rollback):
+        """结束最外层事务"""
+        rollback_only = self._rollback_only
+        self._rollback_only = False
+        modified_tables, self._modified_tables = self._modified_tables, set()
+        changes, self._pending_changes = self._pending_changes, []
+
+        try:
+            if rollback_only:
+                self.conn.rollback()
+                self.audit_log.rolled_back()
+                # 内部操作失败后自行回滚（未抛出异常）时，需要告知调用方
+                if raise_on_rollback:
+                    raise sqlite3.DatabaseError("事务中的操作失败，所有修改已回滚")
+                return
+
+            try:
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                self.audit_log.rolled_back()
+                raise
+        finally:
+            # 提交或回滚后，事务期间读入缓存的值都可能已过时
+            self.lookup_cache.invalidate(*modified_tables)
+        self.events.publish(changes)
+        # 批量模式下，本事务的日志在提交之后才进入待写入队列
+        self.audit_log.committed()
+
+    def commit(self):
+        """提交修改（处于事务中时推迟到事务结束）"""
+        if self._depth == 0:
+            self.conn.commit()
+            self._publish_pending_changes()
+            self.audit_log.committed()
+
+    def rollback(self):
+        """回滚修改（处于事务中时标记整个事务在结束时回滚）"""
+        if self._depth == 0:
+            self.conn.rollback()
+            self.audit_log.rolled_back()
+            self._pending_changes = []
+            # 不知道回滚了哪些表的修改，丢弃所有查找缓存
+            self.lookup_cache.clear()
+        else:
+            self._rollback_only = True
+
+    def discard_caches(self):
+        """丢弃编译后的公式和查找缓存（恢复数据库等整体替换数据后调用）"""
+        self.formula_cache.invalidate()
+        self.lookup_cache.clear()
+
+    def prepare_schema(self, owner, setup):
+        """准备数据库类owner的表结构（见 prepare_schema_once），并记住setup供恢复数据库后调用"""
+        self._schema_setups.append(weakref.WeakMethod(setup))
+        prepare_schema_once(self.db_path, owner, setup)
+
+    def refresh_after_restore(self):
+        """数据库文件被整体替换后调用：丢弃缓存，并让共用本连接的每个数据库对象重新准备表结构
+
+        恢复的数据库可能缺少索引、全文索引等结构，各数据库对象的标记（如是否可用全文索引）也需要重新判断。
+        """
+        self.discard_caches()
+        # 只保留仍在使用本连接（未关闭）的数据库对象
+        live = [(ref, ref()) for ref in self._schema_setups]
+        live = [(ref, setup) for ref, setup in live if setup is not None and setup.__self__.conn is self.conn]
+        self._schema_setups = [ref for ref, _ in live]
+        for _, setup in live:
+            setup()
+
+    def invalidate_lookups(self, *tables):
+        """修改这些表的数据并提交后调用，使查找缓存中依赖它们的条目失效
+
+        处于事务中时立即失效一次，并在事务结束（提交或回滚）后再失效一次。
+        """
+        self.lookup_cache.invalidate(*tables)
+        if self._depth > 0:
+            self._modified_tables.update(tables)
+
+    def record_change(self, table, key=None, operation=UPDATE):
+        """记录一行数据的修改：使查找缓存失效，并在修改提交后发出通知（见 data_events）
+
+        已提交时立即通知；处于事务中或还有未提交的修改时，等提交后再通知，回滚则不通知。
+        批量修改时key传None、operation传RESET。
+        """
+        self.invalidate_lookups(table)
+        self._pending_changes.append((table, key, operation))
+        if self._depth == 0 and not self.conn.in_transaction:
+            self._publish_pending_changes()
+
+    def _publish_pending_changes(self):
+        changes, self._pending_changes = self._pending_changes, []
+        if changes:
+            # 提交前其他连接可能又读入了旧值
+            self.lookup_cache.invalidate(*{table for table, _, _ in changes})
+            self.events.publish(changes)
+
+    def close(self):
+        """写入缓存的操作日志并关闭连接"""
+        try:
+            self.audit_log.flush()
+        except sqlite3.Error as e:
+            print(f"写入操作日志失败: {e}")
+        self.conn.close()
+
+
+# 按 (数据库文件路径, 线程) 共享的连接：同一线程内的各数据库类共用一个连接，
+# 后台工作线程各自创建连接（SQLite连接不能跨线程使用）
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def acquire_connection(db_path):
+    """获取当前线程中数据库文件的共享连接，引用计数加一"""
+    path = db_path if db_path == ':memory:' else os.path.abspath(db_path)
+    key = (path, threading.get_ident())
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_path)
+            _managers[key] = manager
+        manager.ref_count += 1
+        return manager
+
+
+def release_connection(manager):
+    """释放共享连接，引用计数归零时关闭连接"""
+    with _managers_lock:
+        manager.ref_count -= 1
+        if manager.ref_count > 0:
+            return False
+
+        for key, value in list(_managers.items()):
+            if value is manager:
+                del _managers[key]
+        manager.close()
+        return True
+
+
+# 本进程中已准备好表结构的 (数据库文件路径, 数据库类)，各模块中有同名的数据库类，按类对象区分。
+# 后台任务每次在工作线程中新建连接，同一文件的建表语句只需在进程中执行一次
+_prepared_schemas = set()
+_prepared_lock = threading.Lock()
+
+
+def prepare_schema_once(db_path, owner, setup):
+    """在本进程中首次连接数据库文件时调用setup准备owner的表结构，之后的连接跳过
+
+    内存数据库每个连接各自独立，总是调用setup。setup失败时不做标记，下次连接重试。
+    """
+    if db_path == ':memory:':
+        setup()
+        return
+    key = (os.path.abspath(db_path), owner)
+    with _prepared_lock:
+        if key in _prepared_schemas:
+            return
+        setup()
+        _prepared_schemas.add(key)
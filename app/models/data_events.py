@@ -0,0 +1,59 @@
+import os
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# 数据修改通知：数据库类修改数据并提交后，通过 ConnectionManager.record_change 发出
+# (表名, 主键, 操作) 信号，各视图只更新受影响的行，不再重新读取整张表。
+# 同一数据库文件的所有连接共用一个通知器，后台线程中的修改经Qt队列连接传递到界面线程。
+
+# 操作类型
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+# 批量修改（导入、批量计算等），主键为None，收到后应重新加载
+RESET = 'reset'
+
+# 表名为 ALL_TABLES 表示整个数据库都已改变（如恢复备份）
+ALL_TABLES = '*'
+
+# 一次提交中同一张表的修改超过此数量时，合并为一条 RESET 通知，逐行更新不如重新加载快
+MAX_ROW_CHANGES = 100
+
+
+class DataChangeBus(QObject):
+    """数据修改通知器"""
+
+    # 表名, 主键（如工号、考核项目ID；RESET时为None）, 操作类型
+    dataChanged = pyqtSignal(str, object, str)
+
+    def publish(self, changes):
+        """发出一次提交中的修改通知，changes为 [(表名, 主键, 操作)]"""
+        by_table = {}
+        for table, key, operation in changes:
+            by_table.setdefault(table, []).append((key, operation))
+
+        for table, table_changes in by_table.items():
+            if (len(table_changes) > MAX_ROW_CHANGES
+                    or any(operation == RESET for _, operation in table_changes)):
+                self.dataChanged.emit(table, None, RESET)
+                continue
+            # 同一行的多次相同修改只通知一次
+            for key, operation in dict.fromkeys(table_changes):
+                self.dataChanged.emit(table, key, operation)
+
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+
+def data_events_for(db_path):
+    """数据库文件共用的修改通知器（内存数据库每个连接各自独立）"""
+    if db_path == ':memory:':
+        return DataChangeBus()
+    path = os.path.abspath(db_path)
+    with _buses_lock:
+        bus = _buses.get(path)
+        if bus is None:
+            bus = _buses[path] = DataChangeBus()
+        return bus
@@ -1,8 +1,57 @@
 import sqlite3
 import os
 import datetime
-import pandas as pd
-import numpy as np
+
+from app.models import backup
+from app.models.aggregates import ensure_aggregates, read_statistics
+from app.models.connection import acquire_connection, release_connection
+from app.models.data_events import ALL_TABLES, DELETE, INSERT, RESET, UPDATE
+from app.models.grades import ensure_grade_store
+from app.models.queries import EMPLOYEE_SEARCH_COLUMNS, EMPLOYEE_SEARCH_LIKE, QUERIES
+from app.models.schema import ensure_schema
+from app.models.tracing import tracer
+
+# 员工表中可由导入文件提供的字段
+EMPLOYEE_COLUMNS = [
+    'employee_no', 'gid', 'name', 'status', 'department',
+    'grade_2020', 'grade_2021', 'grade_2022', 'grade_2023',
+    'grade_2024', 'grade_2025', 'notes'
+]
+
+# 员工列表显示的列（latest_grade为计算得到的最新职级）
+EMPLOYEE_LIST_COLUMNS = ['employee_no', 'gid', 'name', 'department', 'latest_grade', 'status', 'notes']
+
+
+def _escape_like(text):
+    """转义LIKE模式中的通配符"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _fts_phrase(text):
+    """将关键词转为FTS5短语查询，避免其中的运算符被解析"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _normalize_import_frame(df):
+    """按列规范化导入数据，返回只包含员工表字段、值均为字符串的DataFrame"""
+    # pandas只在导入导出时使用，在函数内导入以加快程序启动
+    import pandas as pd
+    frame = pd.DataFrame(index=df.index)
+    for column in EMPLOYEE_COLUMNS:
+        if column not in df.columns:
+            frame[column] = '在职' if column == 'status' else ''
+            continue
+
+        series = df[column]
+        # Excel中的纯数字列（如工号）会被读成浮点数，先转为整数避免出现"123.0"
+        if pd.api.types.is_float_dtype(series):
+            non_null = series.dropna()
+            if (non_null == non_null.round()).all():
+                series = series.astype('Int64')
+
+        frame[column] = series.astype(object).where(series.notna(), '').astype(str).str.strip()
+    return frame
+
 
 class EmployeeDatabase:
     def __init__(self, db_path='employee_db.sqlite'):
@@ -14,15 +63,27 @@ class EmployeeDatabase:
     def connect(self):
         """连接到数据库"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # 同一数据库文件的各数据库类共用一个连接
+            self.manager = acquire_connection(self.db_path)
+            self.conn = self.manager.conn
             self.cursor = self.conn.cursor()
             print(f"成功连接到数据库: {self.db_path}")
             
-            # 确保职级历史表存在
-            self._create_grade_history_table()
+            # 确保职级历史表、员工表的全文索引和各表的查询索引存在（每个进程只检查一次）
+            self.manager.prepare_schema(type(self), self.refresh_schema)
+            self.fts_enabled = self._search_index_exists()
         except sqlite3.Error as e:
             print(f"数据库连接失败: {e}")
             
+    def refresh_schema(self):
+        """确保职级历史表、全文索引、查询索引和统计汇总表存在（首次连接时或恢复数据库后调用）"""
+        self._create_grade_history_table()
+        self._create_search_index()
+        self.fts_enabled = self._search_index_exists()
+        ensure_schema(self.conn)
+        ensure_grade_store(self.conn)
+        ensure_aggregates(self.conn)
+
     def _create_grade_history_table(self):
         """创建职级历史表（如果不存在）"""
         try:
@@ -38,10 +99,103 @@ class EmployeeDatabase:
                 UNIQUE(employee_no, year)
             )
             ''')
-            self.conn.commit()
+            self.manager.commit()
         except sqlite3.Error as e:
             print(f"创建职级历史表失败: {e}")
             
+    def _create_search_index(self):
+        """创建员工表的FTS5全文索引（如果不存在）
+
+        全文索引使用trigram分词器，以支持中文姓名的任意子串搜索；
+        通过触发器与员工表保持同步。索引列与 EMPLOYEE_SEARCH_COLUMNS 不一致时
+        （旧版本建立的索引）删除后按当前的列重建。
+        """
+        try:
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+            tables = {row[0] for row in self.cursor.fetchall()}
+            if 'employees' not in tables:
+                return
+
+            if 'employees_fts' in tables:
+                self.cursor.execute("PRAGMA table_info(employees_fts)")
+                if [row[1] for row in self.cursor.fetchall()] != EMPLOYEE_SEARCH_COLUMNS:
+                    self.cursor.executescript('''
+                    DROP TRIGGER IF EXISTS employees_fts_insert;
+                    DROP TRIGGER IF EXISTS employees_fts_delete;
+                    DROP TRIGGER IF EXISTS employees_fts_update;
+                    DROP TABLE employees_fts;
+                    ''')
+                    tables.discard('employees_fts')
+
+            columns = ', '.join(EMPLOYEE_SEARCH_COLUMNS)
+            new_values = ', '.join(f"new.{column}" for column in EMPLOYEE_SEARCH_COLUMNS)
+            old_values = ', '.join(f"old.{column}" for column in EMPLOYEE_SEARCH_COLUMNS)
+            self.cursor.executescript(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS employees_fts USING fts5(
+                {columns},
+                content='employees', content_rowid='rowid', tokenize='trigram'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS employees_fts_insert AFTER INSERT ON employees BEGIN
+                INSERT INTO employees_fts(rowid, {columns})
+                VALUES (new.rowid, {new_values});
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS employees_fts_delete AFTER DELETE ON employees BEGIN
+                INSERT INTO employees_fts(employees_fts, rowid, {columns})
+                VALUES ('delete', old.rowid, {old_values});
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS employees_fts_update AFTER UPDATE ON employees BEGIN
+                INSERT INTO employees_fts(employees_fts, rowid, {columns})
+                VALUES ('delete', old.rowid, {old_values});
+                INSERT INTO employees_fts(rowid, {columns})
+                VALUES (new.rowid, {new_values});
+            END;
+            ''')
+
+            # 首次创建或按新的列重建时为已有数据建立索引
+            if 'employees_fts' not in tables:
+                self.rebuild_search_index()
+        except sqlite3.Error as e:
+            # 部分SQLite版本不支持FTS5或trigram分词器，此时退回LIKE搜索
+            print(f"创建员工搜索索引失败: {e}")
+
+    def _search_index_exists(self):
+        """全文索引是否可用（创建失败时退回LIKE搜索）"""
+        try:
+            self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employees_fts'"
+            )
+            return self.cursor.fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    def rebuild_search_index(self):
+        """重建员工全文索引（员工表在触发器之外被修改后使用）"""
+        try:
+            self.cursor.execute("INSERT INTO employees_fts(employees_fts) VALUES ('rebuild')")
+            self.manager.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"重建员工搜索索引失败: {e}")
+            return False
+
+    def _can_use_fts(self, text):
+        """关键词能否使用全文索引（trigram分词器至少需要3个字符）"""
+        return self.fts_enabled and len(text) >= 3
+
+    def _text_search_condition(self, text):
+        """生成按姓名、工号、GID、部门和备注搜索的条件，返回(SQL, 参数)
+
+        trigram分词器至少需要3个字符，较短的关键词退回LIKE匹配。
+        """
+        if self._can_use_fts(text):
+            return "rowid IN (SELECT rowid FROM employees_fts WHERE employees_fts MATCH ?)", [_fts_phrase(text)]
+
+        pattern = f"%{_escape_like(text)}%"
+        return EMPLOYEE_SEARCH_LIKE, [pattern] * len(EMPLOYEE_SEARCH_COLUMNS)
+
     def get_db_path(self):
         """获取数据库路径"""
         return self.db_path
@@ -53,8 +207,20 @@ class EmployeeDatabase:
     def close(self):
         """关闭数据库连接"""
         if self.conn:
-            self.conn.close()
+            release_connection(self.manager)
+            self.conn = None
+            self.cursor = None
             print("数据库连接已关闭")
+
+    def transaction(self):
+        """事务上下文管理器，块内的多个操作只在结束时提交一次
+
+        用法:
+            with db.transaction():
+                db.update_employee(...)
+                db.add_employee_grade(...)
+        """
+        return self.manager.transaction()
     
     def get_all_employees(self):
         """获取所有员工信息"""
@@ -70,10 +236,136 @@ class EmployeeDatabase:
             print(f"获取所有员工信息失败: {e}")
             return []
     
+    def get_departments(self):
+        """获取所有部门（去重并排序）"""
+        try:
+            self.cursor.execute(QUERIES['employees.departments'])
+            return [row[0] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"获取部门列表失败: {e}")
+            return []
+
+    def get_statuses(self):
+        """获取所有员工状态（去重并排序）"""
+        try:
+            self.cursor.execute(QUERIES['employees.statuses'])
+            return [row[0] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"获取状态列表失败: {e}")
+            return []
+
+    def _employee_list_query(self, filters=None):
+        """构建员工列表查询，返回(SQL, 参数)
+
+        filters支持的键: department、status（精确匹配）、grade（最新职级包含）、
+        text（姓名、工号、GID、部门或备注包含）。
+        """
+        conditions = []
+        params = []
+        filters = filters or {}
+
+        # 员工表字段上的条件放在内层查询中，以便使用索引
+        if filters.get('department'):
+            conditions.append("department = ?")
+            params.append(filters['department'])
+
+        if filters.get('status'):
+            conditions.append("status = ?")
+            params.append(filters['status'])
+
+        if filters.get('text'):
+            condition, text_params = self._text_search_condition(filters['text'])
+            conditions.append(condition)
+            params.extend(text_params)
+
+        query = QUERIES['employees.list']
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        # 最新职级为计算列，在外层筛选
+        if filters.get('grade'):
+            query = f"SELECT * FROM ({query}) WHERE latest_grade LIKE ? ESCAPE '\\'"
+            params.append(f"%{_escape_like(filters['grade'])}%")
+        return query, params
+
+    def employee_list_statements(self, filters=None, sort_column='employee_no', descending=False):
+        """员工列表实际执行的计数语句和分页语句，返回 (计数SQL, 分页SQL, 参数)
+
+        分页SQL在参数之后还需要 LIMIT 和 OFFSET 两个参数。
+        """
+        if sort_column not in EMPLOYEE_LIST_COLUMNS:
+            sort_column = 'employee_no'
+        query, params = self._employee_list_query(filters)
+        direction = "DESC" if descending else "ASC"
+        count_sql = f"SELECT COUNT(*) FROM ({query})"
+        page_sql = (
+            f"SELECT {', '.join(EMPLOYEE_LIST_COLUMNS)} FROM ({query}) "
+            f"ORDER BY {sort_column} {direction}, row_id {direction} LIMIT ? OFFSET ?"
+        )
+        return count_sql, page_sql, params
+
+    def count_employee_list(self, filters=None):
+        """统计符合筛选条件的员工数量"""
+        try:
+            count_sql, _, params = self.employee_list_statements(filters)
+            self.cursor.execute(count_sql, params)
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"统计员工数量失败: {e}")
+            return 0
+
+    def get_employee_list_rows(self, filters=None, offset=0, limit=500, sort_column='employee_no', descending=False):
+        """分页获取员工列表行（最新职级由SQL计算），返回元组列表，列顺序同EMPLOYEE_LIST_COLUMNS"""
+        try:
+            _, page_sql, params = self.employee_list_statements(filters, sort_column, descending)
+            self.cursor.execute(page_sql, params + [limit, offset])
+            return self.cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"获取员工列表失败: {e}")
+            return []
+
+    def locate_employee_list_row(self, employee_no, filters=None, sort_column='employee_no', descending=False):
+        """查找员工在列表（筛选、排序同 get_employee_list_rows）中的位置
+
+        返回 (排在它前面的行数, 行元组)，员工不存在或不符合筛选条件时返回None，出错时返回False。
+        """
+        if sort_column not in EMPLOYEE_LIST_COLUMNS:
+            sort_column = 'employee_no'
+        try:
+            query, params = self._employee_list_query(filters)
+            self.cursor.execute(
+                f"SELECT row_id, {', '.join(EMPLOYEE_LIST_COLUMNS)} FROM ({query}) WHERE employee_no = ?",
+                params + [employee_no]
+            )
+            result = self.cursor.fetchone()
+            if result is None:
+                return None
+            row_id, row = result[0], result[1:]
+            value = row[EMPLOYEE_LIST_COLUMNS.index(sort_column)]
+
+            # 与 ORDER BY {sort_column}, row_id 的顺序一致（NULL排在最小）
+            if value is None:
+                before = (f"({sort_column} IS NOT NULL OR row_id > ?)" if descending
+                          else f"({sort_column} IS NULL AND row_id < ?)")
+                before_params = [row_id]
+            elif descending:
+                before = f"({sort_column} > ? OR ({sort_column} = ? AND row_id > ?))"
+                before_params = [value, value, row_id]
+            else:
+                before = f"({sort_column} IS NULL OR {sort_column} < ? OR ({sort_column} = ? AND row_id < ?))"
+                before_params = [value, value, row_id]
+            self.cursor.execute(
+                f"SELECT COUNT(*) FROM ({query}) WHERE {before}", params + before_params
+            )
+            return self.cursor.fetchone()[0], row
+        except sqlite3.Error as e:
+            print(f"查找员工列表行失败: {e}")
+            return False
+
     def get_employee_by_id(self, employee_id):
         """通过ID获取员工信息"""
         try:
-            self.cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
+            self.cursor.execute(QUERIES['employees.by_id'], (employee_id,))
             columns = [desc[0] for desc in self.cursor.description]
             row = self.cursor.fetchone()
             if row:
@@ -86,7 +378,7 @@ class EmployeeDatabase:
     def get_employee_by_no(self, employee_no):
         """通过工号获取员工信息"""
         try:
-            self.cursor.execute("SELECT * FROM employees WHERE employee_no = ?", (employee_no,))
+            self.cursor.execute(QUERIES['employees.by_no'], (employee_no,))
             columns = [desc[0] for desc in self.cursor.description]
             row = self.cursor.fetchone()
             if row:
@@ -96,26 +388,28 @@ class EmployeeDatabase:
             print(f"获取员工信息失败: {e}")
             return None
     
-    def search_employees(self, search_term):
-        """搜索员工信息"""
+    def search_employees(self, search_term, limit=100):
+        """搜索员工信息（姓名、工号、GID、部门或备注），按相关度排序，最多返回limit条"""
+        search_term = (search_term or '').strip()
+        if not search_term:
+            return []
+
         try:
-            query = """
-            SELECT * FROM employees 
-            WHERE name LIKE ? OR employee_no LIKE ? OR gid LIKE ? OR department LIKE ?
-            """
-            search_pattern = f"%{search_term}%"
-            self.cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern))
-            
+            if self._can_use_fts(search_term):
+                # 先在全文索引中按bm25相关度取前limit条，再回表取完整记录
+                query = QUERIES['employees.search_fts']
+                params = [_fts_phrase(search_term), limit]
+            else:
+                query = QUERIES['employees.search_like']
+                params = [f"%{_escape_like(search_term)}%"] * len(EMPLOYEE_SEARCH_COLUMNS) + [limit]
+
+            self.cursor.execute(query, params)
             columns = [desc[0] for desc in self.cursor.description]
-            employees = []
-            for row in self.cursor.fetchall():
-                employee = dict(zip(columns, row))
-                employees.append(employee)
-            return employees
+            return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
         except sqlite3.Error as e:
             print(f"搜索员工信息失败: {e}")
             return []
-    
+
     def add_employee(self, employee_data, user="系统"):
         """添加新员工"""
         try:
@@ -139,7 +433,6 @@ class EmployeeDatabase:
                 employee_data.get('grade_2025', ''),
                 employee_data.get('notes', '')
             ))
-            self.conn.commit()
             
             # 获取新添加员工的ID
             self.cursor.execute("SELECT last_insert_rowid()")
@@ -164,9 +457,13 @@ class EmployeeDatabase:
             log_details = f"添加员工: {employee_data.get('name', '')} (ID: {employee_id}), 详细信息: {', '.join(details)}"
             
             # 记录操作日志
-            self.log_operation(user, '添加员工', log_details)
+            if not self.log_operation(user, '添加员工', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employees', employee_data.get('employee_no', ''), INSERT)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"添加员工失败: {e}")
             return False
     
@@ -174,7 +471,7 @@ class EmployeeDatabase:
         """更新员工信息"""
         try:
             # 获取更新前的员工信息用于日志记录
-            self.cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
+            self.cursor.execute(QUERIES['employees.by_id'], (employee_id,))
             old_data = dict(zip([desc[0] for desc in self.cursor.description], self.cursor.fetchone()))
             if not old_data:
                 return False
@@ -196,7 +493,6 @@ class EmployeeDatabase:
             
             query = f"UPDATE employees SET {', '.join(set_clauses)} WHERE id = ?"
             self.cursor.execute(query, values)
-            self.conn.commit()
             
             # 构建详细的日志信息，记录修改的字段和修改前后的值
             changes = []
@@ -209,17 +505,30 @@ class EmployeeDatabase:
             log_details = f"更新员工: {old_data['name']} (ID: {employee_id}), 修改内容: {change_details}"
             
             # 记录操作日志
-            self.log_operation(user, '更新员工信息', log_details)
+            if not self.log_operation(user, '更新员工信息', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self._record_employee_update(old_data['employee_no'], updated_data)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"更新员工信息失败: {e}")
             return False
     
+    def _record_employee_update(self, employee_no, updated_data):
+        """记录员工信息的修改，工号改变时按删除旧工号、添加新工号通知"""
+        new_employee_no = updated_data.get('employee_no', employee_no)
+        if new_employee_no != employee_no:
+            self.manager.record_change('employees', employee_no, DELETE)
+            self.manager.record_change('employees', new_employee_no, INSERT)
+        else:
+            self.manager.record_change('employees', employee_no, UPDATE)
+
     def delete_employee(self, employee_id, user="系统"):
         """删除员工"""
         try:
             # 先获取员工完整信息，用于日志记录
-            self.cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
+            self.cursor.execute(QUERIES['employees.by_id'], (employee_id,))
             result = self.cursor.fetchone()
             
             # 检查是否找到员工数据
@@ -248,22 +557,31 @@ class EmployeeDatabase:
                     details.append(f"{label}: '{value}'")
             
             # 执行删除
-            self.cursor.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
-            self.conn.commit()
+            self.cursor.execute(QUERIES['employees.delete_by_id'], (employee_id,))
             
             # 记录操作日志
             log_details = f"删除员工: {employee_data['name']} (ID: {employee_id}), 删除的信息: {', '.join(details)}"
-            self.log_operation(user, '删除员工', log_details)
+            if not self.log_operation(user, '删除员工', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employees', employee_data['employee_no'], DELETE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"删除员工失败: {e}")
             return False
         except Exception as e:
+            self.manager.rollback()
             print(f"删除员工时发生未知错误: {e}")
             return False
     
-    def import_from_excel(self, file_path, user="系统"):
-        """从Excel文件导入员工数据"""
+    def import_from_excel(self, file_path, user="系统", bulk=True):
+        """从Excel文件导入员工数据
+
+        bulk为True时按列整体处理并在单个事务中批量写入，只记录一条汇总日志；
+        为False时逐行调用add_employee（每行单独提交并记录日志）。
+        """
+        import pandas as pd
         try:
             if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
                 df = pd.read_excel(file_path)
@@ -272,7 +590,10 @@ class EmployeeDatabase:
             else:
                 print("不支持的文件格式")
                 return False
-            
+
+            if bulk:
+                return self._bulk_import_frame(df, file_path, user)
+
             # 获取现有员工工号列表，用于避免重复导入
             self.cursor.execute("SELECT employee_no FROM employees")
             existing_employee_nos = [row[0] for row in self.cursor.fetchall()]
@@ -310,8 +631,51 @@ class EmployeeDatabase:
             print(f"导入Excel失败: {e}")
             return False
     
+    def _bulk_import_frame(self, df, file_path, user="系统"):
+        """批量导入员工数据：集合去重 + executemany，单个事务内写入数据和汇总日志"""
+        frame = _normalize_import_frame(df)
+
+        # 工号已存在于数据库或在文件中重复出现的行都跳过
+        self.cursor.execute("SELECT employee_no FROM employees")
+        existing_employee_nos = {str(row[0]) for row in self.cursor.fetchall()}
+        employee_nos = frame['employee_no']
+        skip_mask = employee_nos.isin(existing_employee_nos) | (
+            (employee_nos != '') & employee_nos.duplicated()
+        )
+        new_rows = frame[~skip_mask]
+
+        count_added = len(new_rows)
+        count_skipped = int(skip_mask.sum())
+
+        try:
+            self.cursor.executemany(f'''
+            INSERT INTO employees ({', '.join(EMPLOYEE_COLUMNS)})
+            VALUES ({', '.join(['?'] * len(EMPLOYEE_COLUMNS))})
+            ''', new_rows.itertuples(index=False, name=None))
+
+            # 汇总日志与数据在同一事务中提交
+            if not self.log_operation(
+                user,
+                '导入Excel',
+                f"从{file_path}批量导入员工数据，成功添加{count_added}条记录，跳过{count_skipped}条记录",
+                commit=False
+            ):
+                raise sqlite3.Error("记录导入日志失败")
+            self.manager.commit()
+            self.manager.record_change('employees', None, RESET)
+        except sqlite3.Error:
+            self.manager.rollback()
+            raise
+
+        return {
+            'success': True,
+            'added': count_added,
+            'skipped': count_skipped
+        }
+
     def export_to_excel(self, file_path, filters=None):
         """导出员工数据到Excel"""
+        import pandas as pd
         try:
             # 根据筛选条件获取员工数据
             if filters:
@@ -339,13 +703,15 @@ class EmployeeDatabase:
             print(f"导出Excel失败: {e}")
             return False
     
-    def get_operation_logs(self, limit=100):
-        """获取操作日志"""
+    def get_operation_logs(self, limit=100, after_id=None):
+        """获取操作日志，最近的在前；指定after_id时只获取ID大于它的（新写入的）日志"""
         try:
-            self.cursor.execute(
-                "SELECT * FROM operation_logs ORDER BY timestamp DESC LIMIT ?", 
-                (limit,)
-            )
+            # 先写入缓存中尚未保存的日志
+            self.manager.audit_log.flush()
+            if after_id is None:
+                self.cursor.execute(QUERIES['operation_logs.latest'], (limit,))
+            else:
+                self.cursor.execute(QUERIES['operation_logs.after_id'], (after_id, limit))
             columns = [desc[0] for desc in self.cursor.description]
             logs = []
             for row in self.cursor.fetchall():
@@ -356,15 +722,32 @@ class EmployeeDatabase:
             print(f"获取操作日志失败: {e}")
             return []
     
-    def log_operation(self, user, operation, details):
-        """记录操作日志"""
+    def get_query_statistics(self):
+        """获取各SQL语句的执行统计（次数、耗时分位数、行数），按总耗时排列"""
+        return tracer.statement_stats()
+
+    def get_slow_queries(self):
+        """获取慢查询日志，最近的在前"""
+        return tracer.slow_queries()
+
+    def get_lookup_cache_stats(self):
+        """获取查找缓存的条目数和各项查找的命中统计"""
+        return self.manager.lookup_cache.stats()
+
+    def reset_query_statistics(self):
+        """清空SQL语句统计、慢查询日志和查找缓存命中统计"""
+        tracer.reset()
+        self.manager.lookup_cache.reset_stats()
+
+    def log_operation(self, user, operation, details, commit=True):
+        """记录操作日志
+
+        commit为False时只写入不提交，由调用方与数据修改一起提交。
+        """
         try:
-            timestamp = datetime.datetime.now()
-            self.cursor.execute('''
-            INSERT INTO operation_logs (user, operation, details, timestamp)
-            VALUES (?, ?, ?, ?)
-            ''', (user, operation, details, timestamp))
-            self.conn.commit()
+            self.manager.audit_log.record(user, operation, details)
+            if commit:
+                self.manager.commit()
             return True
         except sqlite3.Error as e:
             print(f"记录操作日志失败: {e}")
@@ -373,130 +756,89 @@ class EmployeeDatabase:
     def get_statistics(self):
         """获取统计数据"""
         try:
-            stats = {}
-            
-            # 员工总数
-            self.cursor.execute("SELECT COUNT(*) FROM employees")
-            stats['total_employees'] = self.cursor.fetchone()[0]
-            
-            # 部门分布
-            self.cursor.execute("SELECT department, COUNT(*) FROM employees GROUP BY department")
-            stats['department_distribution'] = {row[0]: row[1] for row in self.cursor.fetchall()}
-            
-            # 职级分布
-            grade_years = ['grade_2020', 'grade_2021', 'grade_2022', 'grade_2023', 'grade_2024', 'grade_2025']
-            stats['grade_distribution'] = {}
-            
-            for year in grade_years:
-                self.cursor.execute(f"SELECT {year}, COUNT(*) FROM employees WHERE {year} != '' GROUP BY {year}")
-                stats['grade_distribution'][year] = {row[0]: row[1] for row in self.cursor.fetchall()}
-            
-            return stats
+            # 汇总表由触发器随数据修改同步更新，读取量与员工人数无关
+            return read_statistics(self.conn)
         except sqlite3.Error as e:
             print(f"获取统计数据失败: {e}")
             return {}
     
-    def backup_database(self, backup_path=None):
-        """备份数据库"""
+    def backup_database(self, backup_path=None, compress=False, dedupe=False, progress=None):
+        """在线备份数据库（不关闭当前连接）
+
+        返回 (是否成功, 备份文件路径)；dedupe为True且已有相同内容的备份时返回已有备份的路径。
+        """
         if not backup_path:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = f"backup_{timestamp}.sqlite"
-        
+
         try:
-            # 确保连接已关闭
-            if self.conn:
-                self.conn.close()
-            
-            # 简单复制文件作为备份
-            import shutil
-            shutil.copyfile(self.db_path, backup_path)
-            
-            # 重新连接数据库
-            self.connect()
-            
+            # 先提交缓存的操作日志，使其包含在备份中
+            self.manager.audit_log.flush()
+            backup_path, skipped = backup.backup_database(
+                self.db_path, backup_path, compress=compress, dedupe=dedupe, progress=progress
+            )
+
             # 记录备份操作
-            self.log_operation("系统", "数据库备份", f"数据库已备份到 {backup_path}")
-            
+            if skipped:
+                self.log_operation("系统", "数据库备份", f"数据库内容未变化，沿用已有备份 {backup_path}")
+            else:
+                self.log_operation("系统", "数据库备份", f"数据库已备份到 {backup_path}")
+
             return True, backup_path
-        except Exception as e:
+        except (sqlite3.Error, OSError) as e:
             print(f"备份数据库失败: {e}")
-            # 尝试重新连接
-            self.connect()
             return False, None
-    
-    def restore_database(self, backup_path, user="系统"):
-        """恢复数据库"""
+
+    def restore_database(self, backup_path, user="系统", progress=None):
+        """在线恢复数据库（不关闭当前连接）"""
         try:
-            # 确保连接已关闭
-            if self.conn:
-                self.conn.close()
-            
-            # 导入备份
-            import shutil
-            shutil.copyfile(backup_path, self.db_path)
-            
-            # 重新连接数据库
-            self.connect()
-            
+            # 提交未完成的修改，避免恢复时等待锁
+            self.manager.commit()
+            self.manager.audit_log.flush()
+            backup.restore_database(backup_path, self.db_path, progress=progress)
+
+            # 恢复的数据库内容不同，丢弃缓存；恢复的数据库还可能缺少索引等结构
+            self.manager.refresh_after_restore()
+            self.manager.record_change(ALL_TABLES, None, RESET)
+
             # 记录恢复操作
             self.log_operation(user, "数据库恢复", f"数据库已从 {backup_path} 恢复")
-            
+
             return True
-        except Exception as e:
+        except (sqlite3.Error, OSError) as e:
             print(f"恢复数据库失败: {e}")
-            # 尝试重新连接
-            self.connect()
             return False
-    
-    def get_employee_grades(self, employee_id):
-        """获取员工的所有职级历史记录"""
+
+    def _get_employee_no(self, employee_id):
+        """通过员工ID获取工号，职级历史表按工号记录"""
         try:
-            self.cursor.execute("""
-            SELECT * FROM employee_grades 
-            WHERE employee_id = ? 
-            ORDER BY year DESC
-            """, (employee_id,))
-            
-            columns = [desc[0] for desc in self.cursor.description]
-            grades = []
-            for row in self.cursor.fetchall():
-                grade = dict(zip(columns, row))
-                grades.append(grade)
-            return grades
+            self.cursor.execute(QUERIES['employees.no_by_id'], (employee_id,))
+            result = self.cursor.fetchone()
+            return result[0] if result else None
         except sqlite3.Error as e:
-            print(f"获取员工职级历史失败: {e}")
+            print(f"获取员工工号失败: {e}")
+            return None
+
+    def get_employee_grades(self, employee_id):
+        """获取员工的所有职级历史记录"""
+        employee_no = self._get_employee_no(employee_id)
+        if employee_no is None:
             return []
+        return self.get_employee_grades_by_no(employee_no)
     
     def add_employee_grade(self, employee_id, year, grade, comment="", user="系统"):
         """添加或更新员工的特定年份职级"""
-        try:
-            # 尝试插入新记录，如果已存在则更新
-            self.cursor.execute("""
-            INSERT INTO employee_grades (employee_id, year, grade, comment)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(employee_id, year) 
-            DO UPDATE SET grade = ?, comment = ?, updated_at = CURRENT_TIMESTAMP
-            """, (employee_id, year, grade, comment, grade, comment))
-            
-            self.conn.commit()
-            
-            # 记录操作日志
-            employee_name = self.get_employee_name(employee_id)
-            log_details = f"更新员工职级: {employee_name} (ID: {employee_id}), {year}年职级: {grade}"
-            if comment:
-                log_details += f", 备注: {comment}"
-                
-            self.log_operation(user, '更新职级信息', log_details)
-            return True
-        except sqlite3.Error as e:
-            print(f"添加/更新员工职级失败: {e}")
+        employee_no = self._get_employee_no(employee_id)
+        if employee_no is None:
+            print(f"添加/更新员工职级失败: 找不到ID为 {employee_id} 的员工")
             return False
+        return self.add_employee_grade_by_no(employee_no, year, grade, comment, user)
     
     def delete_employee_grade(self, grade_id, user="系统"):
         """删除指定的职级记录"""
         try:
             # 先获取职级记录信息用于日志
-            self.cursor.execute("SELECT employee_no, year, grade FROM employee_grades WHERE id = ?", (grade_id,))
+            self.cursor.execute(QUERIES['employee_grades.by_id'], (grade_id,))
             result = self.cursor.fetchone()
             
             if not result:
@@ -504,33 +846,27 @@ class EmployeeDatabase:
                 
             employee_no, year, grade = result
             
-            # 执行删除
-            self.cursor.execute("DELETE FROM employee_grades WHERE id = ?", (grade_id,))
-            
-            # 同时清空employees表中对应年份的职级字段
-            grade_field = f"grade_{year}"
-            self.cursor.execute(f"""
-            UPDATE employees 
-            SET {grade_field} = '' 
-            WHERE employee_no = ?
-            """, (employee_no,))
-            
-            self.conn.commit()
+            # 执行删除（员工表中对应年份的职级字段由触发器清空）
+            self.cursor.execute(QUERIES['employee_grades.delete_by_id'], (grade_id,))
             
             # 记录操作日志
             employee_name = self._get_employee_name(employee_no)
             log_details = f"删除员工职级记录: {employee_name} (工号: {employee_no}), {year}年职级: {grade}"
-            self.log_operation(user, '删除职级记录', log_details)
+            if not self.log_operation(user, '删除职级记录', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employee_grades', employee_no, DELETE)
             
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"删除员工职级记录失败: {e}")
             return False
     
     def get_employee_name(self, employee_id):
         """获取员工姓名"""
         try:
-            self.cursor.execute("SELECT name FROM employees WHERE id = ?", (employee_id,))
+            self.cursor.execute(QUERIES['employees.name_by_id'], (employee_id,))
             result = self.cursor.fetchone()
             return result[0] if result else "未知员工"
         except sqlite3.Error as e:
@@ -571,7 +907,7 @@ class EmployeeDatabase:
         """通过员工工号更新员工信息"""
         try:
             # 获取更新前的员工信息用于日志记录
-            self.cursor.execute("SELECT * FROM employees WHERE employee_no = ?", (employee_no,))
+            self.cursor.execute(QUERIES['employees.by_no'], (employee_no,))
             old_data = dict(zip([desc[0] for desc in self.cursor.description], self.cursor.fetchone()))
             if not old_data:
                 return False
@@ -596,7 +932,6 @@ class EmployeeDatabase:
             
             query = f"UPDATE employees SET {', '.join(set_clauses)} WHERE employee_no = ?"
             self.cursor.execute(query, values)
-            self.conn.commit()
             
             # 构建详细的日志信息，记录修改的字段和修改前后的值
             changes = []
@@ -609,9 +944,13 @@ class EmployeeDatabase:
             log_details = f"更新员工: {old_data['name']} (工号: {employee_no}), 修改内容: {change_details}"
             
             # 记录操作日志
-            self.log_operation(user, '更新员工信息', log_details)
+            if not self.log_operation(user, '更新员工信息', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employees', employee_no, UPDATE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"更新员工信息失败: {e}")
             return False
     
@@ -619,7 +958,7 @@ class EmployeeDatabase:
         """通过员工工号删除员工"""
         try:
             # 先获取员工完整信息，用于日志记录
-            self.cursor.execute("SELECT * FROM employees WHERE employee_no = ?", (employee_no,))
+            self.cursor.execute(QUERIES['employees.by_no'], (employee_no,))
             result = self.cursor.fetchone()
             
             # 检查是否找到员工数据
@@ -648,28 +987,28 @@ class EmployeeDatabase:
                     details.append(f"{label}: '{value}'")
             
             # 执行删除
-            self.cursor.execute("DELETE FROM employees WHERE employee_no = ?", (employee_no,))
-            self.conn.commit()
+            self.cursor.execute(QUERIES['employees.delete_by_no'], (employee_no,))
             
             # 记录操作日志
             log_details = f"删除员工: {employee_data['name']} (工号: {employee_no}), 删除的信息: {', '.join(details)}"
-            self.log_operation(user, '删除员工', log_details)
+            if not self.log_operation(user, '删除员工', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employees', employee_no, DELETE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"删除员工失败: {e}")
             return False
         except Exception as e:
+            self.manager.rollback()
             print(f"删除员工时发生未知错误: {e}")
             return False
     
     def get_employee_grades_by_no(self, employee_no):
         """通过员工工号获取所有职级历史记录"""
         try:
-            self.cursor.execute("""
-            SELECT * FROM employee_grades 
-            WHERE employee_no = ? 
-            ORDER BY year DESC
-            """, (employee_no,))
+            self.cursor.execute(QUERIES['employee_grades.by_employee_no'], (employee_no,))
             
             columns = [desc[0] for desc in self.cursor.description]
             grades = []
@@ -684,23 +1023,8 @@ class EmployeeDatabase:
     def add_employee_grade_by_no(self, employee_no, year, grade, comment="", user="系统"):
         """通过员工工号添加或更新职级记录"""
         try:
-            # 尝试插入新记录，如果已存在则更新
-            self.cursor.execute("""
-            INSERT INTO employee_grades (employee_no, year, grade, comment)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(employee_no, year) 
-            DO UPDATE SET grade = ?, comment = ?, updated_at = CURRENT_TIMESTAMP
-            """, (employee_no, year, grade, comment, grade, comment))
-            
-            # 同时更新employees表中对应年份的职级字段
-            grade_field = f"grade_{year}"
-            self.cursor.execute(f"""
-            UPDATE employees 
-            SET {grade_field} = ? 
-            WHERE employee_no = ?
-            """, (grade, employee_no))
-            
-            self.conn.commit()
+            # 尝试插入新记录，如果已存在则更新（员工表中对应年份的职级字段由触发器同步）
+            self.cursor.execute(QUERIES['employee_grades.upsert_by_no'], (employee_no, year, grade, comment))
             
             # 记录操作日志
             employee_name = self._get_employee_name(employee_no)
@@ -708,16 +1032,20 @@ class EmployeeDatabase:
             if comment:
                 log_details += f", 备注: {comment}"
                 
-            self.log_operation(user, '更新职级信息', log_details)
+            if not self.log_operation(user, '更新职级信息', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employee_grades', employee_no, UPDATE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"通过工号添加员工职级历史失败: {e}")
             return False
             
     def _get_employee_name(self, employee_no):
         """通过工号获取员工姓名"""
         try:
-            self.cursor.execute("SELECT name FROM employees WHERE employee_no = ?", (employee_no,))
+            self.cursor.execute(QUERIES['employees.name_by_no'], (employee_no,))
             result = self.cursor.fetchone()
             return result[0] if result else "未知员工"
         except sqlite3.Error as e:
@@ -0,0 +1,160 @@
+import bisect
+from collections import OrderedDict
+
+import numpy as np
+
+from app.models.grades import grade_rank
+
+# 部门职级计算公式的编译与缓存。
+# 公式的 grade_thresholds 是按顺序匹配的闭区间 [min_score, max_score]，总分取第一个包含它的区间的职级，
+# 都不包含时保持当前职级。区间可能重叠或有空隙，编译时按所有端点把分数轴切成
+# 端点本身和端点之间的开区间两类互不重叠的片段，预先算好每个片段的职级，
+# 计算时用二分查找（bisect / np.searchsorted）定位片段，不再逐个比较阈值。
+
+
+# 模拟时缓存的候选公式结果数量
+SIMULATION_CACHE_SIZE = 64
+
+
+class CompiledFormula:
+    """编译后的职级计算公式"""
+
+    def __init__(self, formula):
+        thresholds = [
+            (float(threshold['min_score']), float(threshold['max_score']), threshold['grade'])
+            for threshold in (formula or {}).get('grade_thresholds', [])
+        ]
+        self.bounds = sorted({value for low, high, _ in thresholds for value in (low, high)})
+
+        def match(score):
+            for low, high, grade in thresholds:
+                if low <= score <= high:
+                    return grade
+            return None
+
+        # point_grades[i]: 总分恰好等于 bounds[i] 时的职级
+        # gap_grades[i]: 总分在 bounds[i-1] 与 bounds[i] 之间时的职级（首尾两段在所有端点之外，不匹配）
+        self.point_grades = [match(value) for value in self.bounds]
+        self.gap_grades = [None] + [
+            match((low + high) / 2) for low, high in zip(self.bounds, self.bounds[1:])
+        ] + [None]
+        self._bounds_array = np.array(self.bounds, dtype=float)
+        self._point_array = np.array(self.point_grades + [None], dtype=object)
+        self._gap_array = np.array(self.gap_grades, dtype=object)
+        self._point_matched = np.array([grade is not None for grade in self._point_array])
+        self._gap_matched = np.array([grade is not None for grade in self._gap_array])
+
+    def grade(self, total_score, current_grade):
+        """单个总分的预测职级"""
+        index = bisect.bisect_left(self.bounds, total_score)
+        if index < len(self.bounds) and self.bounds[index] == total_score:
+            grade = self.point_grades[index]
+        else:
+            grade = self.gap_grades[index]
+        return current_grade if grade is None else grade
+
+    def grades(self, total_scores, current_grades):
+        """一组总分的预测职级，匹配规则与 grade() 一致"""
+        scores = np.asarray(total_scores, dtype=float)
+        indexes = np.searchsorted(self._bounds_array, scores, side='left')
+        is_point = np.zeros(scores.shape, dtype=bool)
+        inside = indexes < len(self.bounds)
+        is_point[inside] = self._bounds_array[indexes[inside]] == scores[inside]
+        grades = np.where(is_point, self._point_array[indexes], self._gap_array[indexes])
+        matched = np.where(is_point, self._point_matched[indexes], self._gap_matched[indexes])
+        return np.where(matched, grades, np.asarray(current_grades, dtype=object))
+
+
+class FormulaCache:
+    """按 (部门, 公式更新时间) 缓存编译后的公式
+
+    公式更新时间变化（包括其他连接修改了公式）时缓存自动失效，
+    本连接保存公式时还会调用 invalidate 立即丢弃旧的编译结果。
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, department, updated_at):
+        entry = self._entries.get(department)
+        if entry is not None and entry[0] == updated_at:
+            return entry[1]
+        return None
+
+    def put(self, department, updated_at, value):
+        self._entries[department] = (updated_at, value)
+
+    def invalidate(self, department=None):
+        """丢弃某个部门的缓存，不指定部门时全部丢弃"""
+        if department is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(department, None)
+
+
+class FormulaSimulator:
+    """把候选公式应用到部门所有员工的总分上，只在内存中计算，不写入预测结果
+
+    员工总分和当前职级只在创建时读取一次（见 ScoreDatabase.get_department_totals）。
+    同一公式的结果按编译结果缓存，拖动阈值回到之前的值时直接返回。
+    """
+
+    def __init__(self, department_totals):
+        self.employee_nos = department_totals['employee_nos']
+        self.employee_names = department_totals['employee_names']
+        self.totals = np.asarray(department_totals['totals'], dtype=float)
+        current_grades = np.asarray(department_totals['current_grades'], dtype=object)
+        # 没有当前职级的员工无法计算，与批量计算预测职级一致
+        self.valid = current_grades != ''
+        self.current_grades = current_grades
+        self.current_ranks = self._ranks(current_grades)
+        self._results = OrderedDict()
+
+    @staticmethod
+    def _ranks(grades):
+        if not len(grades):
+            return np.zeros(0, dtype=int)
+        names, inverse = np.unique(grades.astype(str), return_inverse=True)
+        return np.array([grade_rank(name) for name in names])[inverse]
+
+    def run(self, formula):
+        """模拟结果：晋升、降级、平级变动、不变和无法计算的人数，以及职级变化的员工列表
+
+        职级变化但高低顺序相同（包括新旧职级都不在 GRADE_RANKS 中）时计为平级变动，不算降级。
+        """
+        compiled = CompiledFormula(formula)
+        # 按编译结果缓存，写法不同（如60与60.0）但效果相同的公式共用结果
+        key = (tuple(compiled.bounds), tuple(compiled.point_grades), tuple(compiled.gap_grades))
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+
+        predicted = compiled.grades(self.totals, self.current_grades)
+        changed = self.valid & (predicted != self.current_grades)
+        predicted_ranks = self._ranks(predicted)
+        promoted = changed & (predicted_ranks > self.current_ranks)
+        demoted = changed & (predicted_ranks < self.current_ranks)
+        result = {
+            'promoted': int(promoted.sum()),
+            'demoted': int(demoted.sum()),
+            'lateral': int((changed & ~promoted & ~demoted).sum()),
+            'unchanged': int((self.valid & ~changed).sum()),
+            'invalid': int((~self.valid).sum()),
+            'changes': [
+                {
+                    'employee_no': self.employee_nos[index],
+                    'employee_name': self.employee_names[index],
+                    'total_score': float(self.totals[index]),
+                    'current_grade': self.current_grades[index],
+                    'predicted_grade': predicted[index],
+                    'promotion': bool(promoted[index]),
+                    'demotion': bool(demoted[index]),
+                }
+                for index in np.flatnonzero(changed).tolist()
+            ],
+        }
+        self._results[key] = result
+        if len(self._results) > SIMULATION_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return result
@@ -0,0 +1,184 @@
+# 职级数据以职级历史表 employee_grades 为准，一行记录一名员工一年的职级，年份不受限制。
+# 员工表中的 grade_YYYY 列为兼容旧界面和导入导出文件保留，由触发器与职级历史表双向同步：
+# 修改员工表的年份列会写入职级历史表，修改职级历史表会回写对应年份列（没有该年份列时不回写）。
+# 读取职级一律查询职级历史表或 employee_latest_grades 视图，不再拼接年份列名。
+
+# 同步触发器或视图逻辑变化时加一，连接时会重建触发器、视图并重新同步一次
+GRADE_STORE_VERSION = 1
+
+# 同步触发器的名称前缀，重建时按前缀删除
+_TRIGGER_PREFIX = 'trg_grades_'
+
+# 最新职级视图：每名员工最近一年的非空职级
+LATEST_GRADE_VIEW = 'employee_latest_grades'
+
+# 职级从低到高的顺序，统计图表、晋升判断和公式模拟共用（未列出的职级按最低处理）
+GRADE_RANKS = {'G1': 1, 'G2': 2, 'G3': 3, 'G4A': 4, 'G4B': 5, 'G5': 6, 'Technian': 7}
+
+_GRADE_RANKS_BY_KEY = {grade.upper(): rank for grade, rank in GRADE_RANKS.items()}
+
+_GRADE_HISTORY_TABLE = '''
+CREATE TABLE IF NOT EXISTS employee_grades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_no TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    comment TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(employee_no, year)
+)
+'''
+
+_INDEXES = [
+    # 按工号查询职级历史和最新职级（覆盖索引，无需回表）
+    "CREATE INDEX IF NOT EXISTS idx_employee_grades_employee_year ON employee_grades(employee_no, year, grade)",
+    # 按年份统计职级分布
+    "CREATE INDEX IF NOT EXISTS idx_employee_grades_year ON employee_grades(year, grade)",
+]
+
+_LATEST_GRADE_VIEW_SQL = f"""
+CREATE VIEW {LATEST_GRADE_VIEW} AS
+SELECT g.employee_no, g.year, g.grade
+FROM employee_grades g
+WHERE g.grade != ''
+  AND g.year = (
+      SELECT MAX(h.year) FROM employee_grades h
+      WHERE h.employee_no = g.employee_no AND h.grade != ''
+  )
+"""
+
+
+def grade_rank(grade):
+    """职级的高低顺序值（不区分大小写）"""
+    return _GRADE_RANKS_BY_KEY.get(str(grade or '').strip().upper(), 0)
+
+
+def is_promotion(current_grade, predicted_grade):
+    """预测职级是否高于当前职级"""
+    return grade_rank(predicted_grade) > grade_rank(current_grade)
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def legacy_grade_years(conn):
+    """员工表中 grade_YYYY 列对应的年份"""
+    return sorted(
+        int(column[6:]) for column in _columns(conn, 'employees')
+        if column.startswith('grade_') and column[6:].isdigit()
+    )
+
+
+def _trigger_name(table, event, year):
+    return f"{_TRIGGER_PREFIX}v{GRADE_STORE_VERSION}_{table}_{event}_{year}"
+
+
+def _upsert_from_employee(row, year):
+    """员工表年份列的值写入职级历史表，值未变化时不修改"""
+    return f"""
+        INSERT INTO employee_grades (employee_no, year, grade)
+        SELECT {row}.employee_no, {year}, {row}.grade_{year} WHERE COALESCE({row}.grade_{year}, '') != ''
+        ON CONFLICT(employee_no, year) DO UPDATE SET grade = excluded.grade, updated_at = CURRENT_TIMESTAMP
+        WHERE grade IS NOT excluded.grade;"""
+
+
+def _sync_triggers(year):
+    """某一年份列的同步触发器 [(名称, SQL)]
+
+    两个方向的语句都只在值不同时修改，互相触发一次后即停止。
+    """
+    return [
+        (_trigger_name('employees', 'insert', year), f"""
+        AFTER INSERT ON employees WHEN COALESCE(NEW.grade_{year}, '') != '' BEGIN{_upsert_from_employee('NEW', year)}
+        END"""),
+        # 年份列清空时删除该年的职级记录
+        (_trigger_name('employees', 'update', year), f"""
+        AFTER UPDATE OF grade_{year} ON employees WHEN NEW.grade_{year} IS NOT OLD.grade_{year} BEGIN
+            DELETE FROM employee_grades
+            WHERE COALESCE(NEW.grade_{year}, '') = '' AND employee_no = NEW.employee_no AND year = {year};{_upsert_from_employee('NEW', year)}
+        END"""),
+        (_trigger_name('history', 'insert', year), f"""
+        AFTER INSERT ON employee_grades WHEN NEW.year = {year} BEGIN
+            UPDATE employees SET grade_{year} = NEW.grade
+            WHERE employee_no = NEW.employee_no AND grade_{year} IS NOT NEW.grade;
+        END"""),
+        (_trigger_name('history', 'delete', year), f"""
+        AFTER DELETE ON employee_grades WHEN OLD.year = {year} BEGIN
+            UPDATE employees SET grade_{year} = ''
+            WHERE employee_no = OLD.employee_no AND COALESCE(grade_{year}, '') != '';
+        END"""),
+        (_trigger_name('history', 'update', year), f"""
+        AFTER UPDATE OF employee_no, year, grade ON employee_grades WHEN OLD.year = {year} OR NEW.year = {year} BEGIN
+            UPDATE employees SET grade_{year} = ''
+            WHERE OLD.year = {year} AND employee_no = OLD.employee_no
+              AND NOT (NEW.year = {year} AND NEW.employee_no = OLD.employee_no)
+              AND COALESCE(grade_{year}, '') != '';
+            UPDATE employees SET grade_{year} = NEW.grade
+            WHERE NEW.year = {year} AND employee_no = NEW.employee_no AND grade_{year} IS NOT NEW.grade;
+        END"""),
+    ]
+
+
+def _synchronize(conn, years):
+    """安装触发器前对齐两处数据：职级历史表缺少的年份从员工表补入，
+    两处都有但不一致时以职级历史表为准回写员工表"""
+    for year in years:
+        conn.execute(f"""
+        INSERT INTO employee_grades (employee_no, year, grade, comment)
+        SELECT employee_no, {year}, grade_{year}, '从员工表同步' FROM employees
+        WHERE COALESCE(grade_{year}, '') != ''
+        ON CONFLICT(employee_no, year) DO NOTHING
+        """)
+        conn.execute(f"""
+        UPDATE employees SET grade_{year} = (
+            SELECT g.grade FROM employee_grades g WHERE g.employee_no = employees.employee_no AND g.year = {year}
+        )
+        WHERE EXISTS (
+            SELECT 1 FROM employee_grades g
+            WHERE g.employee_no = employees.employee_no AND g.year = {year} AND g.grade IS NOT employees.grade_{year}
+        )
+        """)
+
+
+def ensure_grade_store(conn):
+    """确保职级历史表及其索引、最新职级视图和同步触发器存在
+
+    返回职级历史表是否可用（旧版本技能评分模块按 employee_id 建的职级历史表不可用）。
+    员工表的职级年份列或同步逻辑版本变化时，重建触发器并重新同步一次；
+    其余情况下只做一次元数据查询。
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'employees' not in tables:
+        return False
+    if 'employee_grades' not in tables:
+        conn.execute(_GRADE_HISTORY_TABLE)
+    elif 'employee_no' not in _columns(conn, 'employee_grades'):
+        print("职级历史表缺少employee_no列，无法同步职级数据")
+        return False
+
+    years = legacy_grade_years(conn)
+    expected = {name for year in years for name, _ in _sync_triggers(year)}
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?", (f"{_TRIGGER_PREFIX}%",)
+    )}
+    has_view = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (LATEST_GRADE_VIEW,)
+    ).fetchone()
+    if existing == expected and has_view:
+        return True
+
+    for name in existing:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for sql in _INDEXES:
+        conn.execute(sql)
+    conn.execute(f"DROP VIEW IF EXISTS {LATEST_GRADE_VIEW}")
+    conn.execute(_LATEST_GRADE_VIEW_SQL)
+
+    _synchronize(conn, years)
+    for year in years:
+        for name, body in _sync_triggers(year):
+            conn.execute(f"CREATE TRIGGER {name} {body}")
+    conn.commit()
+    return True
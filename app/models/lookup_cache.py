@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict
+
+# 员工、考核项目等常用查找结果的读穿缓存。
+# 条目登记其依赖的表，数据修改提交后按表使依赖的条目失效（见 ConnectionManager.invalidate_lookups）。
+# 同一数据库文件的各线程连接共用一个缓存：后台任务修改数据后，界面线程不会读到旧值。
+
+# 缓存的最大条目数，超出时淘汰最久未使用的条目
+LOOKUP_CACHE_SIZE = 4096
+
+
+class LookupCache:
+    """有界LRU读穿缓存，按表失效，统计命中和未命中次数"""
+
+    def __init__(self, max_entries=LOOKUP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # 表 -> 依赖该表的条目键
+        self._keys_by_table = {}
+        # 表 -> 失效次数，加载期间表被修改时不缓存加载结果
+        self._generations = {}
+        # clear() 的次数，作用同上
+        self._epoch = 0
+        self._stats = {}
+
+    def _count(self, name, field):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = {'hits': 0, 'misses': 0}
+        stats[field] += 1
+
+    def get(self, tables, key, loader):
+        """读取缓存，未命中时调用 loader() 加载并缓存
+
+        tables为条目依赖的表名元组，key的第一项为统计名称（一般是方法名）。
+        loader返回None时不缓存（如查询出错），下次重新加载。
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._count(key[0], 'hits')
+                return self._entries[key]
+            self._count(key[0], 'misses')
+            version = self._version(tables)
+
+        value = loader()
+        if value is None:
+            return None
+
+        with self._lock:
+            # 加载期间依赖的表已被修改，结果可能是旧数据
+            if version != self._version(tables):
+                return value
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+        return value
+
+    def _version(self, tables):
+        return self._epoch, [self._generations.get(table, 0) for table in tables]
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        for keys in self._keys_by_table.values():
+            keys.discard(key)
+
+    def invalidate(self, *tables):
+        """使依赖这些表的条目失效"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in self._keys_by_table.pop(table, ()):
+                    self._discard(key)
+
+    def clear(self):
+        """丢弃所有条目（恢复数据库或回滚后调用）"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self):
+        """各项查找的命中统计 {名称: {'hits', 'misses', 'hit_rate'}}，以及条目数"""
+        with self._lock:
+            result = {
+                name: dict(stats, hit_rate=stats['hits'] / (stats['hits'] + stats['misses']))
+                for name, stats in self._stats.items()
+            }
+            return {'entries': len(self._entries), 'lookups': result}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def lookup_cache_for(db_path):
+    """数据库文件共用的查找缓存（内存数据库每个连接各自独立，不共用）"""
+    if db_path == ':memory:':
+        return LookupCache()
+    path = os.path.abspath(db_path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = LookupCache()
+        return cache
@@ -1,8 +1,14 @@
 import sqlite3
 import os
 import datetime
-import pandas as pd
-import numpy as np
+
+from app.models.aggregates import ensure_aggregates, read_statistics
+from app.models.aut_import import import_department_scores
+from app.models.connection import acquire_connection, release_connection
+from app.models.data_events import DELETE, INSERT, RESET, UPDATE
+from app.models.grades import ensure_grade_store
+from app.models.queries import QUERIES
+from app.models.schema import ensure_schema
 
 class EmployeeDatabase:
     def __init__(self, db_path='employee_db.sqlite'):
@@ -14,37 +20,24 @@ class EmployeeDatabase:
     def connect(self):
         """连接到数据库"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # 同一数据库文件的各数据库类共用一个连接
+            self.manager = acquire_connection(self.db_path)
+            self.conn = self.manager.conn
             self.cursor = self.conn.cursor()
             print(f"成功连接到数据库: {self.db_path}")
             
-            # 确保职级历史表存在
-            self._create_grade_history_table()
-            # 确保技能评分相关表存在
-            self._create_skill_tables()
+            # 确保技能评分相关表、查询索引等存在（每个进程只检查一次）
+            self.manager.prepare_schema(type(self), self.refresh_schema)
         except sqlite3.Error as e:
             print(f"数据库连接失败: {e}")
+
+    def refresh_schema(self):
+        """确保技能评分相关表、查询索引、职级历史表和统计汇总表存在"""
+        self._create_skill_tables()
+        ensure_schema(self.conn)
+        ensure_grade_store(self.conn)
+        ensure_aggregates(self.conn)
             
-    def _create_grade_history_table(self):
-        """创建职级历史表（如果不存在）"""
-        try:
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS employee_grades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                year INTEGER NOT NULL,
-                grade TEXT NOT NULL,
-                comment TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
-                UNIQUE(employee_id, year)
-            )
-            ''')
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"创建职级历史表失败: {e}")
-    
     def _create_skill_tables(self):
         """创建技能评分相关表（如果不存在）"""
         try:
@@ -100,15 +93,21 @@ class EmployeeDatabase:
             )
             ''')
             
-            self.conn.commit()
+            self.manager.commit()
         except sqlite3.Error as e:
             print(f"创建技能评分相关表失败: {e}")
             
     def close(self):
         """关闭数据库连接"""
         if self.conn:
-            self.conn.close()
+            release_connection(self.manager)
+            self.conn = None
+            self.cursor = None
             print("数据库连接已关闭")
+
+    def transaction(self):
+        """事务上下文管理器，块内的多个操作只在结束时提交一次"""
+        return self.manager.transaction()
     
     def get_all_employees(self):
         """获取所有员工信息"""
@@ -128,16 +127,9 @@ class EmployeeDatabase:
         """获取员工的技能评分"""
         try:
             if year:
-                self.cursor.execute("""
-                SELECT * FROM skill_scores 
-                WHERE employee_id = ? AND year = ?
-                """, (employee_id, year))
+                self.cursor.execute(QUERIES['skill_scores.by_employee_year'], (employee_id, year))
             else:
-                self.cursor.execute("""
-                SELECT * FROM skill_scores 
-                WHERE employee_id = ? 
-                ORDER BY year DESC
-                """, (employee_id,))
+                self.cursor.execute(QUERIES['skill_scores.by_employee'], (employee_id,))
             
             columns = [desc[0] for desc in self.cursor.description]
             scores = []
@@ -152,10 +144,7 @@ class EmployeeDatabase:
     def get_employee_skill_details(self, skill_score_id):
         """获取技能评分的详细数据"""
         try:
-            self.cursor.execute("""
-            SELECT * FROM skill_detail_scores 
-            WHERE skill_score_id = ?
-            """, (skill_score_id,))
+            self.cursor.execute(QUERIES['skill_detail_scores.by_skill_score'], (skill_score_id,))
             
             columns = [desc[0] for desc in self.cursor.description]
             details = []
@@ -179,10 +168,7 @@ class EmployeeDatabase:
                 year = result[0] if result and result[0] else datetime.datetime.now().year
             
             # 获取各职级的员工数量
-            self.cursor.execute("""
-            SELECT evaluated_grade, COUNT(*) FROM skill_scores
-            WHERE year = ? GROUP BY evaluated_grade
-            """, (year,))
+            self.cursor.execute(QUERIES['skill_scores.grade_counts_by_year'], (year,))
             
             stats['grade_distribution'] = {row[0]: row[1] for row in self.cursor.fetchall()}
             
@@ -223,10 +209,9 @@ class EmployeeDatabase:
     def get_operation_logs(self, limit=100):
         """获取操作日志"""
         try:
-            self.cursor.execute(
-                "SELECT * FROM operation_logs ORDER BY timestamp DESC LIMIT ?", 
-                (limit,)
-            )
+            # 先写入缓存中尚未保存的日志
+            self.manager.audit_log.flush()
+            self.cursor.execute(QUERIES['operation_logs.latest'], (limit,))
             columns = [desc[0] for desc in self.cursor.description]
             logs = []
             for row in self.cursor.fetchall():
@@ -237,15 +222,15 @@ class EmployeeDatabase:
             print(f"获取操作日志失败: {e}")
             return []
     
-    def log_operation(self, user, operation, details):
-        """记录操作日志"""
+    def log_operation(self, user, operation, details, commit=True):
+        """记录操作日志
+
+        commit为False时只写入不提交，由调用方与数据修改一起提交。
+        """
         try:
-            timestamp = datetime.datetime.now()
-            self.cursor.execute('''
-            INSERT INTO operation_logs (user, operation, details, timestamp)
-            VALUES (?, ?, ?, ?)
-            ''', (user, operation, details, timestamp))
-            self.conn.commit()
+            self.manager.audit_log.record(user, operation, details)
+            if commit:
+                self.manager.commit()
             return True
         except sqlite3.Error as e:
             print(f"记录操作日志失败: {e}")
@@ -254,25 +239,8 @@ class EmployeeDatabase:
     def get_statistics(self):
         """获取统计数据"""
         try:
-            stats = {}
-            
-            # 员工总数
-            self.cursor.execute("SELECT COUNT(*) FROM employees")
-            stats['total_employees'] = self.cursor.fetchone()[0]
-            
-            # 部门分布
-            self.cursor.execute("SELECT department, COUNT(*) FROM employees GROUP BY department")
-            stats['department_distribution'] = {row[0]: row[1] for row in self.cursor.fetchall()}
-            
-            # 职级分布
-            grade_years = ['grade_2020', 'grade_2021', 'grade_2022', 'grade_2023', 'grade_2024', 'grade_2025']
-            stats['grade_distribution'] = {}
-            
-            for year in grade_years:
-                self.cursor.execute(f"SELECT {year}, COUNT(*) FROM employees WHERE {year} != '' GROUP BY {year}")
-                stats['grade_distribution'][year] = {row[0]: row[1] for row in self.cursor.fetchall()}
-            
-            return stats
+            # 汇总表由触发器随数据修改同步更新，读取量与员工人数无关
+            return read_statistics(self.conn)
         except sqlite3.Error as e:
             print(f"获取统计数据失败: {e}")
             return {}
@@ -280,7 +248,7 @@ class EmployeeDatabase:
     def get_employee_by_id(self, employee_id):
         """通过ID获取员工信息"""
         try:
-            self.cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
+            self.cursor.execute(QUERIES['employees.by_id'], (employee_id,))
             columns = [desc[0] for desc in self.cursor.description]
             row = self.cursor.fetchone()
             if row:
@@ -314,7 +282,7 @@ class EmployeeDatabase:
         """更新员工信息"""
         try:
             # 获取更新前的员工信息用于日志记录
-            self.cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
+            self.cursor.execute(QUERIES['employees.by_id'], (employee_id,))
             old_data = dict(zip([desc[0] for desc in self.cursor.description], self.cursor.fetchone()))
             if not old_data:
                 return False
@@ -336,7 +304,6 @@ class EmployeeDatabase:
             
             query = f"UPDATE employees SET {', '.join(set_clauses)} WHERE id = ?"
             self.cursor.execute(query, values)
-            self.conn.commit()
             
             # 构建详细的日志信息，记录修改的字段和修改前后的值
             changes = []
@@ -349,17 +316,46 @@ class EmployeeDatabase:
             log_details = f"更新员工: {old_data['name']} (ID: {employee_id}), 修改内容: {change_details}"
             
             # 记录操作日志
-            self.log_operation(user, '更新员工信息', log_details)
+            if not self.log_operation(user, '更新员工信息', log_details, commit=False):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            new_employee_no = updated_data.get('employee_no', old_data['employee_no'])
+            if new_employee_no != old_data['employee_no']:
+                self.manager.record_change('employees', old_data['employee_no'], DELETE)
+                self.manager.record_change('employees', new_employee_no, INSERT)
+            else:
+                self.manager.record_change('employees', new_employee_no, UPDATE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"更新员工信息失败: {e}")
             return False
             
-    def import_skill_scores(self, file_path, year, user="系统"):
-        """导入技能评分数据 - 简化实现"""
-        print(f"导入技能评分数据: {file_path}")
-        self.log_operation(user, '导入技能评分', f"从{file_path}导入{year}年技能评分数据")
-        return {'success': True, 'added': 0}
+    def import_skill_scores(self, file_path, year, user="系统", progress=None):
+        """导入AUT部门.csv格式的技能评分数据（见 aut_import.import_department_scores）
+
+        评分和操作日志在同一事务中提交；progress(已处理行数, 估计总行数)用于显示进度，
+        它抛出异常（如后台任务被取消）时回滚全部写入并继续抛出。
+        """
+        try:
+            count_added = import_department_scores(self.conn, file_path, year, progress=progress)
+            if not self.log_operation(
+                user, '导入技能评分',
+                f"从{os.path.basename(file_path)}导入{year}年技能评分数据，成功添加/更新{count_added}条记录",
+                commit=False
+            ):
+                raise sqlite3.Error("记录导入日志失败")
+            self.manager.commit()
+            self.manager.record_change('employees', None, RESET)
+            self.manager.record_change('skill_scores', None, RESET)
+            return {'success': True, 'added': count_added}
+        except (sqlite3.Error, ValueError, OSError) as e:
+            self.manager.rollback()
+            print(f"导入技能评分失败: {e}")
+            return {'success': False, 'added': 0}
+        except Exception:
+            self.manager.rollback()
+            raise
         
     def import_skill_thresholds(self, file_path, year, user="系统"):
         """导入职级阈值数据 - 简化实现"""
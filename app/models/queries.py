@@ -0,0 +1,213 @@
+# 命名的参数化SQL语句注册表
+#
+# sqlite3 按SQL文本缓存已编译的语句（见 connection.STATEMENT_CACHE_SIZE），
+# 高频调用的方法通过名称取用这里的语句，保证每次执行的文本完全相同，重复执行时不再重新解析。
+# 参数一律用 ? 占位，不要把值或列名拼接进语句。这里只登记实际执行的语句，
+# 所有语句同时用于检查查询计划（check_query_plans.py）。
+
+# 员工搜索框匹配的列（与全文索引employees_fts的列一致）
+EMPLOYEE_SEARCH_COLUMNS = ['name', 'employee_no', 'gid', 'department', 'notes']
+
+# 按搜索列模糊匹配的条件，每列一个参数
+EMPLOYEE_SEARCH_LIKE = "(" + " OR ".join(
+    f"{column} LIKE ? ESCAPE '\\'" for column in EMPLOYEE_SEARCH_COLUMNS
+) + ")"
+
+QUERIES = {
+    # database.py
+    'employees.by_id': "SELECT * FROM employees WHERE id = ?",
+    'employees.by_no': "SELECT * FROM employees WHERE employee_no = ?",
+    'employees.name_by_id': "SELECT name FROM employees WHERE id = ?",
+    'employees.no_by_id': "SELECT employee_no FROM employees WHERE id = ?",
+    'employees.name_by_no': "SELECT name FROM employees WHERE employee_no = ?",
+    'employees.department_by_no': "SELECT department FROM employees WHERE employee_no = ?",
+    'employees.departments': "SELECT DISTINCT department FROM employees WHERE department IS NOT NULL AND department != '' ORDER BY department",
+    'employees.statuses': "SELECT DISTINCT status FROM employees WHERE status IS NOT NULL AND status != '' ORDER BY status",
+    'employees.delete_by_id': "DELETE FROM employees WHERE id = ?",
+    'employees.delete_by_no': "DELETE FROM employees WHERE employee_no = ?",
+    # 员工列表（最新职级为计算列），筛选条件、排序和分页由 EmployeeDatabase._employee_list_query 追加
+    'employees.list': """
+        SELECT rowid AS row_id, employee_no, gid, name, department,
+               COALESCE((
+                   SELECT l.grade || ' (' || l.year || ')' FROM employee_latest_grades l
+                   WHERE l.employee_no = employees.employee_no
+               ), '') AS latest_grade, status, notes
+        FROM employees
+    """,
+    # 先在全文索引中按bm25相关度取前若干条，再回表取完整记录
+    'employees.search_fts': """
+        SELECT e.* FROM (
+            SELECT rowid, rank FROM employees_fts
+            WHERE employees_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        ) AS f
+        JOIN employees e ON e.rowid = f.rowid
+        ORDER BY f.rank
+    """,
+    'employees.search_like': f"SELECT * FROM employees WHERE {EMPLOYEE_SEARCH_LIKE} ORDER BY employee_no LIMIT ?",
+    'employee_grades.by_id': "SELECT employee_no, year, grade FROM employee_grades WHERE id = ?",
+    'employee_grades.by_employee_no': "SELECT * FROM employee_grades WHERE employee_no = ? ORDER BY year DESC",
+    # 某年（含）之前最近一年的职级，用于确定考核年度的当前职级
+    'employee_grades.current_by_no': """
+        SELECT grade, year FROM employee_grades
+        WHERE employee_no = ? AND year <= ? AND grade != ''
+        ORDER BY year DESC LIMIT 1
+    """,
+    # 某年有职级的员工按 (该年职级, 前一年职级) 分组的人数，用于晋升分析
+    'employee_grades.year_over_year': """
+        SELECT cur.grade, COALESCE(prev.grade, ''), COUNT(*)
+        FROM employee_grades cur
+        JOIN employees e ON e.employee_no = cur.employee_no
+        LEFT JOIN employee_grades prev ON prev.employee_no = cur.employee_no AND prev.year = ?
+        WHERE cur.year = ? AND cur.grade != ''
+        GROUP BY 1, 2
+    """,
+    'employee_grades.delete_by_id': "DELETE FROM employee_grades WHERE id = ?",
+    'employee_grades.upsert_by_no': """
+        INSERT INTO employee_grades (employee_no, year, grade, comment) VALUES (?, ?, ?, ?)
+        ON CONFLICT(employee_no, year) DO UPDATE SET
+            grade = excluded.grade, comment = excluded.comment, updated_at = CURRENT_TIMESTAMP
+    """,
+    'operation_logs.latest': "SELECT * FROM operation_logs ORDER BY timestamp DESC LIMIT ?",
+    'operation_logs.after_id': "SELECT * FROM operation_logs WHERE id > ? ORDER BY id DESC LIMIT ?",
+    # score_database.py
+    'assessment_items.all': "SELECT * FROM department_assessment_items ORDER BY department, assessment_name",
+    'assessment_items.by_department': "SELECT * FROM department_assessment_items WHERE department = ? ORDER BY department, assessment_name",
+    'assessment_items.by_id': "SELECT * FROM department_assessment_items WHERE id = ?",
+    'assessment_items.by_name': "SELECT id FROM department_assessment_items WHERE department = ? AND assessment_name = ?",
+    'assessment_items.name_by_id': "SELECT assessment_name FROM department_assessment_items WHERE id = ?",
+    'assessment_items.delete_by_id': "DELETE FROM department_assessment_items WHERE id = ?",
+    'grade_formulas.all': "SELECT * FROM department_grade_formulas ORDER BY department",
+    'grade_formulas.by_department': "SELECT * FROM department_grade_formulas WHERE department = ?",
+    'grade_formulas.id_by_department': "SELECT id FROM department_grade_formulas WHERE department = ?",
+    'grade_formulas.updated_at_by_department': "SELECT updated_at FROM department_grade_formulas WHERE department = ?",
+    'grade_formulas.update': """
+        UPDATE department_grade_formulas SET formula = ?, description = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE department = ?
+    """,
+    'grade_formulas.insert': "INSERT INTO department_grade_formulas (department, formula, description) VALUES (?, ?, ?)",
+    'employee_scores.by_employee': """
+        SELECT s.*, a.assessment_name, a.department, a.weight, a.max_score
+        FROM employee_scores s
+        JOIN department_assessment_items a ON s.assessment_item_id = a.id
+        WHERE s.employee_no = ?
+        ORDER BY s.assessment_year DESC, a.department, a.assessment_name
+    """,
+    'employee_scores.by_employee_year': """
+        SELECT s.*, a.assessment_name, a.department, a.weight, a.max_score
+        FROM employee_scores s
+        JOIN department_assessment_items a ON s.assessment_item_id = a.id
+        WHERE s.employee_no = ? AND s.assessment_year = ?
+        ORDER BY a.department, a.assessment_name
+    """,
+    'employee_scores.by_department_year': """
+        SELECT s.*, e.name as employee_name, e.employee_no,
+               a.assessment_name, a.weight, a.max_score
+        FROM employee_scores s
+        JOIN employees e ON s.employee_no = e.employee_no
+        JOIN department_assessment_items a ON s.assessment_item_id = a.id
+        WHERE e.department = ? AND s.assessment_year = ?
+        ORDER BY e.name, a.assessment_name
+    """,
+    # 部门员工某年的各项成绩和权重，按工号排列，用于计算加权总分
+    'employee_scores.department_totals': """
+        SELECT e.employee_no, e.name AS employee_name,
+               a.assessment_name, s.score, a.weight
+        FROM employees e
+        JOIN employee_scores s ON s.employee_no = e.employee_no AND s.assessment_year = ?
+        JOIN department_assessment_items a ON s.assessment_item_id = a.id
+        WHERE e.department = ?
+        ORDER BY e.employee_no, a.department, a.assessment_name
+    """,
+    'employee_scores.lookup': "SELECT id FROM employee_scores WHERE employee_no = ? AND assessment_year = ? AND assessment_item_id = ?",
+    'employee_scores.insert': """
+        INSERT INTO employee_scores (employee_no, assessment_year, assessment_item_id, score, comment, created_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    # 批量保存时先按键更新已有成绩，再插入其余成绩，两条语句的影响行数即更新和新增的条数
+    'employee_scores.update_by_key': """
+        UPDATE employee_scores SET score = ?, comment = ?, created_by = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE employee_no = ? AND assessment_year = ? AND assessment_item_id = ?
+    """,
+    'employee_scores.insert_missing': """
+        INSERT INTO employee_scores (employee_no, assessment_year, assessment_item_id, score, comment, created_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(employee_no, assessment_year, assessment_item_id) DO NOTHING
+    """,
+    # 部门员工（按姓名排序）及其某年的全部成绩，每名员工每个有成绩的项目一行，没有成绩的员工一行
+    'employee_scores.department_matrix': """
+        SELECT e.employee_no, e.name, l.grade, s.assessment_item_id, s.score
+        FROM employees e
+        LEFT JOIN employee_latest_grades l ON l.employee_no = e.employee_no
+        LEFT JOIN employee_scores s ON s.employee_no = e.employee_no AND s.assessment_year = ?
+        WHERE e.department = ?
+        ORDER BY e.name, e.employee_no
+    """,
+    'employee_scores.update_by_id': """
+        UPDATE employee_scores SET score = ?, comment = ?, created_by = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """,
+    'predicted_grades.by_employee_year': "SELECT * FROM predicted_grades WHERE employee_no = ? AND assessment_year = ?",
+    'predicted_grades.detail_by_employee_year': """
+        SELECT p.*, e.name as employee_name, e.employee_no, e.department
+        FROM predicted_grades p
+        JOIN employees e ON p.employee_no = e.employee_no
+        WHERE p.employee_no = ? AND p.assessment_year = ?
+    """,
+    'predicted_grades.by_department_year': """
+        SELECT p.*, e.name as employee_name, e.employee_no, e.department
+        FROM predicted_grades p
+        JOIN employees e ON p.employee_no = e.employee_no
+        WHERE e.department = ? AND p.assessment_year = ?
+        ORDER BY e.name
+    """,
+    'employees.count_in_department': "SELECT COUNT(*) FROM employees WHERE department = ?",
+    'employees.department_names': "SELECT DISTINCT department FROM employees WHERE department != '' ORDER BY department",
+    'employees.by_department_name': """
+        SELECT e.*, l.grade AS latest_grade FROM employees e
+        LEFT JOIN employee_latest_grades l ON l.employee_no = e.employee_no
+        WHERE e.department = ? ORDER BY e.name
+    """,
+    'employees.basic_by_no': "SELECT employee_no, name, department FROM employees WHERE employee_no = ?",
+    'employees.info_by_no': """
+        SELECT e.employee_no, e.name, e.department, l.grade, l.year FROM employees e
+        LEFT JOIN employee_latest_grades l ON l.employee_no = e.employee_no
+        WHERE e.employee_no = ?
+    """,
+    'employee_grades.current_by_department': """
+        SELECT e.employee_no, (
+            SELECT g.grade FROM employee_grades g
+            WHERE g.employee_no = e.employee_no AND g.year <= ? AND g.grade != ''
+            ORDER BY g.year DESC LIMIT 1
+        ) FROM employees e WHERE e.department = ?
+    """,
+    # min_database.py
+    'skill_scores.by_employee': "SELECT * FROM skill_scores WHERE employee_id = ? ORDER BY year DESC",
+    'skill_scores.by_employee_year': "SELECT * FROM skill_scores WHERE employee_id = ? AND year = ?",
+    'skill_scores.grade_counts_by_year': "SELECT evaluated_grade, COUNT(*) FROM skill_scores WHERE year = ? GROUP BY evaluated_grade",
+    'skill_detail_scores.by_skill_score': "SELECT * FROM skill_detail_scores WHERE skill_score_id = ?",
+    # aut_grading.py
+    'skill_thresholds.by_year': """
+        SELECT grade, basic_knowledge_min, position_skill_min, cross_department_min,
+               technician_skill_min, management_skill_min, total_min
+        FROM skill_thresholds WHERE year = ? ORDER BY total_min DESC
+    """,
+    'skill_scores.grading_by_year': """
+        SELECT id, COALESCE(basic_knowledge_score, 0), COALESCE(position_skill_score, 0),
+               COALESCE(cross_department_score, 0), COALESCE(technician_skill_score, 0),
+               COALESCE(management_skill_score, 0), COALESCE(total_score, 0)
+        FROM skill_scores WHERE year = ?
+    """,
+    # 职级未变化的记录不改写
+    'skill_scores.set_grade': "UPDATE skill_scores SET evaluated_grade = ? WHERE id = ? AND evaluated_grade IS NOT ?",
+    # 职级未变化的记录不改写（也不触发同步员工表和汇总表的触发器）
+    'employee_grades.upsert_from_skill_scores': """
+        INSERT INTO employee_grades (employee_no, year, grade, comment)
+        SELECT e.employee_no, s.year, s.evaluated_grade, ? FROM skill_scores s
+        JOIN employees e ON e.id = s.employee_id
+        WHERE s.year = ? AND COALESCE(s.total_score, 0) > 0
+        ON CONFLICT(employee_no, year) DO UPDATE SET
+            grade = excluded.grade, comment = excluded.comment, updated_at = CURRENT_TIMESTAMP
+        WHERE employee_grades.grade IS NOT excluded.grade
+    """,
+}
@@ -0,0 +1,126 @@
+import re
+import sqlite3
+
+from app.models.queries import QUERIES
+
+# 数据库结构版本记录在 PRAGMA user_version 中。
+# 每个版本为 (版本号, 说明, [(索引名, 表名, 列)])，只能追加新版本，不要修改已发布的版本。
+MIGRATIONS = [
+    (1, "员工列表筛选索引", [
+        ('idx_employees_employee_no', 'employees', 'employee_no'),
+        ('idx_employees_department', 'employees', 'department'),
+        ('idx_employees_status', 'employees', 'status'),
+    ]),
+    (2, "成绩、预测职级、日志和技能评分查询索引", [
+        # 按部门列出员工时按姓名排序
+        ('idx_employees_department_name', 'employees', 'department, name'),
+        # 删除考核项目时查找关联成绩；按年份和项目汇总成绩
+        ('idx_employee_scores_item', 'employee_scores', 'assessment_item_id'),
+        ('idx_employee_scores_year_item', 'employee_scores', 'assessment_year, assessment_item_id, employee_no, score'),
+        ('idx_predicted_grades_year', 'predicted_grades', 'assessment_year, employee_no'),
+        ('idx_operation_logs_timestamp', 'operation_logs', 'timestamp, operation'),
+        ('idx_skill_scores_year_employee', 'skill_scores', 'year, employee_id'),
+        ('idx_skill_detail_scores_skill_score', 'skill_detail_scores', 'skill_score_id'),
+    ]),
+    (3, "按员工读取成绩的覆盖索引", [
+        # 部门成绩矩阵按员工连接成绩；唯一约束的索引不含分数，优化器会改用按年份的索引逐员工扫描
+        ('idx_employee_scores_employee_year', 'employee_scores', 'employee_no, assessment_year, assessment_item_id, score'),
+    ]),
+    (4, "员工列表分页、技能评分统计和职级阈值的排序索引", [
+        # 按部门或状态筛选的员工列表默认按工号分页，不再对筛选结果整体排序
+        ('idx_employees_department_no', 'employees', 'department, employee_no'),
+        ('idx_employees_status_no', 'employees', 'status, employee_no'),
+        # 按年份统计各职级人数时不再为 GROUP BY 临时排序
+        ('idx_skill_scores_year_grade', 'skill_scores', 'year, evaluated_grade'),
+        # 按年份读取阈值时按总分下限排列
+        ('idx_skill_thresholds_year_total', 'skill_thresholds', 'year, total_min'),
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """获取数据库当前的结构版本"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def ensure_schema(conn):
+    """按版本创建缺少的索引，返回升级后的版本号
+
+    索引所在的表还不存在时（例如技能评分表尚未创建）跳过该索引，
+    版本号停留在该版本之前，下次连接时再继续升级；之后版本中已有表的索引照常创建。
+    """
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    tables = _existing_tables(conn)
+    complete = True
+    for target_version, description, indexes in MIGRATIONS:
+        if target_version <= version:
+            continue
+
+        for name, table, columns in indexes:
+            if table in tables:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+            else:
+                complete = False
+
+        if not complete:
+            continue
+
+        conn.execute(f"PRAGMA user_version = {target_version}")
+        version = target_version
+        print(f"数据库结构已升级到版本{version}: {description}")
+    conn.commit()
+    return version
+
+
+# 查询计划检查的对象为语句注册表中的全部语句
+REGISTERED_QUERIES = QUERIES
+
+# 本身就需要读取整张表的语句，检查时不计为问题：{名称: 原因}
+EXPECTED_FULL_SCANS = {
+    'employees.list': "未筛选的员工列表读取全部员工，实际执行时再追加筛选、排序和分页",
+}
+
+# 查询计划中的全表扫描，例如 "SCAN employees"；"SCAN employees USING INDEX ..." 为按索引顺序扫描
+_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+# 子查询的结果，扫描它们不是扫描数据表
+_SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)$')
+# 对全部结果临时排序；"USE TEMP B-TREE FOR RIGHT PART OF ORDER BY" 只对索引顺序相同的各组排序，不在此列
+_TEMP_SORT = re.compile(r'^USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)$')
+
+
+def explain_query(conn, sql):
+    """返回查询计划中每一步的说明"""
+    params = [None] * sql.count('?')
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(conn, queries=None):
+    """检查查询计划，返回 [(名称, 查询计划, 全表扫描的表, 临时排序, 错误)]
+
+    queries默认为语句注册表中的全部语句。
+    """
+    results = []
+    for name, sql in (queries or REGISTERED_QUERIES).items():
+        try:
+            plan = explain_query(conn, sql)
+        except sqlite3.Error as e:
+            # 表不存在等情况
+            results.append((name, [], [], [], str(e)))
+            continue
+        subqueries = {match.group(1) for match in map(_SUBQUERY.match, plan) if match}
+        full_scans = [
+            match.group(1) for match in map(_FULL_SCAN.match, plan)
+            if match and match.group(1) not in subqueries
+        ]
+        temp_sorts = [match.group(1) for match in map(_TEMP_SORT.match, plan) if match]
+        results.append((name, plan, full_scans, temp_sorts, None))
+    return results
@@ -2,8 +2,14 @@ import sqlite3
 import os
 import datetime
 import json
-import pandas as pd
-import numpy as np
+
+from app.models.aggregates import ensure_aggregates
+from app.models.connection import acquire_connection, release_connection
+from app.models.data_events import DELETE, INSERT, RESET, UPDATE
+from app.models.grade_formula import CompiledFormula
+from app.models.grades import ensure_grade_store
+from app.models.queries import QUERIES
+from app.models.schema import ensure_schema
 
 class ScoreDatabase:
     """成绩管理系统数据库类"""
@@ -17,15 +23,24 @@ class ScoreDatabase:
     def connect(self):
         """连接到数据库"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # 同一数据库文件的各数据库类共用一个连接
+            self.manager = acquire_connection(self.db_path)
+            self.conn = self.manager.conn
             self.cursor = self.conn.cursor()
             print(f"成功连接到数据库: {self.db_path}")
             
-            # 确保所有表都存在
-            self._create_tables()
+            # 确保所有表和查询索引都存在（每个进程只检查一次）
+            self.manager.prepare_schema(type(self), self.refresh_schema)
         except sqlite3.Error as e:
             print(f"数据库连接失败: {e}")
     
+    def refresh_schema(self):
+        """确保所有表、查询索引和统计汇总表存在（首次连接时或恢复数据库后调用）"""
+        self._create_tables()
+        ensure_schema(self.conn)
+        ensure_grade_store(self.conn)
+        ensure_aggregates(self.conn)
+
     def _create_tables(self):
         """创建必要的数据表"""
         # 创建部门考核项目表
@@ -43,7 +58,7 @@ class ScoreDatabase:
         # 创建员工成绩详情表
         self._create_employee_score_details_table()
         
-        self.conn.commit()
+        self.manager.commit()
         
     def _create_department_assessment_items_table(self):
         """创建部门考核项目表"""
@@ -60,7 +75,7 @@ class ScoreDatabase:
                 UNIQUE(department, assessment_name)
             )
             ''')
-            self.conn.commit()
+            self.manager.commit()
         except sqlite3.Error as e:
             print(f"创建部门考核项目表失败: {e}")
             
@@ -77,7 +92,7 @@ class ScoreDatabase:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
             ''')
-            self.conn.commit()
+            self.manager.commit()
         except sqlite3.Error as e:
             print(f"创建部门职级计算公式表失败: {e}")
             
@@ -99,7 +114,7 @@ class ScoreDatabase:
                 UNIQUE(employee_no, assessment_year, assessment_item_id)
             )
             ''')
-            self.conn.commit()
+            self.manager.commit()
         except sqlite3.Error as e:
             print(f"创建员工考核成绩表失败: {e}")
             
@@ -120,7 +135,7 @@ class ScoreDatabase:
                 UNIQUE(employee_no, assessment_year)
             )
             ''')
-            self.conn.commit()
+            self.manager.commit()
         except sqlite3.Error as e:
             print(f"创建预测职级表失败: {e}")
     
@@ -143,22 +158,37 @@ class ScoreDatabase:
     def close(self):
         """关闭数据库连接"""
         if self.conn:
-            self.conn.close()
+            release_connection(self.manager)
+            self.conn = None
+            self.cursor = None
             print("数据库连接已关闭")
+
+    def transaction(self):
+        """事务上下文管理器，块内的多个操作只在结束时提交一次
+
+        用法:
+            with db.transaction():
+                db.save_employee_score(...)
+                db.calculate_predicted_grade(...)
+        """
+        return self.manager.transaction()
     
     # 部门考核项目管理方法
     def get_all_assessment_items(self, department=None):
-        """获取所有考核项目，可按部门筛选"""
+        """获取所有考核项目，可按部门筛选（经查找缓存，返回副本）"""
+        items = self.manager.lookup_cache.get(
+            ('department_assessment_items',), ('get_all_assessment_items', department),
+            lambda: self._query_assessment_items(department)
+        )
+        return [dict(item) for item in items] if items is not None else []
+    
+    def _query_assessment_items(self, department):
+        """查询考核项目，出错时返回None"""
         try:
             if department:
-                self.cursor.execute(
-                    "SELECT * FROM department_assessment_items WHERE department = ? ORDER BY department, assessment_name",
-                    (department,)
-                )
+                self.cursor.execute(QUERIES['assessment_items.by_department'], (department,))
             else:
-                self.cursor.execute(
-                    "SELECT * FROM department_assessment_items ORDER BY department, assessment_name"
-                )
+                self.cursor.execute(QUERIES['assessment_items.all'])
             
             columns = [desc[0] for desc in self.cursor.description]
             items = []
@@ -168,8 +198,20 @@ class ScoreDatabase:
             return items
         except sqlite3.Error as e:
             print(f"获取考核项目失败: {e}")
-            return []
+            return None
     
+    def get_assessment_item(self, item_id):
+        """获取单个考核项目，不存在或出错时返回None"""
+        try:
+            self.cursor.execute(QUERIES['assessment_items.by_id'], (item_id,))
+            row = self.cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([desc[0] for desc in self.cursor.description], row))
+        except sqlite3.Error as e:
+            print(f"获取考核项目失败: {e}")
+            return None
+
     def add_assessment_item(self, item_data, user="系统"):
         """添加考核项目"""
         try:
@@ -183,20 +225,24 @@ class ScoreDatabase:
                 item_data.get('weight', 1.0),
                 item_data.get('max_score', 100.0)
             ))
-            self.conn.commit()
             
             # 获取新添加项目的ID
             self.cursor.execute("SELECT last_insert_rowid()")
             item_id = self.cursor.fetchone()[0]
             
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 '添加考核项目', 
-                f"添加考核项目: {item_data.get('assessment_name')} 到部门 {item_data.get('department')}"
-            )
+                f"添加考核项目: {item_data.get('assessment_name')} 到部门 {item_data.get('department')}",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('department_assessment_items', item_id, INSERT)
             return item_id
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"添加考核项目失败: {e}")
             return None
     
@@ -204,7 +250,7 @@ class ScoreDatabase:
         """更新考核项目"""
         try:
             # 获取更新前的信息用于日志
-            self.cursor.execute("SELECT * FROM department_assessment_items WHERE id = ?", (item_id,))
+            self.cursor.execute(QUERIES['assessment_items.by_id'], (item_id,))
             old_data = dict(zip([desc[0] for desc in self.cursor.description], self.cursor.fetchone()))
             
             self.cursor.execute('''
@@ -222,7 +268,6 @@ class ScoreDatabase:
                 item_data.get('max_score', old_data['max_score']),
                 item_id
             ))
-            self.conn.commit()
             
             # 记录操作日志
             changes = []
@@ -230,13 +275,18 @@ class ScoreDatabase:
                 if key in item_data and item_data[key] != old_data[key]:
                     changes.append(f"{key}: '{old_data[key]}' → '{item_data[key]}'")
             
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 '更新考核项目', 
-                f"更新考核项目 ID: {item_id}, {', '.join(changes)}"
-            )
+                f"更新考核项目 ID: {item_id}, {', '.join(changes)}",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('department_assessment_items', item_id, UPDATE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"更新考核项目失败: {e}")
             return False
     
@@ -244,26 +294,32 @@ class ScoreDatabase:
         """删除考核项目"""
         try:
             # 获取要删除的项目信息用于日志
-            self.cursor.execute("SELECT * FROM department_assessment_items WHERE id = ?", (item_id,))
+            self.cursor.execute(QUERIES['assessment_items.by_id'], (item_id,))
             item_data = dict(zip([desc[0] for desc in self.cursor.description], self.cursor.fetchone()))
             
             # 执行删除
-            self.cursor.execute("DELETE FROM department_assessment_items WHERE id = ?", (item_id,))
-            self.conn.commit()
+            self.cursor.execute(QUERIES['assessment_items.delete_by_id'], (item_id,))
             
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 '删除考核项目', 
-                f"删除考核项目: {item_data['assessment_name']} (ID: {item_id}) 从部门 {item_data['department']}"
-            )
+                f"删除考核项目: {item_data['assessment_name']} (ID: {item_id}) 从部门 {item_data['department']}",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('department_assessment_items', item_id, DELETE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"删除考核项目失败: {e}")
             return False
     
     def import_assessment_items(self, file_path, user="系统"):
         """从Excel/CSV导入考核项目"""
+        # pandas和numpy只在导入和计算时使用，在函数内导入以加快程序启动
+        import pandas as pd
         try:
             if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
                 df = pd.read_excel(file_path)
@@ -327,10 +383,7 @@ class ScoreDatabase:
     def get_department_formula(self, department):
         """获取部门职级计算公式"""
         try:
-            self.cursor.execute(
-                "SELECT * FROM department_grade_formulas WHERE department = ?",
-                (department,)
-            )
+            self.cursor.execute(QUERIES['grade_formulas.by_department'], (department,))
             result = self.cursor.fetchone()
             if result:
                 columns = [desc[0] for desc in self.cursor.description]
@@ -343,6 +396,26 @@ class ScoreDatabase:
             print(f"获取部门公式失败: {e}")
             return None
     
+    def get_compiled_formula(self, department):
+        """获取部门公式及其编译结果（formula_data['compiled']），按公式更新时间缓存"""
+        try:
+            self.cursor.execute(QUERIES['grade_formulas.updated_at_by_department'], (department,))
+            result = self.cursor.fetchone()
+            if not result:
+                return None
+            cache = self.manager.formula_cache
+            formula_data = cache.get(department, result[0])
+            if formula_data is None:
+                formula_data = self.get_department_formula(department)
+                if not formula_data:
+                    return None
+                formula_data['compiled'] = CompiledFormula(formula_data['formula'])
+                cache.put(department, formula_data['updated_at'], formula_data)
+            return formula_data
+        except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+            print(f"编译部门公式失败: {e}")
+            return None
+    
     def save_department_formula(self, department, formula, description="", user="系统"):
         """保存部门职级计算公式"""
         try:
@@ -350,48 +423,43 @@ class ScoreDatabase:
             formula_json = json.dumps(formula)
             
             # 检查是否已存在该部门的公式
-            self.cursor.execute(
-                "SELECT id FROM department_grade_formulas WHERE department = ?",
-                (department,)
-            )
+            self.cursor.execute(QUERIES['grade_formulas.id_by_department'], (department,))
             result = self.cursor.fetchone()
             
             if result:
                 # 更新现有公式
-                self.cursor.execute('''
-                UPDATE department_grade_formulas SET 
-                    formula = ?, 
-                    description = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE department = ?
-                ''', (formula_json, description, department))
+                self.cursor.execute(
+                    QUERIES['grade_formulas.update'], (formula_json, description, department)
+                )
                 operation_type = '更新部门公式'
             else:
                 # 添加新公式
-                self.cursor.execute('''
-                INSERT INTO department_grade_formulas (
-                    department, formula, description
-                ) VALUES (?, ?, ?)
-                ''', (department, formula_json, description))
+                self.cursor.execute(
+                    QUERIES['grade_formulas.insert'], (department, formula_json, description)
+                )
                 operation_type = '添加部门公式'
             
-            self.conn.commit()
-            
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 operation_type, 
-                f"{operation_type}: {department}, 描述: {description}"
-            )
+                f"{operation_type}: {department}, 描述: {description}",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.formula_cache.invalidate(department)
+            self.manager.record_change('department_grade_formulas', department, UPDATE)
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"保存部门公式失败: {e}")
             return False
     
     def get_all_department_formulas(self):
         """获取所有部门的职级计算公式"""
         try:
-            self.cursor.execute("SELECT * FROM department_grade_formulas ORDER BY department")
+            self.cursor.execute(QUERIES['grade_formulas.all'])
             
             columns = [desc[0] for desc in self.cursor.description]
             formulas = []
@@ -410,21 +478,9 @@ class ScoreDatabase:
         """获取员工的考核成绩"""
         try:
             if assessment_year:
-                self.cursor.execute('''
-                SELECT s.*, a.assessment_name, a.department, a.weight, a.max_score
-                FROM employee_scores s
-                JOIN department_assessment_items a ON s.assessment_item_id = a.id
-                WHERE s.employee_no = ? AND s.assessment_year = ?
-                ORDER BY a.department, a.assessment_name
-                ''', (employee_no, assessment_year))
+                self.cursor.execute(QUERIES['employee_scores.by_employee_year'], (employee_no, assessment_year))
             else:
-                self.cursor.execute('''
-                SELECT s.*, a.assessment_name, a.department, a.weight, a.max_score
-                FROM employee_scores s
-                JOIN department_assessment_items a ON s.assessment_item_id = a.id
-                WHERE s.employee_no = ?
-                ORDER BY s.assessment_year DESC, a.department, a.assessment_name
-                ''', (employee_no,))
+                self.cursor.execute(QUERIES['employee_scores.by_employee'], (employee_no,))
             
             columns = [desc[0] for desc in self.cursor.description]
             scores = []
@@ -436,18 +492,54 @@ class ScoreDatabase:
             print(f"获取员工成绩失败: {e}")
             return []
     
+    def get_department_score_matrix(self, department, assessment_year):
+        """获取部门 员工 × 考核项目 的成绩矩阵
+
+        返回字典：
+            employees: [(工号, 姓名, 最新职级)]，按姓名排序，对应矩阵的行
+            items: 部门考核项目列表（同 get_all_assessment_items），对应矩阵的列
+            scores: float类型的NumPy数组，形状为 (员工数, 项目数)，没有成绩为NaN
+            employee_index / item_index: 工号 / 考核项目ID 到行号 / 列号的映射
+        失败时返回None。
+        """
+        import numpy as np
+        items = self.get_all_assessment_items(department)
+        try:
+            self.cursor.execute(QUERIES['employee_scores.department_matrix'], (assessment_year, department))
+            rows = self.cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"获取部门成绩矩阵失败: {e}")
+            return None
+
+        employees = []
+        employee_index = {}
+        score_rows, score_columns, score_values = [], [], []
+        item_index = {item['id']: column for column, item in enumerate(items)}
+        for employee_no, name, grade, item_id, score in rows:
+            row = employee_index.get(employee_no)
+            if row is None:
+                row = employee_index[employee_no] = len(employees)
+                employees.append((employee_no, name, grade))
+            column = item_index.get(item_id)
+            if column is not None and score is not None:
+                score_rows.append(row)
+                score_columns.append(column)
+                score_values.append(score)
+
+        scores = np.full((len(employees), len(items)), np.nan)
+        scores[score_rows, score_columns] = score_values
+        return {
+            'employees': employees,
+            'items': items,
+            'scores': scores,
+            'employee_index': employee_index,
+            'item_index': item_index,
+        }
+
     def get_department_employee_scores(self, department, assessment_year):
         """获取部门所有员工的某年度考核成绩"""
         try:
-            self.cursor.execute('''
-            SELECT s.*, e.name as employee_name, e.employee_no, 
-                   a.assessment_name, a.weight, a.max_score
-            FROM employee_scores s
-            JOIN employees e ON s.employee_no = e.employee_no
-            JOIN department_assessment_items a ON s.assessment_item_id = a.id
-            WHERE e.department = ? AND s.assessment_year = ?
-            ORDER BY e.name, a.assessment_name
-            ''', (department, assessment_year))
+            self.cursor.execute(QUERIES['employee_scores.by_department_year'], (department, assessment_year))
             
             columns = [desc[0] for desc in self.cursor.description]
             scores = []
@@ -463,10 +555,7 @@ class ScoreDatabase:
         """保存员工考核成绩"""
         try:
             # 检查是否已存在该成绩记录
-            self.cursor.execute('''
-            SELECT id FROM employee_scores 
-            WHERE employee_no = ? AND assessment_year = ? AND assessment_item_id = ?
-            ''', (
+            self.cursor.execute(QUERIES['employee_scores.lookup'], (
                 score_data.get('employee_no'),
                 score_data.get('assessment_year'),
                 score_data.get('assessment_item_id')
@@ -475,14 +564,7 @@ class ScoreDatabase:
             
             if result:
                 # 更新现有成绩
-                self.cursor.execute('''
-                UPDATE employee_scores SET 
-                    score = ?, 
-                    comment = ?,
-                    created_by = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                ''', (
+                self.cursor.execute(QUERIES['employee_scores.update_by_id'], (
                     score_data.get('score'),
                     score_data.get('comment', ''),
                     user,
@@ -491,12 +573,7 @@ class ScoreDatabase:
                 operation_type = '更新员工成绩'
             else:
                 # 添加新成绩
-                self.cursor.execute('''
-                INSERT INTO employee_scores (
-                    employee_no, assessment_year, assessment_item_id, 
-                    score, comment, created_by
-                ) VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
+                self.cursor.execute(QUERIES['employee_scores.insert'], (
                     score_data.get('employee_no'),
                     score_data.get('assessment_year'),
                     score_data.get('assessment_item_id'),
@@ -506,25 +583,81 @@ class ScoreDatabase:
                 ))
                 operation_type = '添加员工成绩'
             
-            self.conn.commit()
-            
             # 获取员工姓名和考核项目名称
             employee_name = self.get_employee_name(score_data.get('employee_no'))
             item_name = self._get_assessment_item_name(score_data.get('assessment_item_id'))
             
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 operation_type, 
-                f"{operation_type}: {employee_name}, {score_data.get('assessment_year')}年, 项目: {item_name}, 分数: {score_data.get('score')}"
+                f"{operation_type}: {employee_name}, {score_data.get('assessment_year')}年, 项目: {item_name}, 分数: {score_data.get('score')}",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change(
+                'employee_scores', (score_data.get('employee_no'), score_data.get('assessment_year')), UPDATE
             )
             return True
         except sqlite3.Error as e:
+            self.manager.rollback()
             print(f"保存员工成绩失败: {e}")
             return False
     
+    def save_employee_scores_bulk(self, rows, user="系统"):
+        """批量保存员工考核成绩
+
+        rows为成绩数据字典（同 save_employee_score）的列表，同一员工、年度、项目出现多次时以最后一条为准。
+        所有成绩在一个事务中先按键更新已有的，再插入其余的，只记录一条汇总操作日志。
+        返回 {'success': True, 'added': 新增条数, 'updated': 更新条数}，失败时返回False。
+        """
+        scores = {}
+        for score_data in rows:
+            key = (
+                score_data.get('employee_no'),
+                score_data.get('assessment_year'),
+                score_data.get('assessment_item_id')
+            )
+            scores[key] = (*key, score_data.get('score'), score_data.get('comment', ''), user)
+        if not scores:
+            return {'success': True, 'added': 0, 'updated': 0}
+
+        years = sorted({year for _, year, _ in scores})
+        try:
+            with self.manager.transaction():
+                # 立即取得写锁，两次写入之间其他连接不能插入同键的成绩
+                if not self.conn.in_transaction:
+                    self.cursor.execute("BEGIN IMMEDIATE")
+                # 更新和插入的影响行数即更新和新增的条数，不需要统计整年的成绩数
+                self.cursor.executemany(
+                    QUERIES['employee_scores.update_by_key'],
+                    ((score, comment, created_by, employee_no, year, item_id)
+                     for employee_no, year, item_id, score, comment, created_by in scores.values())
+                )
+                updated = self.cursor.rowcount
+                self.cursor.executemany(QUERIES['employee_scores.insert_missing'], scores.values())
+                added = self.cursor.rowcount
+
+                employee_count = len({employee_no for employee_no, _, _ in scores})
+                if not self._log_operation(
+                    user,
+                    '批量保存员工成绩',
+                    f"批量保存{'、'.join(str(year) for year in years)}年员工成绩: {employee_count}名员工, "
+                    f"新增{added}条, 更新{updated}条",
+                    commit=False
+                ):
+                    raise sqlite3.Error("记录操作日志失败")
+                self.manager.record_change('employee_scores', None, RESET)
+        except sqlite3.Error as e:
+            print(f"批量保存员工成绩失败: {e}")
+            return False
+
+        return {'success': True, 'added': added, 'updated': updated}
+
     def import_employee_scores(self, file_path, assessment_year, user="系统"):
         """从Excel/CSV导入员工成绩"""
+        import pandas as pd
         try:
             if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
                 df = pd.read_excel(file_path)
@@ -543,13 +676,19 @@ class ScoreDatabase:
             count_added = 0
             count_updated = 0
             errors = []
+
+            # 同一员工、同一考核项目只查询一次，逐行处理时复用查询结果
+            departments = {}
+            item_ids = {}
             
             for _, row in df.iterrows():
                 try:
                     # 获取员工部门
                     employee_no = str(row['employee_no']).strip()
-                    self.cursor.execute("SELECT department FROM employees WHERE employee_no = ?", (employee_no,))
-                    department_result = self.cursor.fetchone()
+                    if employee_no not in departments:
+                        self.cursor.execute(QUERIES['employees.department_by_no'], (employee_no,))
+                        departments[employee_no] = self.cursor.fetchone()
+                    department_result = departments[employee_no]
                     if not department_result:
                         errors.append(f"找不到工号为 {employee_no} 的员工")
                         continue
@@ -558,11 +697,11 @@ class ScoreDatabase:
                     # 获取考核项目ID
                     assessment_name = str(row['assessment_name']).strip()
                     
-                    self.cursor.execute(
-                        "SELECT id FROM department_assessment_items WHERE department = ? AND assessment_name = ?",
-                        (department, assessment_name)
-                    )
-                    item_result = self.cursor.fetchone()
+                    key = (department, assessment_name)
+                    if key not in item_ids:
+                        self.cursor.execute(QUERIES['assessment_items.by_name'], key)
+                        item_ids[key] = self.cursor.fetchone()
+                    item_result = item_ids[key]
                     if not item_result:
                         errors.append(f"找不到部门 {department} 的考核项目: {assessment_name}")
                         continue
@@ -578,10 +717,7 @@ class ScoreDatabase:
                     }
                     
                     # 检查是否已存在该成绩记录
-                    self.cursor.execute('''
-                    SELECT id FROM employee_scores 
-                    WHERE employee_no = ? AND assessment_year = ? AND assessment_item_id = ?
-                    ''', (
+                    self.cursor.execute(QUERIES['employee_scores.lookup'], (
                         score_data['employee_no'],
                         score_data['assessment_year'],
                         score_data['assessment_item_id']
@@ -590,14 +726,7 @@ class ScoreDatabase:
                     
                     if result:
                         # 更新现有成绩
-                        self.cursor.execute('''
-                        UPDATE employee_scores SET 
-                            score = ?, 
-                            comment = ?,
-                            created_by = ?,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                        ''', (
+                        self.cursor.execute(QUERIES['employee_scores.update_by_id'], (
                             score_data['score'],
                             score_data['comment'],
                             user,
@@ -606,12 +735,7 @@ class ScoreDatabase:
                         count_updated += 1
                     else:
                         # 添加新成绩
-                        self.cursor.execute('''
-                        INSERT INTO employee_scores (
-                            employee_no, assessment_year, assessment_item_id, 
-                            score, comment, created_by
-                        ) VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
+                        self.cursor.execute(QUERIES['employee_scores.insert'], (
                             score_data['employee_no'],
                             score_data['assessment_year'],
                             score_data['assessment_item_id'],
@@ -624,14 +748,16 @@ class ScoreDatabase:
                 except Exception as e:
                     errors.append(f"处理行 {row.name + 1} 时出错: {str(e)}")
             
-            self.conn.commit()
-            
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 '导入员工成绩', 
-                f"从{file_path}导入{assessment_year}年员工成绩，添加{count_added}条，更新{count_updated}条，错误{len(errors)}条"
-            )
+                f"从{file_path}导入{assessment_year}年员工成绩，添加{count_added}条，更新{count_updated}条，错误{len(errors)}条",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employee_scores', None, RESET)
             
             return {
                 'success': True,
@@ -640,6 +766,7 @@ class ScoreDatabase:
                 'errors': errors
             }
         except Exception as e:
+            self.manager.rollback()
             print(f"导入员工成绩失败: {e}")
             return False
     
@@ -648,31 +775,28 @@ class ScoreDatabase:
         """计算员工预测职级"""
         try:
             # 获取员工信息
-            self.cursor.execute(
-                "SELECT employee_no, name, department, grade_2023, grade_2024 FROM employees WHERE employee_no = ?", 
-                (employee_no,)
-            )
+            self.cursor.execute(QUERIES['employees.basic_by_no'], (employee_no,))
             employee = self.cursor.fetchone()
             if not employee:
                 print(f"找不到工号为 {employee_no} 的员工")
                 return False
             
-            employee_no, employee_name, department, grade_2023, grade_2024 = employee
+            employee_no, employee_name, department = employee
             
-            # 确定当前职级
-            current_grade = grade_2024 if grade_2024 else grade_2023
+            # 确定当前职级：考核年度（含）之前最近一年的职级
+            self.cursor.execute(QUERIES['employee_grades.current_by_no'], (employee_no, assessment_year))
+            current = self.cursor.fetchone()
+            current_grade = current[0] if current else ''
             if not current_grade:
                 print(f"员工 {employee_name} 没有当前职级信息")
                 return False
             
             # 获取部门公式
-            formula_data = self.get_department_formula(department)
+            formula_data = self.get_compiled_formula(department)
             if not formula_data:
                 print(f"部门 {department} 没有设置职级计算公式")
                 return False
             
-            formula = formula_data['formula']
-            
             # 获取员工所有考核项目成绩
             scores = self.get_employee_scores(employee_no, assessment_year)
             if not scores:
@@ -702,7 +826,7 @@ class ScoreDatabase:
             calculation_details['total'] = total_score
             
             # 根据公式计算预测职级
-            predicted_grade = self._apply_formula(total_score, current_grade, formula)
+            predicted_grade = formula_data['compiled'].grade(total_score, current_grade)
             calculation_details['predicted_grade'] = predicted_grade
             
             # 保存预测结果
@@ -719,14 +843,17 @@ class ScoreDatabase:
                 total_score,
                 json.dumps(calculation_details)
             ))
-            self.conn.commit()
             
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user, 
                 '计算预测职级', 
-                f"计算员工 {employee_name} {assessment_year}年预测职级: 从 {current_grade} 到 {predicted_grade}"
-            )
+                f"计算员工 {employee_name} {assessment_year}年预测职级: 从 {current_grade} 到 {predicted_grade}",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('predicted_grades', (employee_no, assessment_year), UPDATE)
             
             return {
                 'success': True,
@@ -738,16 +865,165 @@ class ScoreDatabase:
                 'calculation_details': calculation_details
             }
         except Exception as e:
+            self.manager.rollback()
             print(f"计算预测职级失败: {e}")
             return False
-    
+
+    def _department_totals(self, department, assessment_year):
+        """部门员工某年的加权总分和当前职级，没有成绩时返回None
+
+        返回 (成绩明细DataFrame, 以工号为索引的员工姓名DataFrame, 总分数组, 当前职级数组)，
+        没有当前职级的员工对应空字符串。
+        """
+        import numpy as np
+        import pandas as pd
+        df = pd.read_sql_query(
+            QUERIES['employee_scores.department_totals'], self.conn, params=(assessment_year, department)
+        )
+
+        if df.empty:
+            return None
+
+        df['weighted_score'] = df['score'] * df['weight']
+        # 结果已按工号排序，把每个员工的加权分摊成一行，再按列顺序累加，
+        # 保证浮点求和顺序与逐个员工计算时一致（阈值边界上的结果不会变化）
+        employee_nos = df['employee_no'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, employee_nos[1:] != employee_nos[:-1]])
+        counts = np.diff(np.r_[starts, len(df)])
+        rows = np.repeat(np.arange(len(starts)), counts)
+        positions = np.arange(len(df)) - np.repeat(starts, counts)
+        weighted_matrix = np.zeros((len(starts), counts.max()))
+        weighted_matrix[rows, positions] = df['weighted_score'].to_numpy(dtype=float)
+        totals = np.zeros(len(starts))
+        for column in weighted_matrix.T:
+            totals += column
+        employees = df.iloc[starts].set_index('employee_no')[['employee_name']]
+
+        # 当前职级取考核年度（含）之前最近一年的职级；没有职级的员工无法计算
+        current_by_employee = dict(self.cursor.execute(
+            QUERIES['employee_grades.current_by_department'], (assessment_year, department)
+        ).fetchall())
+        current_grades = np.array(
+            [current_by_employee.get(employee_no) or '' for employee_no in employees.index], dtype=object
+        )
+        return df, employees, totals, current_grades
+
+    def get_department_totals(self, department, assessment_year):
+        """部门员工某年的加权总分和当前职级（只读取，用于模拟职级公式）
+
+        返回 {'employee_nos', 'employee_names', 'totals', 'current_grades'}，后两项为NumPy数组；
+        没有成绩时各项为空，出错时返回None。
+        """
+        import numpy as np
+        try:
+            loaded = self._department_totals(department, assessment_year)
+            if loaded is None:
+                return {
+                    'employee_nos': [], 'employee_names': [],
+                    'totals': np.zeros(0), 'current_grades': np.zeros(0, dtype=object)
+                }
+            _, employees, totals, current_grades = loaded
+            return {
+                'employee_nos': employees.index.tolist(),
+                'employee_names': employees['employee_name'].tolist(),
+                'totals': totals,
+                'current_grades': current_grades
+            }
+        except Exception as e:
+            print(f"获取部门总分失败: {e}")
+            return None
+
+    def calculate_predicted_grades_bulk(self, department, assessment_year, user="系统"):
+        """批量计算部门所有员工的预测职级
+
+        公式只读取一次，所有员工成绩通过一次查询取出，总分与阈值匹配按列向量化计算，
+        预测结果在单个事务中写入并只记录一条汇总日志。
+        """
+        try:
+            formula_data = self.get_compiled_formula(department)
+            if not formula_data:
+                print(f"部门 {department} 没有设置职级计算公式")
+                return False
+
+            self.cursor.execute(QUERIES['employees.count_in_department'], (department,))
+            employee_count = self.cursor.fetchone()[0]
+
+            loaded = self._department_totals(department, assessment_year)
+            if loaded is None:
+                print(f"部门 {department} 没有 {assessment_year} 年的考核成绩")
+                return {'success': True, 'results': [], 'failed': employee_count}
+            df, employees, totals, current_grades = loaded
+            valid = current_grades != ''
+
+            predicted_grades = formula_data['compiled'].grades(totals, current_grades)
+
+            details_by_employee = {}
+            for employee_no, item, raw_score, weight, weighted_score in df[
+                    ['employee_no', 'assessment_name', 'score', 'weight', 'weighted_score']
+            ].itertuples(index=False, name=None):
+                details_by_employee.setdefault(employee_no, []).append({
+                    'item': item,
+                    'raw_score': raw_score,
+                    'weight': weight,
+                    'weighted_score': weighted_score
+                })
+
+            results = []
+            upsert_rows = []
+            for employee_no, employee_name, current_grade, predicted_grade, total_score in zip(
+                    employees.index[valid], employees['employee_name'].to_numpy()[valid],
+                    current_grades[valid].tolist(), predicted_grades[valid].tolist(), totals[valid].tolist()):
+                calculation_details = {
+                    'scores': details_by_employee[employee_no],
+                    'total': total_score,
+                    'formula': formula_data['description'],
+                    'predicted_grade': predicted_grade
+                }
+                upsert_rows.append((
+                    employee_no, assessment_year, current_grade,
+                    predicted_grade, total_score, json.dumps(calculation_details)
+                ))
+                results.append({
+                    'employee_no': employee_no,
+                    'employee_name': employee_name,
+                    'current_grade': current_grade,
+                    'predicted_grade': predicted_grade,
+                    'total_score': total_score
+                })
+
+            try:
+                self.cursor.executemany('''
+                INSERT OR REPLACE INTO predicted_grades (
+                    employee_no, assessment_year, current_grade,
+                    predicted_grade, total_score, calculation_details
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                ''', upsert_rows)
+                if not self._log_operation(
+                    user, '批量计算预测职级',
+                    f"批量计算 {department} 部门 {assessment_year}年预测职级: 成功 {len(results)} 人, "
+                    f"失败 {employee_count - len(results)} 人",
+                    commit=False
+                ):
+                    raise sqlite3.Error("记录操作日志失败")
+                self.manager.commit()
+                self.manager.record_change('predicted_grades', None, RESET)
+            except sqlite3.Error:
+                self.manager.rollback()
+                raise
+
+            return {
+                'success': True,
+                'results': results,
+                'failed': employee_count - len(results)
+            }
+        except Exception as e:
+            print(f"批量计算预测职级失败: {e}")
+            return False
+
     def get_predicted_grade(self, employee_no, assessment_year):
         """获取员工的预测职级"""
         try:
-            self.cursor.execute('''
-            SELECT * FROM predicted_grades
-            WHERE employee_no = ? AND assessment_year = ?
-            ''', (employee_no, assessment_year))
+            self.cursor.execute(QUERIES['predicted_grades.by_employee_year'], (employee_no, assessment_year))
             
             result = self.cursor.fetchone()
             if result:
@@ -761,16 +1037,27 @@ class ScoreDatabase:
             print(f"获取预测职级失败: {e}")
             return None
     
+    def get_employee_predicted_grade(self, employee_no, assessment_year):
+        """获取员工的预测职级，格式同 get_department_predicted_grades 的一行，没有时返回None"""
+        try:
+            self.cursor.execute(QUERIES['predicted_grades.detail_by_employee_year'], (employee_no, assessment_year))
+
+            result = self.cursor.fetchone()
+            if result is None:
+                return None
+            columns = [desc[0] for desc in self.cursor.description]
+            grade_data = dict(zip(columns, result))
+            # 将JSON字符串转换为字典
+            grade_data['calculation_details'] = json.loads(grade_data['calculation_details'])
+            return grade_data
+        except sqlite3.Error as e:
+            print(f"获取员工预测职级失败: {e}")
+            return None
+
     def get_department_predicted_grades(self, department, assessment_year):
         """获取部门所有员工的预测职级"""
         try:
-            self.cursor.execute('''
-            SELECT p.*, e.name as employee_name, e.employee_no, e.department
-            FROM predicted_grades p
-            JOIN employees e ON p.employee_no = e.employee_no
-            WHERE e.department = ? AND p.assessment_year = ?
-            ORDER BY e.name
-            ''', (department, assessment_year))
+            self.cursor.execute(QUERIES['predicted_grades.by_department_year'], (department, assessment_year))
             
             columns = [desc[0] for desc in self.cursor.description]
             grades = []
@@ -785,36 +1072,35 @@ class ScoreDatabase:
             return []
     
     # 辅助方法
-    def _apply_formula(self, total_score, current_grade, formula):
-        """应用职级计算公式计算预测职级"""
-        # 示例简单公式，实际项目中可能需要更复杂的实现
-        if 'grade_thresholds' in formula:
-            thresholds = formula['grade_thresholds']
-            for threshold in thresholds:
-                if total_score >= threshold['min_score'] and total_score <= threshold['max_score']:
-                    return threshold['grade']
-        
-        # 如果没有匹配的阈值，返回当前职级
-        return current_grade
-    
     def get_employee_name(self, employee_no):
-        """获取员工姓名"""
+        """获取员工姓名（经查找缓存）"""
+        name = self.manager.lookup_cache.get(
+            ('employees',), ('get_employee_name', employee_no), lambda: self._query_employee_name(employee_no)
+        )
+        return "未知员工" if name is None else name
+    
+    def _query_employee_name(self, employee_no):
+        """查询员工姓名，出错时返回None"""
         try:
-            self.cursor.execute("SELECT name FROM employees WHERE employee_no = ?", (employee_no,))
+            self.cursor.execute(QUERIES['employees.name_by_no'], (employee_no,))
             result = self.cursor.fetchone()
             return result[0] if result else "未知员工"
         except sqlite3.Error as e:
             print(f"获取员工姓名失败: {e}")
-            return "未知员工"
+            return None
             
     def get_employee_info(self, employee_no):
-        """获取员工基本信息"""
+        """获取员工基本信息（经查找缓存，返回副本）"""
+        info = self.manager.lookup_cache.get(
+            ('employees', 'employee_grades'), ('get_employee_info', employee_no),
+            lambda: self._query_employee_info(employee_no)
+        )
+        return dict(info) if info else None
+    
+    def _query_employee_info(self, employee_no):
+        """查询员工基本信息，不存在或出错时返回None"""
         try:
-            self.cursor.execute("""
-            SELECT employee_no, name, department, grade_2023, grade_2024
-            FROM employees 
-            WHERE employee_no = ?
-            """, (employee_no,))
+            self.cursor.execute(QUERIES['employees.info_by_no'], (employee_no,))
             
             result = self.cursor.fetchone()
             if result:
@@ -822,8 +1108,8 @@ class ScoreDatabase:
                     'employee_no': result[0],
                     'name': result[1],
                     'department': result[2],
-                    'grade_2023': result[3],
-                    'grade_2024': result[4]
+                    'latest_grade': result[3],
+                    'latest_grade_year': result[4]
                 }
             return None
         except sqlite3.Error as e:
@@ -831,33 +1117,48 @@ class ScoreDatabase:
             return None
     
     def _get_assessment_item_name(self, item_id):
-        """获取考核项目名称"""
+        """获取考核项目名称（经查找缓存）"""
+        name = self.manager.lookup_cache.get(
+            ('department_assessment_items',), ('_get_assessment_item_name', item_id),
+            lambda: self._query_assessment_item_name(item_id)
+        )
+        return "未知项目" if name is None else name
+    
+    def _query_assessment_item_name(self, item_id):
+        """查询考核项目名称，出错时返回None"""
         try:
-            self.cursor.execute("SELECT assessment_name FROM department_assessment_items WHERE id = ?", (item_id,))
+            self.cursor.execute(QUERIES['assessment_items.name_by_id'], (item_id,))
             result = self.cursor.fetchone()
             return result[0] if result else "未知项目"
         except sqlite3.Error:
-            return "未知项目"
+            return None
     
-    def _log_operation(self, user, operation, details):
-        """记录操作日志"""
+    def _log_operation(self, user, operation, details, commit=True):
+        """记录操作日志
+
+        commit为False时只写入不提交，由调用方与数据修改一起提交。
+        """
         try:
-            timestamp = datetime.datetime.now()
-            self.cursor.execute('''
-            INSERT INTO operation_logs (user, operation, details)
-            VALUES (?, ?, ?)
-            ''', (user, operation, details))
-            self.conn.commit()
+            self.manager.audit_log.record(user, operation, details)
+            if commit:
+                self.manager.commit()
             return True
         except sqlite3.Error as e:
             print(f"记录操作日志失败: {e}")
             return False
     
     def get_all_departments(self):
-        """获取系统中所有部门"""
+        """获取系统中所有部门（经查找缓存，返回副本）"""
+        departments = self.manager.lookup_cache.get(
+            ('employees',), ('get_all_departments',), self._query_departments
+        )
+        return list(departments) if departments is not None else []
+    
+    def _query_departments(self):
+        """查询所有部门，出错时返回None"""
         try:
             # 从employees表中获取所有实际部门
-            self.cursor.execute("SELECT DISTINCT department FROM employees WHERE department != '' ORDER BY department")
+            self.cursor.execute(QUERIES['employees.department_names'])
             department_rows = self.cursor.fetchall()
             
             # 返回实际部门列表，如果没有则返回空列表
@@ -865,8 +1166,7 @@ class ScoreDatabase:
             return departments
         except sqlite3.Error as e:
             print(f"获取部门列表失败: {e}")
-            # 发生错误时返回空列表
-            return []
+            return None
     
     def get_department_employees(self, department):
         """获取指定部门的所有员工"""
@@ -877,10 +1177,8 @@ class ScoreDatabase:
                 
             print(f"正在获取{department}部门员工数据...")
             # 修改查询，获取部门所有员工，使用department字段直接匹配
-            self.cursor.execute(
-                "SELECT * FROM employees WHERE department = ? ORDER BY name",
-                (department,)
-            )
+            # 附带最新职级（latest_grade列）
+            self.cursor.execute(QUERIES['employees.by_department_name'], (department,))
             
             rows = self.cursor.fetchall()
             
@@ -923,39 +1221,29 @@ class ScoreDatabase:
             update_count = 0
             
             for employee_no, evaluated_grade, employee_name in results:
-                # 更新员工表中的职级字段
-                target_field = f"grade_{target_year}"
-                self.cursor.execute(f"""
-                UPDATE employees
-                SET {target_field} = ?
-                WHERE employee_no = ?
-                """, (evaluated_grade, employee_no))
-                
-                # 同时更新职级历史表 - 使用ON CONFLICT子句处理已存在的记录
-                self.cursor.execute("""
-                INSERT INTO employee_grades (employee_no, year, grade, comment)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(employee_no, year) 
-                DO UPDATE SET grade = ?, comment = ?, updated_at = CURRENT_TIMESTAMP
-                """, (employee_no, target_year, evaluated_grade, 
-                      f"从{year}年技能评分评定结果应用", evaluated_grade, 
-                      f"从{year}年技能评分评定结果应用"))
+                # 写入职级历史表（员工表中对应年份的职级字段由触发器同步）
+                self.cursor.execute(QUERIES['employee_grades.upsert_by_no'], (
+                    employee_no, target_year, evaluated_grade, f"从{year}年技能评分评定结果应用"
+                ))
                 
                 if self.cursor.rowcount > 0:
                     update_count += 1
                     print(f"已更新员工: {employee_name} ({employee_no}) 的{target_year}年职级为: {evaluated_grade}")
             
-            self.conn.commit()
-            
             # 记录操作日志
-            self._log_operation(
+            if not self._log_operation(
                 user,
                 '应用评定职级',
-                f"将{year}年技能评分评定的职级应用到{target_year}年，更新了{update_count}名员工的职级"
-            )
+                f"将{year}年技能评分评定的职级应用到{target_year}年，更新了{update_count}名员工的职级",
+                commit=False
+            ):
+                raise sqlite3.Error("记录操作日志失败")
+            self.manager.commit()
+            self.manager.record_change('employee_grades', None, RESET)
             
             return update_count
         except Exception as e:
+            self.manager.rollback()
             print(f"应用评定职级失败: {e}")
             import traceback
             traceback.print_exc()
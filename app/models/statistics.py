@@ -0,0 +1,108 @@
+import sqlite3
+
+from app.models.grades import grade_rank
+from app.models.queries import QUERIES
+
+# 晋升分析的分类
+PROMOTION_CATEGORIES = ('晋升', '平级', '降级', '新入职')
+
+
+def sort_grades(grades):
+    """按职级顺序排序，未知职级排在最前"""
+    return sorted(grades, key=lambda grade: (grade_rank(grade), grade))
+
+
+class EmployeeStatistics:
+    """员工统计服务
+
+    部门人数和各年职级人数读取由触发器维护的汇总表（见 aggregates.read_statistics），
+    查询量只与部门数、年份数和职级数有关；晋升分析按年份查询相邻两年的职级组合。
+    结果按数据版本缓存，数据未变化时切换图表无需再查询数据库。
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._version = None
+        self._stats = {}
+        self._results = {}
+
+    def _data_version(self):
+        """数据版本：其他连接的提交会改变data_version，本连接的修改会改变total_changes"""
+        conn = self.db.conn
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    def _refresh(self):
+        """数据变化时重新读取汇总表并清空缓存"""
+        version = self._data_version()
+        if version == self._version:
+            return
+
+        self._stats = self.db.get_statistics()
+        self._results = {}
+        self._version = version
+
+    def _history(self):
+        """职级历史表中各年各职级人数 {年份: {职级: 人数}}"""
+        return self._stats.get('grade_history_distribution', {})
+
+    def years(self):
+        """有职级记录的年份"""
+        return self._cached(('years',), lambda: sorted(self._history())) or []
+
+    def _cached(self, key, compute):
+        try:
+            self._refresh()
+            if key not in self._results:
+                self._results[key] = compute()
+        except sqlite3.Error as e:
+            print(f"获取统计数据失败: {e}")
+            return None
+        return self._results[key]
+
+    def _grade_counts(self, year):
+        """统计某年各职级人数，返回 {职级: 人数}"""
+        return self._history().get(int(year), {})
+
+    def grade_distribution(self, year):
+        """某年的职级分布，按职级顺序返回 [(职级, 人数)]"""
+        def compute():
+            counts = self._grade_counts(year)
+            return [(grade, counts[grade]) for grade in sort_grades(counts)]
+        return self._cached(('grade_distribution', str(year)), compute) or []
+
+    def department_distribution(self):
+        """各部门人数，返回 [(部门, 人数)]"""
+        def compute():
+            counts = self._stats.get('department_distribution', {})
+            return sorted((department, count) for department, count in counts.items() if department)
+        return self._cached(('department_distribution',), compute) or []
+
+    def grade_trend(self, years):
+        """多年的职级人数趋势，返回 {职级: [各年人数]}，职级按顺序排列"""
+        years = tuple(str(year) for year in years)
+
+        def compute():
+            yearly = [self._grade_counts(year) for year in years]
+            grades = sort_grades({grade for counts in yearly for grade in counts})
+            return {grade: [counts.get(grade, 0) for counts in yearly] for grade in grades}
+        return self._cached(('grade_trend', years), compute) or {}
+
+    def promotion_analysis(self, year):
+        """与前一年相比的职级变化，返回 {'晋升', '平级', '降级', '新入职': 人数}"""
+        def compute():
+            result = dict.fromkeys(PROMOTION_CATEGORIES, 0)
+            # 该年有职级的员工按 (该年职级, 前一年职级) 分组计数
+            rows = self.db.conn.execute(
+                QUERIES['employee_grades.year_over_year'], (int(year) - 1, int(year))
+            ).fetchall()
+            for current_grade, previous_grade, count in rows:
+                if not previous_grade:
+                    result['新入职'] += count
+                elif grade_rank(current_grade) > grade_rank(previous_grade):
+                    result['晋升'] += count
+                elif grade_rank(current_grade) < grade_rank(previous_grade):
+                    result['降级'] += count
+                else:
+                    result['平级'] += count
+            return result
+        return self._cached(('promotion_analysis', str(year)), compute) or dict.fromkeys(PROMOTION_CATEGORIES, 0)
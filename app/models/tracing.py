@@ -0,0 +1,199 @@
+import datetime
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from app.utils import profiler
+
+# 超过该耗时（毫秒）的语句记入慢查询日志
+SLOW_QUERY_MS = 100
+
+# 慢查询日志保留的条数，超出后丢弃最早的记录
+SLOW_QUERY_LOG_SIZE = 200
+
+# 每条语句保留最近多少次的耗时用于计算分位数
+DURATION_SAMPLES = 500
+
+# 语句文本规范化结果的缓存上限（拼接了参数值的SQL可能很多）
+_KEY_CACHE_SIZE = 2000
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(round(fraction * (len(sorted_values) - 1)))]
+
+
+def _parameters_hash(parameters):
+    """参数的哈希值，用于区分同一语句的不同参数而不记录参数本身"""
+    if parameters is None:
+        return ''
+    return hashlib.sha1(repr(parameters).encode('utf-8')).hexdigest()[:12]
+
+
+class QueryTracer:
+    """SQL语句跟踪器
+
+    按语句统计执行次数、耗时分位数和行数，并在环形缓冲区中保留最近的慢查询。
+    耗时为 execute() 的时间（SQLite在其中完成编译和第一步执行，排序、聚合等主要工作都在这一步），
+    行数为修改的行数或已读取的结果行数。
+    """
+
+    def __init__(self, slow_threshold_ms=SLOW_QUERY_MS, log_size=SLOW_QUERY_LOG_SIZE):
+        self._lock = threading.Lock()
+        self.slow_threshold = slow_threshold_ms / 1000
+        self._slow_queries = deque(maxlen=log_size)
+        self._statements = {}
+        self._keys = {}
+
+    def _statement(self, sql):
+        """语句的统计项，空白不同的同一语句合并统计"""
+        key = self._keys.get(sql)
+        if key is None:
+            if len(self._keys) >= _KEY_CACHE_SIZE:
+                self._keys.clear()
+            key = self._keys[sql] = ' '.join(sql.split())
+        stats = self._statements.get(key)
+        if stats is None:
+            stats = self._statements[key] = {
+                'sql': key, 'count': 0, 'total': 0.0, 'max': 0.0, 'rows': 0,
+                'durations': deque(maxlen=DURATION_SAMPLES),
+            }
+        return stats
+
+    def record(self, sql, parameters, elapsed, rows):
+        """记录一次执行，返回 (统计项, 慢查询记录或None)，用于之后累加读取的行数"""
+        with self._lock:
+            stats = self._statement(sql)
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            stats['rows'] += rows
+            stats['durations'].append(elapsed)
+
+            entry = None
+            if elapsed >= self.slow_threshold:
+                entry = {
+                    'timestamp': datetime.datetime.now(),
+                    'sql': stats['sql'],
+                    'parameters_hash': _parameters_hash(parameters),
+                    'duration_ms': elapsed * 1000,
+                    'rows': rows,
+                    'thread': threading.current_thread().name,
+                }
+                self._slow_queries.append(entry)
+        return stats, entry
+
+    def add_rows(self, trace, rows):
+        """累加查询结果中读取的行数"""
+        stats, entry = trace
+        with self._lock:
+            stats['rows'] += rows
+            if entry is not None:
+                entry['rows'] += rows
+
+    def set_slow_threshold(self, milliseconds):
+        self.slow_threshold = milliseconds / 1000
+
+    def statement_stats(self):
+        """各语句的统计，按总耗时从高到低排列"""
+        with self._lock:
+            snapshot = [(stats, sorted(stats['durations'])) for stats in self._statements.values()]
+        result = []
+        for stats, durations in snapshot:
+            result.append({
+                'sql': stats['sql'],
+                'count': stats['count'],
+                'total_ms': stats['total'] * 1000,
+                'avg_ms': stats['total'] / stats['count'] * 1000,
+                'p50_ms': _percentile(durations, 0.5) * 1000,
+                'p95_ms': _percentile(durations, 0.95) * 1000,
+                'max_ms': stats['max'] * 1000,
+                'rows': stats['rows'],
+            })
+        result.sort(key=lambda item: item['total_ms'], reverse=True)
+        return result
+
+    def slow_queries(self):
+        """慢查询日志，最近的在前"""
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._slow_queries)]
+
+    def reset(self):
+        """清空统计和慢查询日志"""
+        with self._lock:
+            self._statements.clear()
+            self._slow_queries.clear()
+
+
+# 所有连接共用的跟踪器
+tracer = QueryTracer()
+
+
+class TracingCursor(sqlite3.Cursor):
+    """记录每条语句耗时和行数的游标"""
+
+    _trace = None
+
+    def _traced(self, method, sql, parameters, *args):
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            # 查询语句的rowcount为-1，行数在读取结果时累加
+            self._trace = tracer.record(sql, parameters, elapsed, max(self.rowcount, 0))
+            profiler.record_query(sql, elapsed)
+
+    def execute(self, sql, parameters=()):
+        return self._traced(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # 参数可能是迭代器，不计算哈希
+        return self._traced(super().executemany, sql, None, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._traced(super().executescript, sql_script, None)
+
+    def _count(self, rows):
+        if self._trace is not None and rows:
+            tracer.add_rows(self._trace, rows)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count(len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        self._count(1)
+        return row
+
+
+class TracingConnection(sqlite3.Connection):
+    """游标和快捷执行方法都经过 TracingCursor 的连接"""
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
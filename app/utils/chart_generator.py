@@ -1,10 +1,10 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from PyQt5.QtWidgets import QWidget
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib
+from ..models.grades import grade_rank
 matplotlib.use('Qt5Agg')
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
@@ -99,7 +99,8 @@ class ChartGenerator:
         if not all_employees:
             return None
         
-        # 转换为DataFrame
+        # 转换为DataFrame（pandas只在生成这两种图表时使用，在函数内导入）
+        import pandas as pd
         df = pd.DataFrame(all_employees)
         
         # 准备数据
@@ -138,6 +139,7 @@ class ChartGenerator:
             return None
         
         # 转换为DataFrame
+        import pandas as pd
         df = pd.DataFrame(all_employees)
         
         # 提取需要的列
@@ -159,11 +161,9 @@ class ChartGenerator:
             base_grade = row[base_col]
             target_grade = row[target_col]
             
-            # 简单的职级比较逻辑
-            grade_order = {'G1': 1, 'G2': 2, 'G3': 3, 'G4A': 4, 'G4B': 5, 'Technian': 6}
-            
-            if base_grade in grade_order and target_grade in grade_order:
-                if grade_order[target_grade] > grade_order[base_grade]:
+            # 两个职级都在职级顺序表中时比较高低
+            if grade_rank(base_grade) and grade_rank(target_grade):
+                if grade_rank(target_grade) > grade_rank(base_grade):
                     return '晋升'
                 else:
                     return '降级'
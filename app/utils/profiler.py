@@ -0,0 +1,257 @@
+import atexit
+import datetime
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# 可选的性能分析：通过环境变量或 run.py --profile 开启后，记录主窗口创建、
+# 各视图加载方法的耗时和SQL查询次数，以及每条SQL语句的执行时间，
+# 程序退出时输出火焰图式的调用树报告（JSON文件和文本摘要）。未开启时各函数不做任何记录。
+
+# 开启性能分析的环境变量，值为1或报告文件路径
+PROFILE_ENV = 'EMPLOYEE_PROFILE'
+
+# 视图中需要记录耗时的方法名
+VIEW_METHOD_PATTERN = re.compile(r'^(initData|loadData|load_\w+|load[A-Z]\w*)$')
+
+# 文本摘要中列出的SQL语句条数
+TOP_QUERIES = 20
+
+enabled = False
+_output_path = None
+_lock = threading.Lock()
+_local = threading.local()
+_roots = {}
+_queries = {}
+_started = None
+
+
+class _Node:
+    """调用树节点，同一路径上的同名调用合并统计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.children = {}
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _Node(name)
+        return node
+
+    def to_dict(self):
+        children = sorted(self.children.values(), key=lambda node: node.total, reverse=True)
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'total_ms': round(self.total * 1000, 3),
+            'self_ms': round((self.total - sum(node.total for node in children)) * 1000, 3),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'children': [node.to_dict() for node in children],
+        }
+
+
+def _thread_state():
+    """当前线程的调用栈和查询计数"""
+    state = getattr(_local, 'state', None)
+    if state is None:
+        name = threading.current_thread().name
+        with _lock:
+            root = _roots.get(name)
+            if root is None:
+                root = _roots[name] = _Node(name)
+        state = _local.state = {'stack': [root], 'queries': 0, 'sql_time': 0.0}
+    return state
+
+
+def enable(output_path=None):
+    """开启性能分析，程序退出时写入报告"""
+    global enabled, _output_path, _started
+    if enabled:
+        return
+    enabled = True
+    _output_path = output_path
+    _started = time.perf_counter()
+    atexit.register(dump)
+
+
+@contextmanager
+def _span(name):
+    state = _thread_state()
+    parent = state['stack'][-1]
+    with _lock:
+        node = parent.child(name)
+    state['stack'].append(node)
+    queries, sql_time = state['queries'], state['sql_time']
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        state['stack'].pop()
+        with _lock:
+            node.calls += 1
+            node.total += elapsed
+            node.queries += state['queries'] - queries
+            node.sql_time += state['sql_time'] - sql_time
+
+
+def span(name):
+    """记录一段代码的耗时和其中执行的SQL数量，可嵌套"""
+    if not enabled:
+        return nullcontext()
+    return _span(name)
+
+
+def profiled(name):
+    """记录函数耗时的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _max_positional(func):
+    """函数最多接受的位置参数个数，接受 *args 时返回None"""
+    parameters = inspect.signature(func).parameters.values()
+    if any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+        return None
+    return sum(parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)
+               for parameter in parameters)
+
+
+def _profiled_slot(name, func):
+    """包装可能作为Qt槽函数连接的方法
+
+    PyQt按槽函数的参数个数丢弃信号多余的参数（如clicked的checked），
+    包装后的函数接受任意参数，因此按原方法的参数个数截断。
+    """
+    limit = _max_positional(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args[:limit], **kwargs)
+    return wrapper
+
+
+def instrument_class(cls):
+    """为视图类的 initData/loadData/load_* 方法加上耗时记录（在创建实例前调用）"""
+    if not enabled or cls.__dict__.get('__profiled__'):
+        return cls
+    for attr, value in list(vars(cls).items()):
+        if inspect.isfunction(value) and VIEW_METHOD_PATTERN.match(attr):
+            setattr(cls, attr, _profiled_slot(f"{cls.__name__}.{attr}", value))
+    cls.__profiled__ = True
+    return cls
+
+
+def record_query(sql, elapsed):
+    """记录一条SQL语句的执行时间"""
+    if not enabled:
+        return
+    state = _thread_state()
+    state['queries'] += 1
+    state['sql_time'] += elapsed
+    # 合并空白，使同一语句的不同排版统计在一起
+    key = ' '.join(sql.split())
+    with _lock:
+        stats = _queries.get(key)
+        if stats is None:
+            stats = _queries[key] = {'count': 0, 'total': 0.0, 'max': 0.0}
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+
+
+def report():
+    """生成报告数据"""
+    with _lock:
+        threads = [root.to_dict() for root in _roots.values()]
+        queries = [
+            {
+                'sql': sql,
+                'count': stats['count'],
+                'total_ms': round(stats['total'] * 1000, 3),
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 3),
+                'max_ms': round(stats['max'] * 1000, 3),
+            }
+            for sql, stats in _queries.items()
+        ]
+    queries.sort(key=lambda item: item['total_ms'], reverse=True)
+    return {
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'wall_ms': round((time.perf_counter() - _started) * 1000, 3) if _started else 0,
+        'threads': threads,
+        'queries': queries,
+    }
+
+
+def format_report(data):
+    """将报告数据格式化为文本摘要"""
+    lines = [f"性能分析报告 {data['generated_at']}，运行 {data['wall_ms'] / 1000:.2f} 秒", "", "调用树:"]
+
+    def add_node(node, depth):
+        lines.append(
+            f"{'  ' * depth}{node['name']}: {node['total_ms']:.1f} 毫秒"
+            f" (自身 {node['self_ms']:.1f}, {node['calls']} 次, SQL {node['queries']} 条 / {node['sql_ms']:.1f} 毫秒)"
+        )
+        for child in node['children']:
+            add_node(child, depth + 1)
+
+    for thread in data['threads']:
+        if thread['children']:
+            lines.append(f"[{thread['name']}]")
+            for child in thread['children']:
+                add_node(child, 1)
+
+    lines += ["", f"耗时最长的SQL语句（共 {len(data['queries'])} 种）:"]
+    for item in data['queries'][:TOP_QUERIES]:
+        sql = item['sql'] if len(item['sql']) <= 120 else item['sql'][:117] + '...'
+        lines.append(
+            f"  {item['total_ms']:9.1f} 毫秒  {item['count']:6d} 次  平均 {item['avg_ms']:.3f}  最长 {item['max_ms']:.3f}  {sql}"
+        )
+    return '\n'.join(lines)
+
+
+def dump(output_path=None):
+    """写入JSON报告和文本摘要，返回JSON文件路径"""
+    if not enabled:
+        return None
+    path = output_path or _output_path
+    if not path:
+        path = f"profile_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    data = report()
+    text = format_report(data)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(os.path.splitext(path)[0] + '.txt', 'w', encoding='utf-8') as f:
+            f.write(text)
+    except OSError as e:
+        print(f"写入性能分析报告失败: {e}")
+        return None
+
+    print(text)
+    print(f"性能分析报告已保存到 {path}")
+    return path
+
+
+# 通过环境变量开启
+_env_value = os.environ.get(PROFILE_ENV, '')
+if _env_value and _env_value != '0':
+    enable(None if _env_value == '1' else _env_value)
@@ -0,0 +1,203 @@
+import sqlite3
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from qfluentwidgets import InfoBar, InfoBarPosition, ProgressBar, PushButton
+
+
+class TaskCancelled(Exception):
+    """任务已被用户取消"""
+
+
+def _is_interrupted(error):
+    """是否为 Connection.interrupt() 中断SQL时抛出的异常"""
+    return isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error)
+
+
+class TaskSignals(QObject):
+    """后台任务的信号，在工作线程中发出，在界面线程中处理"""
+
+    # 已完成数量, 总数量（为0表示进度未知）, 当前步骤说明
+    progressChanged = pyqtSignal(int, int, str)
+    # 任务返回值
+    succeeded = pyqtSignal(object)
+    # 错误信息
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    # 无论结果如何，任务结束后发出
+    finished = pyqtSignal()
+
+
+class BackgroundTask(QRunnable):
+    """在线程池中执行的后台任务
+
+    func(task) 在工作线程中执行：通过 task.database() 打开本线程自己的数据库连接，
+    通过 task.progress() 报告进度，通过 task.check_cancelled() 在合适的位置响应取消。
+    """
+
+    def __init__(self, func):
+        super().__init__()
+        # 由调用方持有引用，避免信号对象随QRunnable一起被删除
+        self.setAutoDelete(False)
+        self.func = func
+        self.signals = TaskSignals()
+        self.running = False
+        self._cancel_event = threading.Event()
+        self._databases = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def database(self, db):
+        """在工作线程中打开与db同类型、同一文件的数据库，任务结束时自动关闭
+
+        SQLite连接不能跨线程使用，连接按线程分别创建，不会使用界面线程的连接。
+        """
+        self.check_cancelled()
+        instance = type(db)(db.db_path)
+        with self._lock:
+            self._databases.append(instance)
+        return instance
+
+    def progress(self, done, total=0, message=''):
+        """报告进度，任务已取消时抛出 TaskCancelled"""
+        self.check_cancelled()
+        self.signals.progressChanged.emit(int(done), int(total), message)
+
+    def check_cancelled(self):
+        if self.is_cancelled:
+            raise TaskCancelled()
+
+    def cancel(self):
+        """请求取消任务，并中断工作线程连接上正在执行的SQL"""
+        self._cancel_event.set()
+        with self._lock:
+            for db in self._databases:
+                if db.conn is not None:
+                    db.conn.interrupt()
+
+    def run(self):
+        try:
+            # 正常返回即视为完成：取消请求到达时任务可能已经做完并提交了全部修改
+            result = self.func(self)
+        except TaskCancelled:
+            outcome = (self.signals.cancelled, ())
+        except Exception as e:
+            # SQL被 cancel() 中断，或取消后任务因此失败
+            if _is_interrupted(e) or self.is_cancelled:
+                outcome = (self.signals.cancelled, ())
+            else:
+                print(f"后台任务失败: {e}")
+                outcome = (self.signals.failed, (str(e),))
+        else:
+            outcome = (self.signals.succeeded, (result,))
+        finally:
+            # 先关闭工作线程的连接，界面线程收到结果时修改已全部提交
+            with self._lock:
+                databases, self._databases = self._databases, []
+                for db in databases:
+                    db.close()
+
+        signal, args = outcome
+        self.running = False
+        signal.emit(*args)
+        self.signals.finished.emit()
+
+
+# 正在执行的任务，任务结束前保持引用
+_active_tasks = set()
+
+
+def start_task(parent, title, func, on_success=None, on_error=None, cancellable=True):
+    """在线程池中执行 func(task)，并在parent上显示带进度条的InfoBar
+
+    on_success(result) 和 on_error(message) 在界面线程中调用；
+    未指定 on_error 时显示错误提示。返回 BackgroundTask，可用于查询状态或取消。
+    """
+    task = BackgroundTask(func)
+
+    info_bar = InfoBar.info(
+        title=title,
+        content="正在准备...",
+        orient=Qt.Horizontal,
+        isClosable=False,
+        position=InfoBarPosition.TOP,
+        duration=-1,
+        parent=parent
+    )
+    progress_bar = ProgressBar(info_bar)
+    progress_bar.setFixedWidth(160)
+    info_bar.addWidget(progress_bar)
+
+    if cancellable:
+        cancel_button = PushButton("取消", info_bar)
+
+        def on_cancel():
+            cancel_button.setEnabled(False)
+            info_bar.contentLabel.setText("正在取消...")
+            task.cancel()
+
+        cancel_button.clicked.connect(on_cancel)
+        info_bar.addWidget(cancel_button)
+
+    def on_progress(done, total, message):
+        if total > 0:
+            progress_bar.setRange(0, total)
+            progress_bar.setValue(min(done, total))
+        if message:
+            info_bar.contentLabel.setText(message)
+        elif total > 0:
+            info_bar.contentLabel.setText(f"已完成 {done * 100 // total}%")
+
+    def on_succeeded(result):
+        info_bar.close()
+        if on_success:
+            on_success(result)
+
+    def on_failed(message):
+        info_bar.close()
+        if on_error:
+            on_error(message)
+            return
+        InfoBar.error(
+            title=f'{title}失败',
+            content=message,
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=5000,
+            parent=parent
+        )
+
+    def on_cancelled():
+        info_bar.close()
+        InfoBar.warning(
+            title='已取消',
+            content=f"{title}已取消",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=parent
+        )
+
+    task.signals.progressChanged.connect(on_progress)
+    task.signals.succeeded.connect(on_succeeded)
+    task.signals.failed.connect(on_failed)
+    task.signals.cancelled.connect(on_cancelled)
+    task.signals.finished.connect(lambda: _active_tasks.discard(task))
+
+    _active_tasks.add(task)
+    task.running = True
+    QThreadPool.globalInstance().start(task)
+    return task
+
+
+def wait_for_tasks(cancel=False):
+    """等待所有后台任务结束（关闭窗口前调用），cancel为True时先请求取消"""
+    if cancel:
+        for task in list(_active_tasks):
+            task.cancel()
+    QThreadPool.globalInstance().waitForDone()
@@ -14,16 +14,23 @@ from qfluentwidgets import (
     TransparentToolButton, ToolButton
 )
 
+from ..models.data_events import ALL_TABLES, DELETE, RESET
+
 class AssessmentItemsView(QWidget):
     """考核项目管理界面"""
     
     def __init__(self, score_db, parent=None):
         super().__init__(parent)
         self.score_db = score_db
+        # 表格中显示的考核项目，顺序与表格行一致
+        self.items = []
         
         # 初始化界面
         self.initUI()
         
+        # 考核项目被修改后只更新受影响的行
+        self.score_db.manager.events.dataChanged.connect(self.on_data_changed)
+        
     def initUI(self):
         """初始化界面"""
         # 主布局
@@ -37,7 +44,7 @@ class AssessmentItemsView(QWidget):
         # 添加部门筛选下拉框
         self.department_combo = ComboBox(self)
         self.department_combo.setPlaceholderText("选择部门")
-        self.department_combo.addItem("全部部门", "all")
+        self.department_combo.addItem("全部部门", userData="all")
         self.load_departments()
         
         self.department_combo.setMinimumWidth(150)
@@ -89,7 +96,7 @@ class AssessmentItemsView(QWidget):
         """加载部门列表"""
         departments = self.score_db.get_all_departments()
         for dept in departments:
-            self.department_combo.addItem(dept, dept)
+            self.department_combo.addItem(dept, userData=dept)
     
     def load_items(self):
         """加载考核项目数据"""
@@ -109,98 +116,127 @@ class AssessmentItemsView(QWidget):
         
         # 根据搜索文本筛选
         if search_text:
-            filtered_items = []
-            for item in items:
-                if (search_text in item['department'].lower() or 
-                    search_text in item['assessment_name'].lower()):
-                    filtered_items.append(item)
-            items = filtered_items
+            items = [item for item in items if self._matches_search(item, search_text)]
         
         self.populate_table(items)
     
+    def _matches_search(self, item, search_text):
+        return (search_text in item['department'].lower() or
+                search_text in item['assessment_name'].lower())
+    
+    def _matches_filter(self, item):
+        """考核项目是否符合当前的部门和搜索条件"""
+        department = self.department_combo.currentData()
+        if department not in (None, "all") and item['department'] != department:
+            return False
+        search_text = self.search_edit.text().strip().lower()
+        return not search_text or self._matches_search(item, search_text)
+    
+    def on_data_changed(self, table, key, operation):
+        """数据修改通知（见 app.models.data_events）"""
+        if table not in ('department_assessment_items', ALL_TABLES):
+            return
+        if operation == RESET:
+            self.filter_items()
+            return
+        
+        # 先移除原来的行，修改后仍符合筛选条件时按排序位置重新插入
+        for row, item in enumerate(self.items):
+            if item['id'] == key:
+                del self.items[row]
+                self.table.removeRow(row)
+                break
+        if operation == DELETE:
+            return
+        
+        item = self.score_db.get_assessment_item(key)
+        if item is None or not self._matches_filter(item):
+            return
+        # 与 get_all_assessment_items 的排序一致
+        sort_key = (item['department'], item['assessment_name'])
+        row = next(
+            (row for row, other in enumerate(self.items)
+             if (other['department'], other['assessment_name']) > sort_key),
+            len(self.items)
+        )
+        self.items.insert(row, item)
+        self.table.insertRow(row)
+        self._set_item_row(row, item)
+    
     def populate_table(self, items):
         """填充表格数据"""
+        self.items = list(items)
         self.table.setRowCount(0)  # 清空表格
         
-        for row, item in enumerate(items):
+        for row, item in enumerate(self.items):
             self.table.insertRow(row)
-            
-            # 设置ID列
-            id_item = QTableWidgetItem(str(item['id']))
-            self.table.setItem(row, 0, id_item)
-            
-            # 设置部门列
-            dept_item = QTableWidgetItem(item['department'])
-            self.table.setItem(row, 1, dept_item)
-            
-            # 设置考核项目名称列
-            name_item = QTableWidgetItem(item['assessment_name'])
-            self.table.setItem(row, 2, name_item)
-            
-            # 设置权重列
-            weight_item = QTableWidgetItem(str(item['weight']))
-            self.table.setItem(row, 3, weight_item)
-            
-            # 设置满分列
-            max_score_item = QTableWidgetItem(str(item['max_score']))
-            self.table.setItem(row, 4, max_score_item)
-            
-            # 设置操作列
-            actions_layout = QHBoxLayout()
-            actions_layout.setContentsMargins(4, 4, 4, 4)
-            actions_layout.setSpacing(4)
-            
-            edit_button = TransparentToolButton(FIF.EDIT)
-            edit_button.setFixedSize(QSize(30, 30))
-            edit_button.setToolTip("编辑")
-            edit_button.clicked.connect(lambda _, i=item['id']: self.edit_item(i))
-            
-            delete_button = TransparentToolButton(FIF.DELETE)
-            delete_button.setFixedSize(QSize(30, 30))
-            delete_button.setToolTip("删除")
-            delete_button.clicked.connect(lambda _, i=item['id']: self.delete_item(i))
-            
-            actions_layout.addWidget(edit_button)
-            actions_layout.addWidget(delete_button)
-            actions_layout.addStretch(1)
-            
-            actions_widget = QWidget()
-            actions_widget.setLayout(actions_layout)
-            
-            self.table.setCellWidget(row, 5, actions_widget)
+            self._set_item_row(row, item)
+    
+    def _set_item_row(self, row, item):
+        """设置一行的单元格和操作按钮"""
+        # 设置ID列
+        id_item = QTableWidgetItem(str(item['id']))
+        self.table.setItem(row, 0, id_item)
+        
+        # 设置部门列
+        dept_item = QTableWidgetItem(item['department'])
+        self.table.setItem(row, 1, dept_item)
+        
+        # 设置考核项目名称列
+        name_item = QTableWidgetItem(item['assessment_name'])
+        self.table.setItem(row, 2, name_item)
+        
+        # 设置权重列
+        weight_item = QTableWidgetItem(str(item['weight']))
+        self.table.setItem(row, 3, weight_item)
+        
+        # 设置满分列
+        max_score_item = QTableWidgetItem(str(item['max_score']))
+        self.table.setItem(row, 4, max_score_item)
+        
+        # 设置操作列
+        actions_layout = QHBoxLayout()
+        actions_layout.setContentsMargins(4, 4, 4, 4)
+        actions_layout.setSpacing(4)
+        
+        edit_button = TransparentToolButton(FIF.EDIT)
+        edit_button.setFixedSize(QSize(30, 30))
+        edit_button.setToolTip("编辑")
+        edit_button.clicked.connect(lambda _, i=item['id']: self.edit_item(i))
+        
+        delete_button = TransparentToolButton(FIF.DELETE)
+        delete_button.setFixedSize(QSize(30, 30))
+        delete_button.setToolTip("删除")
+        delete_button.clicked.connect(lambda _, i=item['id']: self.delete_item(i))
+        
+        actions_layout.addWidget(edit_button)
+        actions_layout.addWidget(delete_button)
+        actions_layout.addStretch(1)
+        
+        actions_widget = QWidget()
+        actions_widget.setLayout(actions_layout)
+        
+        self.table.setCellWidget(row, 5, actions_widget)
     
     def add_item(self):
         """添加考核项目"""
         dialog = AssessmentItemDialog(self, self.score_db)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_items()
+        # 保存后表格由数据修改通知更新
+        dialog.exec_()
     
     def edit_item(self, item_id):
         """编辑考核项目"""
         # 先获取考核项目信息
-        all_items = self.score_db.get_all_assessment_items()
-        item_data = None
-        
-        for item in all_items:
-            if item['id'] == item_id:
-                item_data = item
-                break
+        item_data = self.score_db.get_assessment_item(item_id)
         
         if item_data:
             dialog = AssessmentItemDialog(self, self.score_db, item_data)
-            if dialog.exec_() == QDialog.Accepted:
-                self.load_items()
+            dialog.exec_()
     
     def delete_item(self, item_id):
         """删除考核项目"""
         # 先获取考核项目信息
-        all_items = self.score_db.get_all_assessment_items()
-        item_data = None
-        
-        for item in all_items:
-            if item['id'] == item_id:
-                item_data = item
-                break
+        item_data = self.score_db.get_assessment_item(item_id)
         
         if item_data:
             # 弹出确认对话框
@@ -228,7 +264,6 @@ class AssessmentItemsView(QWidget):
                         duration=2000,
                         parent=self
                     )
-                    self.load_items()
                 else:
                     InfoBar.error(
                         title='删除失败',
@@ -261,7 +296,6 @@ class AssessmentItemsView(QWidget):
                 duration=3000,
                 parent=self
             )
-            self.load_items()
         else:
             InfoBar.error(
                 title='导入失败',
@@ -409,7 +443,7 @@ class AssessmentItemDialog(QDialog):
         """加载部门列表"""
         departments = self.score_db.get_all_departments()
         for dept in departments:
-            self.department_combo.addItem(dept, dept)
+            self.department_combo.addItem(dept, userData=dept)
     
     def fill_form_data(self):
         """填充表单数据（编辑模式）"""
@@ -16,6 +16,10 @@ from qfluentwidgets import (
     TransparentToolButton
 )
 
+from ..models.aut_grading import grade_by_coefficient
+from ..models.data_events import INSERT, UPDATE
+from ..models.queries import QUERIES
+
 class AUTScoreView(QWidget):
     """AUT部门专用成绩录入界面"""
     
@@ -274,7 +278,7 @@ class AUTScoreView(QWidget):
     def load_employees(self):
         """加载AUT部门员工"""
         self.employee_combo.clear()
-        self.employee_combo.addItem("请选择员工", None)
+        self.employee_combo.addItem("请选择员工", userData=None)
         
         try:
             # 获取AUT部门所有员工
@@ -284,7 +288,7 @@ class AUTScoreView(QWidget):
             employees = self.score_db.cursor.fetchall()
             
             for emp_no, name in employees:
-                self.employee_combo.addItem(f"{name} ({emp_no})", emp_no)
+                self.employee_combo.addItem(f"{name} ({emp_no})", userData=emp_no)
                 
             print(f"成功加载AUT部门员工: {len(employees)}人")
         except Exception as e:
@@ -592,7 +596,7 @@ class AUTScoreView(QWidget):
             self.weighted_total_label.setText(f"总评分: {total_score:.1f}/130分 ({total_percentage:.1f}%)")
             
             # 根据岗位技能系数和制度要求比例确定职级
-            predicted_grade = self.determine_grade(skill_coefficient, requirement_ratio)
+            predicted_grade = grade_by_coefficient(skill_coefficient, requirement_ratio)
             self.predicted_grade_label.setText(f"预测职级: {predicted_grade}")
             
             # 更新界面样式
@@ -609,13 +613,8 @@ class AUTScoreView(QWidget):
             else:
                 self.predicted_grade_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #d32f2f;")
             
-            # 获取员工当前职级
-            self.score_db.cursor.execute(
-                "SELECT grade_2024, grade_2023 FROM employees WHERE employee_no = ?", 
-                (self.current_employee_no,)
-            )
-            grades = self.score_db.cursor.fetchone()
-            current_grade = grades[0] if grades[0] else (grades[1] if grades[1] else "未知")
+            # 获取员工当前职级（评定年份之前最近一年的职级）
+            current_grade = self.get_current_grade(int(self.year_label.text()))
             
             # 构建计算详情
             calculation_details = {
@@ -668,24 +667,14 @@ class AUTScoreView(QWidget):
             )
             return "未评定"
     
-    def determine_grade(self, skill_coefficient, requirement_ratio):
-        """根据岗位技能系数和制度要求比例确定职级"""
-        # G4B门槛: 岗位技能系数≥90%, 制度要求比例0~5%
-        if skill_coefficient >= 90 and 0 <= requirement_ratio <= 5:
-            return "G4B"
-        # G4A门槛: 岗位技能系数≥80%, 制度要求比例10%~20%
-        elif skill_coefficient >= 80 and 10 <= requirement_ratio <= 20:
-            return "G4A"
-        # G3门槛: 岗位技能系数≥50%, 制度要求比例40%~50%
-        elif skill_coefficient >= 50 and 40 <= requirement_ratio <= 50:
-            return "G3"
-        # G2门槛: 岗位技能系数≥30%, 制度要求比例20%~40%
-        elif skill_coefficient >= 30 and 20 <= requirement_ratio <= 40:
-            return "G2"
-        # G1门槛: 无特定要求
-        else:
-            return "G1"
-    
+    def get_current_grade(self, year):
+        """当前员工在指定评定年份之前最近一年的职级"""
+        self.score_db.cursor.execute(
+            QUERIES['employee_grades.current_by_no'], (self.current_employee_no, year - 1)
+        )
+        result = self.score_db.cursor.fetchone()
+        return result[0] if result else "未知"
+
     def save_scores(self):
         """保存评分"""
         # 如果current_employee_no为None但界面已选择员工，则重新获取员工编号
@@ -801,6 +790,7 @@ class AUTScoreView(QWidget):
                 
                 self.score_db.cursor.execute("SELECT last_insert_rowid()")
                 requirement_item_id = self.score_db.cursor.fetchone()[0]
+                self.score_db.manager.record_change('department_assessment_items', requirement_item_id, INSERT)
             else:
                 requirement_item_id = requirement_item[0]
             
@@ -844,15 +834,10 @@ class AUTScoreView(QWidget):
             total_percentage = total_score / 130 * 100 if total_score > 0 else 0
             
             # 计算预测职级
-            predicted_grade = self.determine_grade(skill_coefficient, requirement_ratio)
+            predicted_grade = grade_by_coefficient(skill_coefficient, requirement_ratio)
             
-            # 获取员工当前职级
-            self.score_db.cursor.execute(
-                "SELECT grade_2024, grade_2023 FROM employees WHERE employee_no = ?", 
-                (self.current_employee_no,)
-            )
-            grades = self.score_db.cursor.fetchone()
-            current_grade = grades[0] if grades[0] else (grades[1] if grades[1] else "未知")
+            # 获取员工当前职级（评定年份之前最近一年的职级）
+            current_grade = self.get_current_grade(year)
             
             # 构建计算详情
             calculation_details = {
@@ -887,13 +872,15 @@ class AUTScoreView(QWidget):
             ))
             
             self.score_db.conn.commit()
+            self.score_db.manager.record_change('predicted_grades', (self.current_employee_no, year), UPDATE)
             
-            # 更新员工表的职级字段
-            grade_field = f"grade_{year}"
-            self.score_db.cursor.execute(f"""
-            UPDATE employees SET {grade_field} = ? WHERE employee_no = ?
-            """, (predicted_grade, self.current_employee_no))
+            # 写入职级历史表（员工表中对应年份的职级字段由触发器同步）
+            self.score_db.cursor.execute(
+                QUERIES['employee_grades.upsert_by_no'],
+                (self.current_employee_no, year, predicted_grade, "AUT成绩评定")
+            )
             self.score_db.conn.commit()
+            self.score_db.manager.record_change('employee_grades', self.current_employee_no, UPDATE)
             
             # 记录操作日志
             employee_name = self.employee_combo.currentText().split(" (")[0]
@@ -907,6 +894,7 @@ class AUTScoreView(QWidget):
             ))
             
             self.score_db.conn.commit()
+            self.score_db.manager.record_change('operation_logs', None, INSERT)
             
             InfoBar.success(
                 title='保存成功',
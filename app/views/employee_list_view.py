@@ -1,18 +1,21 @@
 import datetime
 
-from PyQt5.QtCore import Qt, pyqtSignal, QSize
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QTimer
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout,
-    QHeaderView, QLabel, QTableWidgetItem, QDialogButtonBox, QAbstractItemView
+    QHeaderView, QLabel, QDialogButtonBox, QAbstractItemView
 )
 from qfluentwidgets import (
     SearchLineEdit, PushButton, InfoBar, InfoBarPosition,
-    ComboBox, CardWidget, TableWidget, FluentIcon as FIF, TransparentToolButton, SubtitleLabel,
+    ComboBox, CardWidget, TableView, FluentIcon as FIF, TransparentToolButton, SubtitleLabel,
     StateToolTip, LineEdit, TextEdit, MessageBox,
     BodyLabel, SpinBox, EditableComboBox
 )
 
+from ..models.data_events import ALL_TABLES, DELETE, RESET, UPDATE
+from .employee_table_model import EmployeeTableModel
+
 
 class EmployeeListView(QWidget):
     """员工列表视图 - Fluent Design风格"""
@@ -20,6 +23,9 @@ class EmployeeListView(QWidget):
     # 自定义信号，当选择员工时发出
     employeeSelected = pyqtSignal(object)
 
+    # 搜索框停止输入多久后执行搜索（毫秒）
+    SEARCH_DELAY = 300
+
     def __init__(self, db, parent=None):
         super().__init__(parent)
         self.db = db
@@ -32,6 +38,9 @@ class EmployeeListView(QWidget):
         # 加载员工数据
         self.loadEmployeeData()
 
+        # 其他页面或后台任务修改员工数据后，只更新受影响的行
+        self.db.manager.events.dataChanged.connect(self.onDataChanged)
+
     def initUI(self):
         """初始化UI"""
         # 主布局
@@ -50,11 +59,18 @@ class EmployeeListView(QWidget):
 
         # 搜索框
         self.search_edit = SearchLineEdit(self)
-        self.search_edit.setPlaceholderText("搜索员工（姓名、工号、GID或部门）")
+        self.search_edit.setPlaceholderText("搜索员工（姓名、工号、GID、部门或备注）")
         self.search_edit.setFixedWidth(320)
-        self.search_edit.textChanged.connect(self.filterEmployees)
         top_bar.addWidget(self.search_edit)
 
+        # 输入时延迟搜索，避免每次按键都查询数据库
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.filterEmployees)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.search_edit.searchSignal.connect(self.filterEmployees)
+
         top_bar.addStretch(1)
 
         # 部门筛选下拉框
@@ -92,6 +108,23 @@ class EmployeeListView(QWidget):
 
         top_bar.addWidget(grade_container)
 
+        # 状态筛选下拉框
+        status_container = QWidget()
+        status_layout = QHBoxLayout(status_container)
+        status_layout.setContentsMargins(0, 0, 0, 0)
+        status_layout.setSpacing(5)
+
+        status_label = QLabel("状态:", self)
+        status_layout.addWidget(status_label)
+
+        self.status_filter = ComboBox(self)
+        self.status_filter.setPlaceholderText("全部")
+        self.status_filter.setMinimumWidth(100)
+        self.status_filter.currentTextChanged.connect(self.filterEmployees)
+        status_layout.addWidget(self.status_filter)
+
+        top_bar.addWidget(status_container)
+
         # 操作按钮
         self.refresh_btn = TransparentToolButton(FIF.SYNC, self)
         self.refresh_btn.setToolTip("刷新")
@@ -110,22 +143,24 @@ class EmployeeListView(QWidget):
         card_layout = QVBoxLayout(self.table_card)
         card_layout.setContentsMargins(15, 15, 15, 15)
 
-        # 使用 TableWidget 替代 QTableView
-        self.table_view = TableWidget(self.table_card)
+        # 使用数据模型驱动的 TableView，只渲染可见行，数据在滚动时按需加载
+        self.table_model = EmployeeTableModel(self.db, self)
+        self.table_view = TableView(self.table_card)
+        self.table_view.setModel(self.table_model)
         self.table_view.setBorderVisible(True)
         self.table_view.setBorderRadius(8)
         self.table_view.setWordWrap(False)
         self.table_view.setAlternatingRowColors(True)
-        self.table_view.setColumnCount(7)
         self.table_view.verticalHeader().hide()
-        self.table_view.setHorizontalHeaderLabels(['工号', 'GID', '姓名', '部门', '当前职级', '状态', '备注'])
         self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_view.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
         self.table_view.setSortingEnabled(True)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table_view.setEditTriggers(QAbstractItemView.NoEditTriggers)  # 禁用直接编辑
 
         # 连接表格项点击信号
-        self.table_view.cellClicked.connect(self.onTableClicked)
-        self.table_view.cellDoubleClicked.connect(self.onTableDoubleClicked)
+        self.table_view.clicked.connect(self.onTableClicked)
+        self.table_view.doubleClicked.connect(self.onTableDoubleClicked)
 
         card_layout.addWidget(self.table_view)
 
@@ -180,120 +215,57 @@ class EmployeeListView(QWidget):
 
     def loadEmployeeData(self, apply_filter=True):
         """加载员工数据"""
-        # 保存当前筛选条件
-        current_dept = self.department_filter.currentText()
-        current_grade = self.grade_filter.currentText()
-        search_text = self.search_edit.text()
-
-        # 保存排序状态
-        sort_column = self.table_view.horizontalHeader().sortIndicatorSection()
-        sort_order = self.table_view.horizontalHeader().sortIndicatorOrder()
-
-        # 临时禁用排序功能，避免在加载数据过程中触发排序
-        self.table_view.setSortingEnabled(False)
-
-        # 清除表格数据
-        self.table_view.clearContents()
-        self.table_view.setRowCount(0)
-
-        # 获取员工数据
-        employees = self.db.get_all_employees()
-
-        # 加载部门列表到筛选下拉框
-        departments = set()
-        for emp in employees:
-            if emp.get('department'):
-                departments.add(emp.get('department'))
-
-        # 更新部门下拉框
-        self.department_filter.clear()
-        self.department_filter.addItem("全部")
-        for dept in sorted(departments):
-            self.department_filter.addItem(dept)
-
-        # 如果之前有选中的部门，则恢复选中
-        if current_dept and current_dept in departments:
-            self.department_filter.setCurrentText(current_dept)
-
-        # 设置表格行数
-        self.table_view.setRowCount(len(employees))
-
-        # 添加员工数据到表格
-        for row, emp in enumerate(employees):
-            # 获取最新年份的职级
-            latest_grade = self.getLatestGrade(emp)
-
-            # 获取备注并处理长文本
-            notes = emp.get('notes', '')
-            if notes is None:  # 确保None值显示为空字符串
-                notes = ""
-            else:
-                notes = str(notes)
-
-            truncated_notes = notes
-            if len(notes) > 30:  # 限制备注显示长度为30个字符
-                truncated_notes = notes[:27] + "..."
-
-            # 添加表格项，不再包含ID列
-            self.table_view.setItem(row, 0, QTableWidgetItem(str(emp.get('employee_no', ''))))
-            self.table_view.setItem(row, 1, QTableWidgetItem(str(emp.get('gid', ''))))
-            self.table_view.setItem(row, 2, QTableWidgetItem(str(emp.get('name', ''))))
-            self.table_view.setItem(row, 3, QTableWidgetItem(str(emp.get('department', ''))))
-            self.table_view.setItem(row, 4, QTableWidgetItem(str(latest_grade)))
-            self.table_view.setItem(row, 5, QTableWidgetItem(str(emp.get('status', ''))))
-            self.table_view.setItem(row, 6, QTableWidgetItem(truncated_notes))
-
-            # 在工号列中存储employee_no作为用户数据，用于标识
-            self.table_view.item(row, 0).setData(Qt.UserRole, emp.get('employee_no'))
-
-            # 如果备注被截断，添加工具提示显示完整内容
-            if len(notes) > 30:
-                self.table_view.item(row, 6).setToolTip(notes)
-
-        # 设置表格列宽
-        self.table_view.setColumnWidth(0, 80)  # ID
-        self.table_view.setColumnWidth(1, 120)  # 工号
-        self.table_view.setColumnWidth(2, 120)  # GID
-        self.table_view.setColumnWidth(3, 150)  # 姓名
-        self.table_view.setColumnWidth(4, 150)  # 部门
-        self.table_view.setColumnWidth(5, 100)  # 职级
-        self.table_view.setColumnWidth(6, 100)  # 状态
-
-        # 更新员工计数
-        self.count_label.setText(f'总计: {len(employees)} 名员工')
-
-        # 重新启用排序功能
-        self.table_view.setSortingEnabled(True)
+        # 更新部门和状态下拉框，并恢复之前的选中项
+        self._reloadFilterItems(self.department_filter, self.db.get_departments())
+        self._reloadFilterItems(self.status_filter, self.db.get_statuses())
 
-        # 恢复之前的排序状态
-        self.table_view.horizontalHeader().setSortIndicator(sort_column, sort_order)
-
-        # 应用过滤器
-        if apply_filter and (search_text or current_dept != "全部" or current_grade != "全部"):
+        # 重新加载表格数据（筛选和排序均在数据库中完成）
+        if apply_filter:
             self.filterEmployees()
+        else:
+            self.table_model.reload({})
+            self.count_label.setText(f'总计: {self.table_model.total_count} 名员工')
+
+    def onDataChanged(self, table, key, operation):
+        """数据修改通知（见 app.models.data_events）"""
+        if table not in ('employees', 'employee_grades', ALL_TABLES):
+            return
+        if operation == RESET:
+            self.loadEmployeeData()
+            return
 
-    def getLatestGrade(self, employee):
-        """获取员工最新的职级"""
-        # 从旧的字段中查找职级（使用最新年份）
-        grades = {}
-
-        # 查找所有带年份的职级字段
-        for key, value in employee.items():
-            if key.startswith('grade_') and value:
-                try:
-                    # 提取年份
-                    year = int(key.split('_')[1])
-                    grades[year] = value
-                except (ValueError, IndexError):
-                    continue
-
-        # 如果没有找到任何职级，返回空字符串
-        if not grades:
-            return ""
-
-        # 返回最大年份的职级
-        latest_year = max(grades.keys())
-        return f"{grades[latest_year]} ({latest_year})"
+        # 职级记录的增删只影响该员工的最新职级列
+        if table == 'employee_grades':
+            operation = UPDATE
+        self.table_model.apply_change(key, operation)
+        if table == 'employees' and self._filterItemsChanged(key, operation):
+            self._reloadFilterItems(self.department_filter, self.db.get_departments())
+            self._reloadFilterItems(self.status_filter, self.db.get_statuses())
+        if operation == DELETE and key == self.selected_employee_id:
+            self.selected_employee_id = None
+            self.edit_btn.setEnabled(False)
+            self.delete_btn.setEnabled(False)
+        self.count_label.setText(f'总计: {self.table_model.total_count} 名员工')
+
+    def _filterItemsChanged(self, employee_no, operation):
+        """员工修改后部门或状态下拉框是否需要更新（删除员工可能使某个部门不再有员工）"""
+        if operation == DELETE:
+            return True
+        employee = self.db.get_employee_by_no(employee_no)
+        if employee is None:
+            return True
+        return (self.department_filter.findText(employee['department'] or '') < 0
+                or self.status_filter.findText(employee['status'] or '') < 0)
+
+    def _reloadFilterItems(self, combo, items):
+        """重新填充筛选下拉框（阻止信号，避免每添加一项都触发筛选）"""
+        current = combo.currentText()
+        combo.blockSignals(True)
+        combo.clear()
+        combo.addItem("全部")
+        combo.addItems(items)
+        combo.setCurrentText(current if current in items else "全部")
+        combo.blockSignals(False)
 
     def refreshEmployeeList(self):
         """刷新员工列表"""
@@ -305,13 +277,13 @@ class EmployeeListView(QWidget):
             state_tooltip.show()
 
             # 记录加载前的行数，用于检测刷新后是否有数据
-            before_rows = self.table_view.rowCount()
+            before_rows = self.table_model.total_count
 
             # 加载数据
             self.loadEmployeeData()
 
             # 检查加载后的行数，确保数据正常加载
-            after_rows = self.table_view.rowCount()
+            after_rows = self.table_model.total_count
             if after_rows == 0 and before_rows > 0:
                 print("警告：刷新后表格为空，可能存在数据加载问题")
 
@@ -356,62 +328,32 @@ class EmployeeListView(QWidget):
     def filterEmployees(self):
         """根据搜索条件过滤员工列表"""
         try:
-            search_text = self.search_edit.text().lower()
+            # 立即筛选时取消尚未执行的延迟搜索
+            self.search_timer.stop()
+
+            search_text = self.search_edit.text().strip()
             department = self.department_filter.currentText()
             grade = self.grade_filter.currentText()
+            status = self.status_filter.currentText()
+
+            # 构建筛选条件，交给数据库查询
+            filters = {'text': search_text}
+            if department and department != "全部":
+                filters['department'] = department
+            if grade and grade != "全部":
+                filters['grade'] = grade
+            if status and status != "全部":
+                filters['status'] = status
+
+            # 筛选后之前选中的行可能已不在列表中
+            self.selected_employee_id = None
+            self.edit_btn.setEnabled(False)
+            self.delete_btn.setEnabled(False)
 
-            # 保存排序状态
-            sort_column = self.table_view.horizontalHeader().sortIndicatorSection()
-            sort_order = self.table_view.horizontalHeader().sortIndicatorOrder()
-
-            # 遍历所有行，根据条件显示或隐藏
-            for row in range(self.table_view.rowCount()):
-                # 安全获取单元格文本
-                def get_cell_text(row, col):
-                    item = self.table_view.item(row, col)
-                    if not item:
-                        return ""
-                    if col == 0:  # ID列特殊处理
-                        return str(item.data(Qt.DisplayRole)).lower()
-                    return item.text().lower()
-
-                # 跳过空行或无效行
-                if self.table_view.item(row, 0) is None:
-                    continue
-
-                employee_no = get_cell_text(row, 0)
-                gid = get_cell_text(row, 1)
-                name = get_cell_text(row, 2)
-                dept = get_cell_text(row, 3)
-                emp_grade = get_cell_text(row, 4)
-                status = get_cell_text(row, 5)
-                notes = get_cell_text(row, 6)
-
-                # 检查是否符合搜索文本条件
-                text_match = search_text == "" or \
-                            search_text in employee_no or \
-                            search_text in gid or \
-                            search_text in name or \
-                            search_text in dept or \
-                            search_text in emp_grade or \
-                            search_text in status or \
-                            search_text in notes
-
-                # 检查是否符合部门筛选条件
-                dept_match = department == "全部" or department.lower() == dept
-
-                # 检查是否符合职级筛选条件
-                grade_match = grade == "全部" or (grade.lower() in emp_grade.lower())
-
-                # 如果符合所有条件，则显示该行，否则隐藏
-                self.table_view.setRowHidden(row, not (text_match and dept_match and grade_match))
-
-            # 确保排序状态保持不变
-            self.table_view.horizontalHeader().setSortIndicator(sort_column, sort_order)
+            self.table_model.reload(filters)
 
             # 更新显示的员工计数
-            visible_count = sum(1 for row in range(self.table_view.rowCount()) if not self.table_view.isRowHidden(row))
-            self.count_label.setText(f'总计: {visible_count} 名员工')
+            self.count_label.setText(f'总计: {self.table_model.total_count} 名员工')
         except Exception as e:
             print(f"筛选员工列表失败: {e}")
             InfoBar.error(
@@ -424,20 +366,11 @@ class EmployeeListView(QWidget):
                 parent=self
             )
 
-    def onTableClicked(self, row, column):
+    def onTableClicked(self, index):
         """表格项被单击时的处理函数"""
         try:
-            # 检查该行是否有效
-            if row < 0 or row >= self.table_view.rowCount():
-                return
-
-            # 安全获取数据
-            employee_item = self.table_view.item(row, 0)  # 工号列
-            if employee_item is None:
-                return
-
             # 获取员工编号
-            employee_no = employee_item.data(Qt.UserRole) or employee_item.text()
+            employee_no = self.table_model.employee_no(index.row())
             if not employee_no:
                 return
 
@@ -452,20 +385,11 @@ class EmployeeListView(QWidget):
             self.edit_btn.setEnabled(False)
             self.delete_btn.setEnabled(False)
 
-    def onTableDoubleClicked(self, row, column):
+    def onTableDoubleClicked(self, index):
         """表格项被双击时的处理函数"""
         try:
-            # 检查该行是否有效
-            if row < 0 or row >= self.table_view.rowCount():
-                return
-
-            # 安全获取数据
-            employee_item = self.table_view.item(row, 0)  # 工号列
-            if employee_item is None:
-                return
-
             # 获取员工编号
-            employee_no = employee_item.data(Qt.UserRole) or employee_item.text()
+            employee_no = self.table_model.employee_no(index.row())
             if not employee_no:
                 return
 
@@ -606,15 +530,8 @@ class EmployeeListView(QWidget):
             # 创建并显示对话框
             dialog = EmployeeDialog(self)
 
-            # 获取现有部门列表
-            departments = set()
-            for row in range(self.table_view.rowCount()):
-                dept = self.table_view.item(row, 3)
-                if dept and dept.text():
-                    departments.add(dept.text())
-
-            # 添加部门到下拉框
-            dialog.department_edit.addItems(sorted(list(departments)))
+            # 添加现有部门到下拉框
+            dialog.department_edit.addItems(self.db.get_departments())
 
             # 显示对话框
             if dialog.exec_():
@@ -641,9 +558,6 @@ class EmployeeListView(QWidget):
                             user="管理员"
                         )
 
-                    # 刷新列表
-                    self.refreshEmployeeList()
-
                     # 显示成功消息
                     InfoBar.success(
                         title='添加成功',
@@ -724,10 +638,7 @@ class EmployeeListView(QWidget):
                 success = self.db.delete_employee_by_no(self.selected_employee_id, "管理员")
 
                 if success:
-                    # 刷新列表
-                    self.refreshEmployeeList()
-
-                    # 重置选中状态
+                    # 列表由数据修改通知更新，这里只重置选中状态
                     self.selected_employee_id = None
                     self.edit_btn.setEnabled(False)
                     self.delete_btn.setEnabled(False)
@@ -12,11 +12,15 @@ from PyQt5.QtWidgets import (
 from qfluentwidgets import (
     PushButton, ComboBox, LineEdit, SpinBox, DoubleSpinBox,
     MessageBox, InfoBar, InfoBarPosition, SearchLineEdit,
-    FluentIcon as FIF, TableWidget, TreeWidget, SwitchButton,
+    FluentIcon as FIF, TableWidget, TableView, TreeWidget, SwitchButton,
     TransparentToolButton, ToolButton, CardWidget, SimpleCardWidget,
     PrimaryPushButton, PrimaryToolButton
 )
 
+from ..models.grades import is_promotion
+from ..utils.tasks import start_task
+from .score_matrix_model import ScoreMatrixModel
+
 class EmployeeScoreView(QWidget):
     """员工成绩录入界面"""
     
@@ -164,10 +168,10 @@ class EmployeeScoreView(QWidget):
         # 如果有部门数据，添加到下拉框
         if departments:
             for dept in departments:
-                self.department_combo.addItem(dept, dept)  # 确保数据值与显示文本相同
+                self.department_combo.addItem(dept, userData=dept)  # 确保数据值与显示文本相同
         else:
             # 如果没有部门数据，显示提示
-            self.department_combo.addItem("无部门数据", "")
+            self.department_combo.addItem("无部门数据", userData="")
             print("没有可用的部门数据")
     
     def load_employees(self):
@@ -284,7 +288,7 @@ class EmployeeScoreView(QWidget):
         # 获取员工信息
         employee_info = self.score_db.get_employee_info(employee_id)
         if employee_info:
-            current_grade = employee_info.get('grade_2024') or employee_info.get('grade_2023') or "未设置"
+            current_grade = employee_info.get('latest_grade') or "未设置"
             self.employee_info_label.setText(f"员工: {employee_info['name']} ({employee_id}) | 部门: {employee_info['department']} | 当前职级: {current_grade}")
         else:
             self.employee_info_label.setText(f"员工: (工号: {employee_id})")
@@ -437,44 +441,49 @@ class EmployeeScoreView(QWidget):
         if not file_path:
             return
         
-        # 导入成绩
-        result = self.score_db.import_employee_scores(file_path, year)
-        
-        if result and result.get('success'):
-            # 如果导入成功
-            InfoBar.success(
-                title='导入成功',
-                content=f"成功导入 {result.get('added')} 条新成绩, 更新 {result.get('updated')} 条成绩",
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=3000,
-                parent=self
-            )
-            
-            # 如果有错误，显示错误信息
-            if result.get('errors') and len(result.get('errors')) > 0:
-                error_dialog = MessageBox(
-                    '导入提示',
-                    f"导入过程中有 {len(result.get('errors'))} 条记录出现错误，请检查数据格式。",
-                    self
+        def work(task):
+            task.progress(0, 0, "正在导入成绩...")
+            return task.database(self.score_db).import_employee_scores(file_path, year)
+
+        def on_success(result):
+            if result and result.get('success'):
+                # 如果导入成功
+                InfoBar.success(
+                    title='导入成功',
+                    content=f"成功导入 {result.get('added')} 条新成绩, 更新 {result.get('updated')} 条成绩",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=3000,
+                    parent=self
                 )
-                error_dialog.exec()
-            
-            # 刷新当前显示的员工成绩
-            if self.current_employee_no:
-                self.load_employee_scores(self.current_employee_no)
-        else:
-            # 如果导入失败
-            InfoBar.error(
-                title='导入失败',
-                content="导入成绩时出现错误，请检查文件格式",
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=3000,
-                parent=self
-            )
+
+                # 如果有错误，显示错误信息
+                if result.get('errors') and len(result.get('errors')) > 0:
+                    error_dialog = MessageBox(
+                        '导入提示',
+                        f"导入过程中有 {len(result.get('errors'))} 条记录出现错误，请检查数据格式。",
+                        self
+                    )
+                    error_dialog.exec()
+
+                # 刷新当前显示的员工成绩
+                if self.current_employee_no:
+                    self.load_employee_scores(self.current_employee_no)
+            else:
+                # 如果导入失败
+                InfoBar.error(
+                    title='导入失败',
+                    content="导入成绩时出现错误，请检查文件格式",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=3000,
+                    parent=self
+                )
+
+        # 读取文件和写入成绩在后台线程中执行
+        start_task(self, "正在导入成绩", work, on_success)
     
     def export_template(self):
         """导出成绩录入模板"""
@@ -588,50 +597,49 @@ class EmployeeScoreView(QWidget):
         dialog.yesButton.setText('开始计算')
         dialog.cancelButton.setText('取消')
         
-        if dialog.exec():
-            # 获取部门所有员工
-            employees = self.score_db.get_department_employees(department)
-            
+        if not dialog.exec():
+            return
+
+        def work(task):
+            task.progress(0, 0, f"正在计算 {department} 部门的预测职级...")
+            # 批量计算部门所有员工的预测职级
+            return task.database(self.score_db).calculate_predicted_grades_bulk(department, year)
+
+        def on_success(bulk_result):
+            results = bulk_result.get('results', []) if bulk_result else []
+
             # 计算结果统计
-            success_count = 0
-            fail_count = 0
+            success_count = len(results)
+            fail_count = bulk_result.get('failed', 0) if bulk_result else 0
             promotion_count = 0
             demotion_count = 0
             unchanged_count = 0
-            
-            # 遍历计算每个员工的预测职级
-            for employee in employees:
-                result = self.score_db.calculate_predicted_grade(employee['employee_no'], year)
-                
-                if result and result.get('success'):
-                    success_count += 1
-                    
-                    # 统计晋升/降级/不变情况
-                    current_grade = result.get('current_grade')
-                    predicted_grade = result.get('predicted_grade')
-                    
-                    if current_grade == predicted_grade:
-                        unchanged_count += 1
-                    elif self._is_promotion(current_grade, predicted_grade):
-                        promotion_count += 1
-                    else:
-                        demotion_count += 1
+
+            # 统计晋升/降级/不变情况
+            for result in results:
+                current_grade = result.get('current_grade')
+                predicted_grade = result.get('predicted_grade')
+
+                if current_grade == predicted_grade:
+                    unchanged_count += 1
+                elif self._is_promotion(current_grade, predicted_grade):
+                    promotion_count += 1
                 else:
-                    fail_count += 1
-            
+                    demotion_count += 1
+
             # 显示计算结果
             if success_count > 0:
                 result_message = f"成功计算 {success_count} 名员工的预测职级\n\n"
                 result_message += f"晋升: {promotion_count} 人\n"
                 result_message += f"降级: {demotion_count} 人\n"
                 result_message += f"保持不变: {unchanged_count} 人\n"
-                
+
                 if fail_count > 0:
                     result_message += f"\n计算失败: {fail_count} 人 (可能是缺少考核成绩或公式)"
-                
+
                 result_dialog = MessageBox('计算完成', result_message, self)
                 result_dialog.exec()
-                
+
                 # 如果当前有选中员工，刷新其显示
                 if self.current_employee_no:
                     self.load_employee_scores(self.current_employee_no)
@@ -645,20 +653,12 @@ class EmployeeScoreView(QWidget):
                     duration=3000,
                     parent=self
                 )
+
+        start_task(self, "正在计算预测职级", work, on_success)
     
     def _is_promotion(self, current_grade, predicted_grade):
         """判断是否为晋升"""
-        # 简单判断常见职级格式
-        # G1 < G2 < G3 < G4A < G4B < G5
-        grades = {
-            'G1': 1, 'G2': 2, 'G3': 3, 'G4A': 4, 'G4B': 5, 'G5': 6,
-            'g1': 1, 'g2': 2, 'g3': 3, 'g4a': 4, 'g4b': 5, 'g5': 6
-        }
-        
-        current_value = grades.get(current_grade, 0)
-        predicted_value = grades.get(predicted_grade, 0)
-        
-        return predicted_value > current_value
+        return is_promotion(current_grade, predicted_grade)
     
     def batch_edit_scores(self):
         """批量编辑成绩"""
@@ -776,8 +776,11 @@ class BatchScoreDialog(QDialog):
         
         main_layout.addLayout(top_layout)
         
-        # 表格区域
-        self.score_table = TableWidget(self)
+        # 表格区域：成绩矩阵由数据模型提供，只渲染可见单元格
+        self.score_model = ScoreMatrixModel(self)
+        self.score_model.invalidScore.connect(self.on_invalid_score)
+        self.score_table = TableView(self)
+        self.score_table.setModel(self.score_model)
         self.score_table.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
         
         main_layout.addWidget(self.score_table)
@@ -811,11 +814,10 @@ class BatchScoreDialog(QDialog):
     
     def load_data(self):
         """加载表格数据"""
-        # 获取部门所有员工和考核项目
-        employees = self.score_db.get_department_employees(self.department)
-        assessment_items = self.score_db.get_all_assessment_items(self.department)
+        # 部门所有员工、考核项目和成绩一次取得
+        matrix = self.score_db.get_department_score_matrix(self.department, self.year)
         
-        if not employees:
+        if not matrix or not matrix['employees']:
             InfoBar.warning(
                 title='提示',
                 content=f"未找到{self.department}部门的员工",
@@ -827,7 +829,7 @@ class BatchScoreDialog(QDialog):
             )
             return
             
-        if not assessment_items:
+        if not matrix['items']:
             InfoBar.warning(
                 title='提示',
                 content=f"未找到{self.department}部门的考核项目",
@@ -839,136 +841,70 @@ class BatchScoreDialog(QDialog):
             )
             return
         
-        # 设置表格列
-        self.score_table.setColumnCount(len(assessment_items) + 3)  # 工号、姓名、职级、考核项目...
-        
-        # 设置表头
-        headers = ['工号', '姓名', '职级']
-        item_columns = []
-        for item in assessment_items:
-            headers.append(f"{item['assessment_name']} ({item['weight']})")
-            item_columns.append(item['id'])
-        
-        self.score_table.setHorizontalHeaderLabels(headers)
-        
-        # 保存考核项目ID用于后续保存数据
-        self.item_columns = item_columns
-        
-        # 填充员工数据
-        self.score_table.setRowCount(len(employees))
+        self.score_model.set_matrix(matrix)
         
-        for row, employee in enumerate(employees):
-            # 工号
-            employee_no_item = QTableWidgetItem(employee['employee_no'])
-            employee_no_item.setFlags(employee_no_item.flags() & ~Qt.ItemIsEditable)  # 不可编辑
-            self.score_table.setItem(row, 0, employee_no_item)
-            
-            # 姓名
-            name_item = QTableWidgetItem(employee['name'])
-            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)  # 不可编辑
-            self.score_table.setItem(row, 1, name_item)
-            
-            # 职级 - 使用最新职级
-            grade_text = employee.get('grade_2024') or employee.get('grade_2023') or "未设置"
-            grade_item = QTableWidgetItem(grade_text)
-            grade_item.setFlags(grade_item.flags() & ~Qt.ItemIsEditable)  # 不可编辑
-            self.score_table.setItem(row, 2, grade_item)
-            
-            # 获取员工现有成绩
-            employee_scores = self.score_db.get_employee_scores(employee['employee_no'], self.year)
-            score_dict = {score['assessment_item_id']: score for score in employee_scores}
-            
-            # 填充成绩项
-            for col, item_id in enumerate(self.item_columns):
-                table_col = col + 3  # 前三列是固定信息
-                
-                # 创建可编辑的成绩单元格
-                score_value = ""
-                if item_id in score_dict:
-                    score_value = str(score_dict[item_id]['score'])
-                
-                score_item = QTableWidgetItem(score_value)
-                self.score_table.setItem(row, table_col, score_item)
+        # 重新应用搜索条件
+        self.filter_table()
         
-        # 调整列宽
-        self.score_table.resizeColumnsToContents()
+        # 调整列宽：成绩列按表头文字设置，不逐个测量单元格（大部门有十几万个单元格）
+        metrics = self.score_table.horizontalHeader().fontMetrics()
+        for column in range(len(ScoreMatrixModel.FIXED_HEADERS), self.score_model.columnCount()):
+            header = self.score_model.headerData(column, Qt.Horizontal)
+            self.score_table.setColumnWidth(column, metrics.horizontalAdvance(header) + 30)
         self.score_table.setColumnWidth(0, 100)  # 工号列
         self.score_table.setColumnWidth(1, 120)  # 姓名列
         self.score_table.setColumnWidth(2, 80)   # 职级列
     
+    def on_invalid_score(self, row):
+        """输入的分数不是数字"""
+        InfoBar.error(
+            title='格式错误',
+            content=f"第 {row+1} 行的分数格式错误，应为数字",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
+    
     def filter_table(self):
         """根据搜索框筛选表格内容"""
         search_text = self.search_edit.text().strip().lower()
         
-        for row in range(self.score_table.rowCount()):
+        for row, (employee_no, employee_name, _) in enumerate(self.score_model.employees):
             hide_row = False
             
             if search_text:
-                employee_no = self.score_table.item(row, 0).text().lower()
-                employee_name = self.score_table.item(row, 1).text().lower()
-                
-                if search_text not in employee_no and search_text not in employee_name:
+                if search_text not in employee_no.lower() and search_text not in (employee_name or '').lower():
                     hide_row = True
             
             self.score_table.setRowHidden(row, hide_row)
     
     def save_all_scores(self):
         """保存所有成绩"""
-        count_added = 0
-        count_updated = 0
+        # 分数格式在输入时已校验，这里收集未隐藏行中已填写的成绩
+        visible_rows = [
+            row for row in range(self.score_model.rowCount())
+            if not self.score_table.isRowHidden(row)
+        ]
+        rows = self.score_model.score_rows(visible_rows, self.year)
+        
+        # 所有成绩在一个事务中保存
+        result = self.score_db.save_employee_scores_bulk(rows)
+        if not result:
+            InfoBar.error(
+                title='保存失败',
+                content="保存成绩时发生错误，所有修改已撤销",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=5000,
+                parent=self
+            )
+            return
         
-        for row in range(self.score_table.rowCount()):
-            if self.score_table.isRowHidden(row):
-                continue
-                
-            employee_no = self.score_table.item(row, 0).text()
-            
-            for col, item_id in enumerate(self.item_columns):
-                table_col = col + 3  # 前三列是固定信息
-                
-                score_text = self.score_table.item(row, table_col).text().strip()
-                if not score_text:
-                    continue
-                    
-                try:
-                    score_value = float(score_text)
-                except ValueError:
-                    InfoBar.error(
-                        title='格式错误',
-                        content=f"第 {row+1} 行的分数格式错误，应为数字",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-                    continue
-                
-                # 准备成绩数据
-                score_data = {
-                    'employee_no': employee_no,
-                    'assessment_year': self.year,
-                    'assessment_item_id': item_id,
-                    'score': score_value,
-                    'comment': ''  # 批量录入时不设置备注
-                }
-                
-                # 保存成绩
-                success = self.score_db.save_employee_score(score_data)
-                
-                if success:
-                    # 判断是新增还是更新
-                    existing_scores = self.score_db.get_employee_scores(employee_no, self.year)
-                    is_update = False
-                    for existing_score in existing_scores:
-                        if existing_score['assessment_item_id'] == item_id:
-                            is_update = True
-                            break
-                    
-                    if is_update:
-                        count_updated += 1
-                    else:
-                        count_added += 1
+        count_added = result['added']
+        count_updated = result['updated']
         
         # 显示保存结果
         InfoBar.success(
@@ -1071,16 +1007,16 @@ class BatchScoreDialog(QDialog):
             
             # 收集表格数据
             data = []
-            headers = [self.score_table.horizontalHeaderItem(i).text() for i in range(self.score_table.columnCount())]
+            model = self.score_model
+            headers = [model.headerData(i, Qt.Horizontal) for i in range(model.columnCount())]
             
-            for row in range(self.score_table.rowCount()):
+            for row in range(model.rowCount()):
                 if self.score_table.isRowHidden(row):
                     continue
                     
                 row_data = {}
-                for col in range(self.score_table.columnCount()):
-                    item = self.score_table.item(row, col)
-                    row_data[headers[col]] = item.text() if item else ""
+                for col in range(model.columnCount()):
+                    row_data[headers[col]] = model.text(row, col)
                 
                 data.append(row_data)
                 
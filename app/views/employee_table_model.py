@@ -0,0 +1,167 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from app.models.data_events import DELETE, INSERT
+from app.models.database import EMPLOYEE_LIST_COLUMNS
+
+
+class EmployeeTableModel(QAbstractTableModel):
+    """员工列表数据模型 - 按列缓存数据，滚动时分批从数据库加载"""
+
+    HEADERS = ['工号', 'GID', '姓名', '部门', '当前职级', '状态', '备注']
+
+    # 每次从数据库加载的行数
+    BATCH_SIZE = 500
+
+    # 备注显示的最大长度
+    NOTES_MAX_LENGTH = 30
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.filters = {}
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+        self.total_count = 0
+        # 每列一个列表，避免为每行创建字典或表格项
+        self._columns = [[] for _ in EMPLOYEE_LIST_COLUMNS]
+
+    def reload(self, filters=None):
+        """按筛选条件重新加载数据（只统计总数，行数据在滚动时按需加载）"""
+        if filters is not None:
+            self.filters = filters
+
+        self.beginResetModel()
+        self._columns = [[] for _ in EMPLOYEE_LIST_COLUMNS]
+        self.total_count = self.db.count_employee_list(self.filters)
+        self.endResetModel()
+
+        # 预先加载第一批数据
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def canFetchMore(self, parent):
+        if parent.isValid():
+            return False
+        return len(self._columns[0]) < self.total_count
+
+    def fetchMore(self, parent):
+        """加载下一批数据"""
+        if parent.isValid():
+            return
+
+        loaded = len(self._columns[0])
+        rows = self.db.get_employee_list_rows(
+            self.filters,
+            offset=loaded,
+            limit=self.BATCH_SIZE,
+            sort_column=EMPLOYEE_LIST_COLUMNS[self.sort_column],
+            descending=self.sort_order == Qt.DescendingOrder
+        )
+        if not rows:
+            # 数据库中的数据少于统计值（如已被删除），修正总数避免重复加载
+            self.total_count = loaded
+            return
+
+        self.beginInsertRows(QModelIndex(), loaded, loaded + len(rows) - 1)
+        for column, values in zip(self._columns, zip(*rows)):
+            column.extend('' if value is None else str(value) for value in values)
+        self.endInsertRows()
+
+    def apply_change(self, employee_no, operation):
+        """某个员工的数据修改后，只更新受影响的一行（见 app.models.data_events）
+
+        已加载的行是列表的前若干行，除被修改的员工外其他行的相对顺序不变，
+        因此先移除该员工原来的行，再按它在数据库中的新位置插入（位置在已加载范围之外时不插入，
+        滚动时由 fetchMore 按偏移量正常加载）。
+        """
+        row = self.row_of(employee_no)
+        was_listed = row is not None
+        if was_listed:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            for column in self._columns:
+                del column[row]
+            self.endRemoveRows()
+
+        located = None
+        if operation != DELETE:
+            located = self.db.locate_employee_list_row(
+                employee_no, self.filters,
+                sort_column=EMPLOYEE_LIST_COLUMNS[self.sort_column],
+                descending=self.sort_order == Qt.DescendingOrder
+            )
+            if located is False:
+                # 查询出错时无法确定位置，重新加载
+                self.reload()
+                return
+
+        # 未加载的行是否原本在列表中无法得知，此时重新统计总数
+        if was_listed:
+            self.total_count -= 1
+        elif operation != INSERT and self.total_count > len(self._columns[0]):
+            self.total_count = self.db.count_employee_list(self.filters) - (located is not None)
+
+        if located is None:
+            return
+        position, values = located
+        self.total_count += 1
+        loaded = len(self._columns[0])
+        if position < loaded or (position == loaded and loaded == self.total_count - 1):
+            self.beginInsertRows(QModelIndex(), position, position)
+            for column, value in zip(self._columns, values):
+                column.insert(position, '' if value is None else str(value))
+            self.endInsertRows()
+
+    def row_of(self, employee_no):
+        """已加载的行中该员工所在的行号，未加载时返回None"""
+        try:
+            return self._columns[0].index(str(employee_no))
+        except ValueError:
+            return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        value = self._columns[index.column()][index.row()]
+        is_notes = EMPLOYEE_LIST_COLUMNS[index.column()] == 'notes'
+
+        if role == Qt.DisplayRole:
+            # 限制备注显示长度
+            if is_notes and len(value) > self.NOTES_MAX_LENGTH:
+                return value[:self.NOTES_MAX_LENGTH - 3] + "..."
+            return value
+        if role == Qt.ToolTipRole:
+            # 备注被截断时显示完整内容
+            if is_notes and len(value) > self.NOTES_MAX_LENGTH:
+                return value
+            return None
+        if role == Qt.UserRole:
+            return self.employee_no(index.row())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """排序交给数据库完成，重新加载数据"""
+        self.sort_column = column
+        self.sort_order = order
+        self.reload()
+
+    def employee_no(self, row):
+        """获取指定行的工号"""
+        if 0 <= row < self.rowCount():
+            return self._columns[0][row]
+        return None
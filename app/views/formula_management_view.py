@@ -1,6 +1,9 @@
 import os
+import copy
+import datetime
 import json
-from PyQt5.QtCore import Qt, pyqtSignal, QSize
+import time
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QTimer
 from PyQt5.QtGui import QIcon, QFont, QColor, QSyntaxHighlighter, QTextCharFormat
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
@@ -15,9 +18,13 @@ from qfluentwidgets import (
     FluentIcon as FIF, TableWidget, RoundMenu, Action,
     TransparentToolButton, ToolButton, TextEdit, PlainTextEdit,
     ScrollArea, ExpandLayout, CardWidget, SimpleCardWidget,
-    Slider, PrimaryPushButton, TitleLabel, BodyLabel
+    Slider, PrimaryPushButton, TitleLabel, BodyLabel, TableView
 )
 
+from ..models.grade_formula import CompiledFormula, FormulaSimulator
+from ..models.grades import is_promotion
+from .simulation_changes_model import SimulationChangesModel
+
 class FormulaManagementView(QWidget):
     """部门职级计算公式管理界面"""
     
@@ -150,7 +157,7 @@ class FormulaManagementView(QWidget):
         """加载部门列表"""
         departments = self.score_db.get_all_departments()
         for dept in departments:
-            self.department_combo.addItem(dept, dept)
+            self.department_combo.addItem(dept, userData=dept)
     
     def load_department_formula(self):
         """加载选定部门的职级计算公式"""
@@ -447,9 +454,11 @@ class FormulaManagementView(QWidget):
         try:
             formula = json.loads(json_text)
             
-            # 打开测试对话框
-            dialog = FormulaTestDialog(self, formula)
-            dialog.exec_()
+            # 打开测试对话框，可模拟部门所有员工并调整阈值
+            dialog = FormulaTestDialog(self, formula, self.score_db, department)
+            if dialog.exec_() == QDialog.Accepted and dialog.thresholds_changed:
+                self.fill_thresholds_table(dialog.formula)
+                self.formula_json_edit.setPlainText(json.dumps(dialog.formula, indent=2, ensure_ascii=False))
             
         except Exception as e:
             InfoBar.error(
@@ -551,9 +560,26 @@ class ThresholdDialog(QDialog):
 class FormulaTestDialog(QDialog):
     """公式测试对话框"""
     
-    def __init__(self, parent=None, formula=None):
+    # 调整阈值后等待多久再重新模拟（毫秒），连续拖动时只按最后的值计算
+    SIMULATE_DELAY_MS = 150
+    
+    def __init__(self, parent=None, formula=None, score_db=None, department=None):
         super().__init__(parent)
-        self.formula = formula
+        # 在副本上调整阈值，点击"应用到公式"后才回写编辑器
+        self.formula = copy.deepcopy(formula)
+        self.score_db = score_db
+        self.department = department
+        self.thresholds_changed = False
+        # 与后台计算预测职级使用同一个公式求值器
+        self.compiled_formula = CompiledFormula(self.formula)
+        
+        # 按年份缓存的部门模拟器，员工总分每年只读取一次
+        self.simulators = {}
+        self.simulated = False
+        self.simulate_timer = QTimer(self)
+        self.simulate_timer.setSingleShot(True)
+        self.simulate_timer.setInterval(self.SIMULATE_DELAY_MS)
+        self.simulate_timer.timeout.connect(self.run_simulation)
         
         self.init_ui()
         
@@ -598,27 +624,157 @@ class FormulaTestDialog(QDialog):
         
         layout.addWidget(result_group)
         
+        # 部门模拟（需要部门和数据库）
+        if self.score_db is not None and self.department:
+            self.setMinimumWidth(700)
+            self.setup_simulation_group(layout)
+        
         # 公式预览
         formula_group = QGroupBox("公式预览", self)
         formula_layout = QVBoxLayout(formula_group)
         
         self.formula_text = PlainTextEdit(formula_group)
         self.formula_text.setReadOnly(True)
+        self.update_formula_preview()
+            
+        formula_layout.addWidget(self.formula_text)
+        
+        layout.addWidget(formula_group)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch(1)
+        
+        # 把调整后的阈值应用到公式编辑器
+        if self.score_db is not None and self.department:
+            self.apply_button = PrimaryPushButton("应用到公式", self)
+            self.apply_button.clicked.connect(self.accept)
+            button_layout.addWidget(self.apply_button)
         
+        # 关闭按钮
+        self.close_button = PushButton("关闭", self)
+        self.close_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.close_button)
+        
+        layout.addLayout(button_layout)
+    
+    def setup_simulation_group(self, layout):
+        """部门模拟区域：调整阈值，查看部门所有员工的职级变化"""
+        simulation_group = QGroupBox(f"{self.department} 部门模拟", self)
+        simulation_layout = QVBoxLayout(simulation_group)
+        
+        # 阈值调整表格，修改数值后自动重新模拟
+        self.threshold_table = TableWidget(simulation_group)
+        self.threshold_table.setColumnCount(3)
+        self.threshold_table.setHorizontalHeaderLabels(['职级', '最低分数', '最高分数'])
+        self.threshold_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.threshold_table.verticalHeader().hide()
+        
+        thresholds = self.formula.get('grade_thresholds', [])
+        self.threshold_table.setRowCount(len(thresholds))
+        for row, threshold in enumerate(thresholds):
+            grade_item = QTableWidgetItem(str(threshold['grade']))
+            grade_item.setFlags(grade_item.flags() & ~Qt.ItemIsEditable)
+            self.threshold_table.setItem(row, 0, grade_item)
+            
+            for column, key in ((1, 'min_score'), (2, 'max_score')):
+                spin = DoubleSpinBox(self.threshold_table)
+                spin.setRange(0, 1000)
+                spin.setDecimals(2)
+                spin.setSingleStep(0.5)
+                spin.setValue(float(threshold[key]))
+                spin.valueChanged.connect(lambda value, r=row, k=key: self.on_threshold_changed(r, k, value))
+                self.threshold_table.setCellWidget(row, column, spin)
+        self.threshold_table.setMaximumHeight(200)
+        simulation_layout.addWidget(self.threshold_table)
+        
+        # 考核年度和模拟按钮
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel("考核年度:"))
+        self.year_spin = SpinBox(simulation_group)
+        self.year_spin.setRange(2000, 2100)
+        self.year_spin.setValue(datetime.datetime.now().year)
+        self.year_spin.valueChanged.connect(self.schedule_simulation)
+        control_layout.addWidget(self.year_spin)
+        
+        self.simulate_button = PushButton("模拟全部门", simulation_group, FIF.PLAY)
+        self.simulate_button.clicked.connect(self.run_simulation)
+        control_layout.addWidget(self.simulate_button)
+        control_layout.addStretch(1)
+        simulation_layout.addLayout(control_layout)
+        
+        self.simulation_label = BodyLabel("调整阈值后点击\"模拟全部门\"，查看部门所有员工的职级变化（不保存预测结果）", simulation_group)
+        self.simulation_label.setWordWrap(True)
+        simulation_layout.addWidget(self.simulation_label)
+        
+        # 职级发生变化的员工
+        self.changes_model = SimulationChangesModel(self)
+        self.changes_table = TableView(simulation_group)
+        self.changes_table.setModel(self.changes_model)
+        self.changes_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.changes_table.verticalHeader().hide()
+        self.changes_table.setMinimumHeight(200)
+        simulation_layout.addWidget(self.changes_table)
+        
+        layout.addWidget(simulation_group)
+    
+    def update_formula_preview(self):
+        """刷新公式预览"""
         try:
             json_str = json.dumps(self.formula, indent=2, ensure_ascii=False)
             self.formula_text.setPlainText(json_str)
         except Exception:
             self.formula_text.setPlainText("公式解析错误")
-            
-        formula_layout.addWidget(self.formula_text)
+    
+    def on_threshold_changed(self, row, key, value):
+        """阈值被修改：重新编译公式，稍后重新模拟"""
+        self.formula['grade_thresholds'][row][key] = value
+        self.compiled_formula = CompiledFormula(self.formula)
+        self.thresholds_changed = True
+        self.update_formula_preview()
+        self.schedule_simulation()
+    
+    def schedule_simulation(self):
+        """已经模拟过时，在数值停止变化后重新模拟"""
+        if self.simulated:
+            self.simulate_timer.start()
+    
+    def run_simulation(self):
+        """把当前公式应用到部门所有员工，显示职级变化"""
+        self.simulate_timer.stop()
+        year = self.year_spin.value()
+        
+        simulator = self.simulators.get(year)
+        if simulator is None:
+            department_totals = self.score_db.get_department_totals(self.department, year)
+            if department_totals is None:
+                InfoBar.error(
+                    title='模拟失败',
+                    content="读取部门成绩时出现错误",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=3000,
+                    parent=self
+                )
+                return
+            simulator = self.simulators[year] = FormulaSimulator(department_totals)
         
-        layout.addWidget(formula_group)
+        self.simulated = True
+        if not simulator.employee_nos:
+            self.changes_model.set_changes([])
+            self.simulation_label.setText(f"{self.department} 部门没有 {year} 年的考核成绩")
+            return
         
-        # 关闭按钮
-        self.close_button = PushButton("关闭", self)
-        self.close_button.clicked.connect(self.accept)
-        layout.addWidget(self.close_button)
+        start = time.perf_counter()
+        result = simulator.run(self.formula)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        self.changes_model.set_changes(result['changes'])
+        self.simulation_label.setText(
+            f"{year}年 共 {len(simulator.employee_nos)} 人: 晋升 {result['promoted']} 人, "
+            f"降级 {result['demoted']} 人, 平级变动 {result['lateral']} 人, 不变 {result['unchanged']} 人, "
+            f"无当前职级 {result['invalid']} 人 (计算 {elapsed_ms:.1f} 毫秒)"
+        )
     
     def calculate_grade(self):
         """计算预测职级"""
@@ -638,7 +794,7 @@ class FormulaTestDialog(QDialog):
             return
         
         # 应用公式
-        predicted_grade = self._apply_formula(total_score, current_grade)
+        predicted_grade = self.compiled_formula.grade(total_score, current_grade)
         
         # 显示结果
         result_text = f"预测职级: {predicted_grade}"
@@ -647,7 +803,7 @@ class FormulaTestDialog(QDialog):
         # 添加结果说明
         if predicted_grade == current_grade:
             result_hint = f"当前职级: {current_grade} → 预测职级: {predicted_grade} (保持不变)"
-        elif self._is_promotion(current_grade, predicted_grade):
+        elif is_promotion(current_grade, predicted_grade):
             result_hint = f"当前职级: {current_grade} → 预测职级: {predicted_grade} (晋升)"
         else:
             result_hint = f"当前职级: {current_grade} → 预测职级: {predicted_grade} (降级)"
@@ -661,28 +817,3 @@ class FormulaTestDialog(QDialog):
             duration=5000,
             parent=self
         )
-    
-    def _apply_formula(self, total_score, current_grade):
-        """应用公式计算预测职级"""
-        if 'grade_thresholds' in self.formula:
-            thresholds = self.formula['grade_thresholds']
-            for threshold in thresholds:
-                if total_score >= threshold['min_score'] and total_score <= threshold['max_score']:
-                    return threshold['grade']
-        
-        # 如果没有匹配的阈值，返回当前职级
-        return current_grade
-    
-    def _is_promotion(self, current_grade, predicted_grade):
-        """判断是否为晋升"""
-        # 简单判断常见职级格式
-        # G1 < G2 < G3 < G4A < G4B < G5
-        grades = {
-            'G1': 1, 'G2': 2, 'G3': 3, 'G4A': 4, 'G4B': 5, 'G5': 6,
-            'g1': 1, 'g2': 2, 'g3': 3, 'g4a': 4, 'g4b': 5, 'g5': 6
-        }
-        
-        current_value = grades.get(current_grade, 0)
-        predicted_value = grades.get(predicted_grade, 0)
-        
-        return predicted_value > current_value 
\ No newline at end of file
@@ -14,6 +14,10 @@ from qfluentwidgets import (
     TransparentToolButton, SimpleCardWidget, MessageBox
 )
 
+from ..models.data_events import ALL_TABLES, DELETE, RESET
+from ..models.grades import is_promotion
+from ..utils.tasks import start_task
+
 # 可选的matplotlib支持
 try:
     import matplotlib
@@ -31,10 +35,15 @@ class GradeAnalysisView(QWidget):
     def __init__(self, score_db, parent=None):
         super().__init__(parent)
         self.score_db = score_db
+        # 表格中显示的预测职级，顺序与表格行一致
+        self.predicted_grades = []
         
         # 初始化界面
         self.initUI()
         
+        # 预测职级或员工信息被修改后只更新受影响的行
+        self.score_db.manager.events.dataChanged.connect(self.on_data_changed)
+        
     def initUI(self):
         """初始化界面"""
         # 主布局
@@ -62,7 +71,7 @@ class GradeAnalysisView(QWidget):
         # 添加年份选项
         current_year = datetime.datetime.now().year
         for year in range(current_year - 1, current_year + 5):
-            self.year_combo.addItem(str(year), year)
+            self.year_combo.addItem(str(year), userData=year)
         
         self.year_combo.setCurrentText(str(current_year))
         self.year_combo.setMinimumWidth(100)
@@ -128,7 +137,7 @@ class GradeAnalysisView(QWidget):
         """加载部门列表"""
         departments = self.score_db.get_all_departments()
         for dept in departments:
-            self.department_combo.addItem(dept, dept)
+            self.department_combo.addItem(dept, userData=dept)
     
     def load_analysis_data(self):
         """加载分析数据"""
@@ -147,6 +156,53 @@ class GradeAnalysisView(QWidget):
         # 更新表格
         self.update_table(predicted_grades)
     
+    def on_data_changed(self, table, key, operation):
+        """数据修改通知（见 app.models.data_events）"""
+        if table not in ('predicted_grades', 'employees', ALL_TABLES):
+            return
+        if operation == RESET:
+            # 员工批量导入不影响已有的预测职级
+            if table != 'employees':
+                self.load_analysis_data()
+            return
+        
+        if table == 'predicted_grades':
+            employee_no, year = key
+            if year != self.year_combo.currentData():
+                return
+        else:
+            # 员工姓名或部门修改后，更新该员工的行
+            employee_no = key
+        self.update_employee_row(employee_no, removed=operation == DELETE)
+    
+    def update_employee_row(self, employee_no, removed=False):
+        """重新读取一名员工的预测职级，更新表格中的对应行和统计摘要"""
+        department = self.department_combo.currentData()
+        year = self.year_combo.currentData()
+        if not department or not year:
+            return
+        
+        # 先移除原来的行，仍属于当前部门时按姓名顺序重新插入
+        for row, grade_data in enumerate(self.predicted_grades):
+            if grade_data['employee_no'] == employee_no:
+                del self.predicted_grades[row]
+                self.result_table.removeRow(row)
+                break
+        
+        grade_data = None if removed else self.score_db.get_employee_predicted_grade(employee_no, year)
+        if grade_data is not None and grade_data['department'] == department:
+            # 与 get_department_predicted_grades 的排序一致
+            row = next(
+                (row for row, other in enumerate(self.predicted_grades)
+                 if other['employee_name'] > grade_data['employee_name']),
+                len(self.predicted_grades)
+            )
+            self.predicted_grades.insert(row, grade_data)
+            self.result_table.insertRow(row)
+            self._set_result_row(row, grade_data)
+        
+        self.update_statistics(self.predicted_grades)
+    
     def update_statistics(self, predicted_grades):
         """更新统计摘要"""
         total_count = len(predicted_grades)
@@ -173,59 +229,63 @@ class GradeAnalysisView(QWidget):
     
     def update_table(self, predicted_grades):
         """更新表格"""
+        self.predicted_grades = list(predicted_grades)
         self.result_table.setRowCount(0)
         
-        for row, grade_data in enumerate(predicted_grades):
+        for row, grade_data in enumerate(self.predicted_grades):
             self.result_table.insertRow(row)
-            
-            # 员工工号
-            no_item = QTableWidgetItem(grade_data['employee_no'])
-            self.result_table.setItem(row, 0, no_item)
-            
-            # 员工姓名
-            name_item = QTableWidgetItem(grade_data['employee_name'])
-            self.result_table.setItem(row, 1, name_item)
-            
-            # 当前职级
-            current_grade_item = QTableWidgetItem(grade_data['current_grade'])
-            self.result_table.setItem(row, 2, current_grade_item)
-            
-            # 预测职级
-            predicted_grade_item = QTableWidgetItem(grade_data['predicted_grade'])
-            
-            # 根据晋升/降级/不变设置不同的背景色
-            if grade_data['current_grade'] == grade_data['predicted_grade']:
-                # 不变 - 白色
-                pass
-            elif self._is_promotion(grade_data['current_grade'], grade_data['predicted_grade']):
-                # 晋升 - 绿色
-                predicted_grade_item.setBackground(QColor(200, 255, 200))
-            else:
-                # 降级 - 红色
-                predicted_grade_item.setBackground(QColor(255, 200, 200))
-            
-            self.result_table.setItem(row, 3, predicted_grade_item)
-            
-            # 总分
-            score_item = QTableWidgetItem(str(grade_data['total_score']))
-            self.result_table.setItem(row, 4, score_item)
-            
-            # 详情按钮
-            details_layout = QHBoxLayout()
-            details_layout.setContentsMargins(4, 4, 4, 4)
-            
-            details_button = TransparentToolButton(FIF.INFO)
-            details_button.setFixedSize(QSize(30, 30))
-            details_button.setToolTip("查看详细信息")
-            details_button.clicked.connect(lambda _, data=grade_data: self.show_details(data))
-            
-            details_layout.addWidget(details_button)
-            details_layout.addStretch(1)
-            
-            details_widget = QWidget()
-            details_widget.setLayout(details_layout)
-            
-            self.result_table.setCellWidget(row, 5, details_widget)
+            self._set_result_row(row, grade_data)
+    
+    def _set_result_row(self, row, grade_data):
+        """设置一行预测结果"""
+        # 员工工号
+        no_item = QTableWidgetItem(grade_data['employee_no'])
+        self.result_table.setItem(row, 0, no_item)
+        
+        # 员工姓名
+        name_item = QTableWidgetItem(grade_data['employee_name'])
+        self.result_table.setItem(row, 1, name_item)
+        
+        # 当前职级
+        current_grade_item = QTableWidgetItem(grade_data['current_grade'])
+        self.result_table.setItem(row, 2, current_grade_item)
+        
+        # 预测职级
+        predicted_grade_item = QTableWidgetItem(grade_data['predicted_grade'])
+        
+        # 根据晋升/降级/不变设置不同的背景色
+        if grade_data['current_grade'] == grade_data['predicted_grade']:
+            # 不变 - 白色
+            pass
+        elif self._is_promotion(grade_data['current_grade'], grade_data['predicted_grade']):
+            # 晋升 - 绿色
+            predicted_grade_item.setBackground(QColor(200, 255, 200))
+        else:
+            # 降级 - 红色
+            predicted_grade_item.setBackground(QColor(255, 200, 200))
+        
+        self.result_table.setItem(row, 3, predicted_grade_item)
+        
+        # 总分
+        score_item = QTableWidgetItem(str(grade_data['total_score']))
+        self.result_table.setItem(row, 4, score_item)
+        
+        # 详情按钮
+        details_layout = QHBoxLayout()
+        details_layout.setContentsMargins(4, 4, 4, 4)
+        
+        details_button = TransparentToolButton(FIF.INFO)
+        details_button.setFixedSize(QSize(30, 30))
+        details_button.setToolTip("查看详细信息")
+        details_button.clicked.connect(lambda _, data=grade_data: self.show_details(data))
+        
+        details_layout.addWidget(details_button)
+        details_layout.addStretch(1)
+        
+        details_widget = QWidget()
+        details_widget.setLayout(details_layout)
+        
+        self.result_table.setCellWidget(row, 5, details_widget)
     
     def show_details(self, grade_data):
         """显示详细信息"""
@@ -257,9 +317,10 @@ class GradeAnalysisView(QWidget):
         if not file_path:
             return
         
-        try:
+        def work(task):
+            task.progress(0, 0, "正在读取预测职级...")
             # 获取部门预测职级结果
-            predicted_grades = self.score_db.get_department_predicted_grades(department, year)
+            predicted_grades = task.database(self.score_db).get_department_predicted_grades(department, year)
             
             # 使用pandas导出到Excel
             import pandas as pd
@@ -290,9 +351,11 @@ class GradeAnalysisView(QWidget):
                 })
             
             # 创建DataFrame并导出
+            task.progress(0, 0, "正在写入Excel文件...")
             df = pd.DataFrame(predicted_data)
             df.to_excel(file_path, index=False)
-            
+
+        def on_success(_):
             InfoBar.success(
                 title='导出成功',
                 content=f"已成功导出分析报告到 {file_path}",
@@ -302,31 +365,24 @@ class GradeAnalysisView(QWidget):
                 duration=3000,
                 parent=self
             )
-            
-        except Exception as e:
+
+        def on_error(message):
             InfoBar.error(
                 title='导出失败',
-                content=f"导出分析报告时出现错误: {str(e)}",
+                content=f"导出分析报告时出现错误: {message}",
                 orient=Qt.Horizontal,
                 isClosable=True,
                 position=InfoBarPosition.TOP,
                 duration=3000,
                 parent=self
             )
+
+        # 查询和写入Excel在后台线程中执行
+        start_task(self, "正在导出分析报告", work, on_success, on_error)
     
     def _is_promotion(self, current_grade, predicted_grade):
         """判断是否为晋升"""
-        # 简单判断常见职级格式
-        # G1 < G2 < G3 < G4A < G4B < G5
-        grades = {
-            'G1': 1, 'G2': 2, 'G3': 3, 'G4A': 4, 'G4B': 5, 'G5': 6,
-            'g1': 1, 'g2': 2, 'g3': 3, 'g4a': 4, 'g4b': 5, 'g5': 6
-        }
-        
-        current_value = grades.get(current_grade, 0)
-        predicted_value = grades.get(predicted_grade, 0)
-        
-        return predicted_value > current_value
+        return is_promotion(current_grade, predicted_grade)
 
 
 class GradeDetailsDialog(QDialog):
@@ -443,14 +499,4 @@ class GradeDetailsDialog(QDialog):
     
     def _is_promotion(self, current_grade, predicted_grade):
         """判断是否为晋升"""
-        # 简单判断常见职级格式
-        # G1 < G2 < G3 < G4A < G4B < G5
-        grades = {
-            'G1': 1, 'G2': 2, 'G3': 3, 'G4A': 4, 'G4B': 5, 'G5': 6,
-            'g1': 1, 'g2': 2, 'g3': 3, 'g4a': 4, 'g4b': 5, 'g5': 6
-        }
-        
-        current_value = grades.get(current_grade, 0)
-        predicted_value = grades.get(predicted_grade, 0)
-        
-        return predicted_value > current_value 
\ No newline at end of file
+        return is_promotion(current_grade, predicted_grade) 
\ No newline at end of file
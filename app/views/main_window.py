@@ -1,3 +1,4 @@
+import importlib
 import os
 
 from PyQt5.QtCore import Qt
@@ -10,21 +11,46 @@ from qfluentwidgets import (
     MSFluentWindow, FluentIcon as FIF, InfoBar, InfoBarPosition, MessageBox, isDarkTheme, NavigationAvatarWidget
 )
 
-from .assessment_items_view import AssessmentItemsView
-from .aut_score_view import AUTScoreView
-from .employee_detail_view import EmployeeDetailView
-from .employee_list_view import EmployeeListView
-from .employee_score_view import EmployeeScoreView
-from .formula_management_view import FormulaManagementView
-from .grade_analysis_view import GradeAnalysisView
-from .operation_logs_view import OperationLogsView
-from .statistics_view import StatisticsView
+from ..models import backup
+from ..models.data_events import ALL_TABLES, RESET
+
+from ..utils import profiler
 from ..utils.resource_loader import get_resource_path
+from ..utils.tasks import start_task, wait_for_tasks
+
+# 子视图注册表：路由键 -> (模块, 类名, 使用的数据库属性, 堆叠窗口中的标题)
+# 视图在第一次使用时才导入模块并创建，标题为None的视图（对话框）不加入堆叠窗口
+VIEW_FACTORIES = {
+    'employees': ('employee_list_view', 'EmployeeListView', 'db', '员工管理'),
+    'employee_detail': ('employee_detail_view', 'EmployeeDetailView', 'db', None),
+    'statistics': ('statistics_view', 'StatisticsView', 'db', '统计分析'),
+    'logs': ('operation_logs_view', 'OperationLogsView', 'db', '操作日志'),
+    'assessment_items': ('assessment_items_view', 'AssessmentItemsView', 'score_db', '考核项目管理'),
+    'formula_management': ('formula_management_view', 'FormulaManagementView', 'score_db', '职级计算公式'),
+    'employee_score': ('employee_score_view', 'EmployeeScoreView', 'score_db', '员工成绩录入'),
+    'aut_score': ('aut_score_view', 'AUTScoreView', 'score_db', 'AUT部门成绩录入'),
+    'grade_analysis': ('grade_analysis_view', 'GradeAnalysisView', 'score_db', '职级预测分析'),
+}
+
+
+def _lazy_view(route_key):
+    """按路由键延迟创建的子视图属性"""
+    return property(lambda self: self.getView(route_key))
 
 
 class MainWindow(MSFluentWindow):
     """主窗口类 - 使用Fluent Design风格"""
 
+    employee_list_view = _lazy_view('employees')
+    employee_detail_view = _lazy_view('employee_detail')
+    statistics_view = _lazy_view('statistics')
+    operation_logs_view = _lazy_view('logs')
+    assessment_items_view = _lazy_view('assessment_items')
+    formula_management_view = _lazy_view('formula_management')
+    employee_score_view = _lazy_view('employee_score')
+    aut_score_view = _lazy_view('aut_score')
+    grade_analysis_view = _lazy_view('grade_analysis')
+
     def __init__(self, db, score_db):
         super().__init__()
 
@@ -37,20 +63,8 @@ class MainWindow(MSFluentWindow):
         self.resize(1200, 800)
         self.setWindowIcon(QIcon(get_resource_path('app/resources/images/logo.png')))
 
-        # 创建子视图
-        self.employee_list_view = EmployeeListView(self.db, self)
-        self.employee_detail_view = EmployeeDetailView(self.db, self)
-        self.statistics_view = StatisticsView(self.db, self)
-        self.operation_logs_view = OperationLogsView(self.db, self)
-
-        # 创建成绩管理系统视图
-        self.assessment_items_view = AssessmentItemsView(self.score_db, self)
-        self.formula_management_view = FormulaManagementView(self.score_db, self)
-        self.employee_score_view = EmployeeScoreView(self.score_db, self)
-        self.grade_analysis_view = GradeAnalysisView(self.score_db, self)
-
-        # 创建AUT部门专用成绩录入视图
-        self.aut_score_view = AUTScoreView(self.score_db, self)
+        # 已创建的子视图，其余视图在第一次切换到时创建
+        self._views = {}
 
         # 初始化窗口 - 顺序很重要，先添加子视图，再设置导航
         self.initWindow()
@@ -198,17 +212,8 @@ class MainWindow(MSFluentWindow):
 
     def initWindow(self):
         """初始化窗口布局"""
-        # 添加视图到堆叠部件
-        self.addSubInterface(self.employee_list_view, 'employees', '员工管理')
-        self.addSubInterface(self.statistics_view, 'statistics', '统计分析')
-        self.addSubInterface(self.operation_logs_view, 'logs', '操作日志')
-
-        # 添加成绩管理系统视图
-        self.addSubInterface(self.assessment_items_view, 'assessment_items', '考核项目管理')
-        self.addSubInterface(self.formula_management_view, 'formula_management', '职级计算公式')
-        self.addSubInterface(self.employee_score_view, 'employee_score', '员工成绩录入')
-        self.addSubInterface(self.aut_score_view, 'aut_score', 'AUT部门成绩录入')
-        self.addSubInterface(self.grade_analysis_view, 'grade_analysis', '职级预测分析')
+        # 启动时只创建默认显示的员工管理视图
+        self.getView('employees')
 
         # 设置样式
         self.setStyleSheet("""
@@ -217,6 +222,20 @@ class MainWindow(MSFluentWindow):
             }
         """)
 
+    def getView(self, route_key):
+        """获取子视图，第一次获取时导入模块并创建视图"""
+        view = self._views.get(route_key)
+        if view is None:
+            module_name, class_name, db_attr, title = VIEW_FACTORIES[route_key]
+            with profiler.span(f"创建视图 {class_name}"):
+                module = importlib.import_module(f'.{module_name}', __package__)
+                view_class = profiler.instrument_class(getattr(module, class_name))
+                view = view_class(getattr(self, db_attr), self)
+            self._views[route_key] = view
+            if title is not None:
+                self.addSubInterface(view, route_key, title)
+        return view
+
     def addSubInterface(self, widget, name, title):
         """添加子界面到主窗口"""
         self.stackedWidget.addWidget(widget)
@@ -246,35 +265,28 @@ class MainWindow(MSFluentWindow):
             self, "选择导入文件", "", "Excel Files (*.xlsx *.xls);;CSV Files (*.csv)"
         )
 
-        if file_path:
-            try:
-                result = self.db.import_from_excel(file_path, "管理员")
-                if result and result.get('success'):
-                    InfoBar.success(
-                        title='导入成功',
-                        content=f"成功导入 {result.get('added')} 条记录，跳过 {result.get('skipped')} 条记录",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=5000,
-                        parent=self
-                    )
-                    # 刷新员工列表
-                    self.employee_list_view.refreshEmployeeList()
-                else:
-                    InfoBar.error(
-                        title='导入失败',
-                        content="导入过程中发生错误",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=5000,
-                        parent=self
-                    )
-            except Exception as e:
+        if not file_path:
+            return
+
+        def work(task):
+            task.progress(0, 0, "正在读取并导入数据...")
+            return task.database(self.db).import_from_excel(file_path, "管理员")
+
+        def on_success(result):
+            if result and result.get('success'):
+                InfoBar.success(
+                    title='导入成功',
+                    content=f"成功导入 {result.get('added')} 条记录，跳过 {result.get('skipped')} 条记录",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=5000,
+                    parent=self
+                )
+            else:
                 InfoBar.error(
                     title='导入失败',
-                    content=f"错误：{str(e)}",
+                    content="导入过程中发生错误",
                     orient=Qt.Horizontal,
                     isClosable=True,
                     position=InfoBarPosition.TOP,
@@ -282,39 +294,37 @@ class MainWindow(MSFluentWindow):
                     parent=self
                 )
 
+        # 读取文件和写入数据库在后台线程中执行
+        start_task(self, "正在导入", work, on_success)
+
     def exportData(self):
         """导出数据功能"""
         file_path, _ = QFileDialog.getSaveFileName(
             self, "导出文件", "", "Excel Files (*.xlsx);;CSV Files (*.csv)"
         )
 
-        if file_path:
-            try:
-                success = self.db.export_to_excel(file_path)
-                if success:
-                    InfoBar.success(
-                        title='导出成功',
-                        content=f"数据已成功导出到 {file_path}",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=5000,
-                        parent=self
-                    )
-                else:
-                    InfoBar.error(
-                        title='导出失败',
-                        content="导出过程中发生错误",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=5000,
-                        parent=self
-                    )
-            except Exception as e:
+        if not file_path:
+            return
+
+        def work(task):
+            task.progress(0, 0, "正在导出数据...")
+            return task.database(self.db).export_to_excel(file_path)
+
+        def on_success(success):
+            if success:
+                InfoBar.success(
+                    title='导出成功',
+                    content=f"数据已成功导出到 {file_path}",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=5000,
+                    parent=self
+                )
+            else:
                 InfoBar.error(
                     title='导出失败',
-                    content=f"错误：{str(e)}",
+                    content="导出过程中发生错误",
                     orient=Qt.Horizontal,
                     isClosable=True,
                     position=InfoBarPosition.TOP,
@@ -322,6 +332,8 @@ class MainWindow(MSFluentWindow):
                     parent=self
                 )
 
+        start_task(self, "正在导出", work, on_success)
+
     def showBackupOptions(self):
         """显示备份选项"""
         # 创建对话框窗口
@@ -357,35 +369,67 @@ class MainWindow(MSFluentWindow):
             parent=self
         )
 
+    def _startBackupTask(self, title, work, on_success, on_error, cancellable=True):
+        """在后台执行备份/恢复，同一时间只允许一个"""
+        if getattr(self, '_backup_task', None) and self._backup_task.running:
+            InfoBar.warning(
+                title='请稍候',
+                content="正在进行备份或恢复，请等待完成",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            return
+
+        # 提交缓存的日志和未完成的修改，使其包含在备份中，也避免恢复时等待锁
+        self.db.manager.commit()
+        self.db.manager.audit_log.flush()
+
+        self._backup_task = start_task(self, title, work, on_success, on_error, cancellable)
+
     def backupDatabase(self):
-        """备份数据库"""
+        """备份数据库（在线备份，不影响正在进行的操作）"""
         # 获取备份文件路径
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "选择备份保存位置", "", "SQLite Database (*.sqlite);;All Files (*)"
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "选择备份保存位置", "",
+            "SQLite Database (*.sqlite);;Compressed Backup (*.sqlite.gz);;All Files (*)"
         )
 
         if not file_path:
             return
 
-        try:
-            # 执行备份
-            import shutil
-            db_path = self.db.get_db_path()
-            shutil.copy2(db_path, file_path)
+        compress = file_path.endswith(backup.COMPRESSED_SUFFIX) or selected_filter.startswith('Compressed')
+        db_path = self.db.get_db_path()
 
-            InfoBar.success(
-                title='备份成功',
-                content=f"数据库已成功备份到 {file_path}",
+        def work(task):
+            # 取消时进度回调抛出异常，备份随之中止
+            return backup.backup_database(db_path, file_path, compress=compress, dedupe=True, progress=task.progress)
+
+        def on_error(message):
+            InfoBar.error(
+                title='备份失败',
+                content=f"备份数据库时发生错误: {message}",
                 orient=Qt.Horizontal,
                 isClosable=True,
                 position=InfoBarPosition.TOP,
                 duration=5000,
                 parent=self
             )
-        except Exception as e:
-            InfoBar.error(
-                title='备份失败',
-                content=f"备份数据库时发生错误: {str(e)}",
+
+        def on_success(outcome):
+            result, skipped = outcome
+            if skipped:
+                self.db.log_operation("管理员", "数据库备份", f"数据库内容未变化，沿用已有备份 {result}")
+                content = f"数据库内容与已有备份相同，无需重复备份: {result}"
+            else:
+                self.db.log_operation("管理员", "数据库备份", f"数据库已备份到 {result}")
+                content = f"数据库已成功备份到 {result}"
+
+            InfoBar.success(
+                title='备份成功',
+                content=content,
                 orient=Qt.Horizontal,
                 isClosable=True,
                 position=InfoBarPosition.TOP,
@@ -393,8 +437,10 @@ class MainWindow(MSFluentWindow):
                 parent=self
             )
 
+        self._startBackupTask("正在备份", work, on_success, on_error)
+
     def restoreDatabase(self):
-        """恢复数据库"""
+        """恢复数据库（在线恢复，无需关闭数据库连接）"""
         # 显示警告
         dialog = MessageBox(
             '恢复数据库',
@@ -407,39 +453,45 @@ class MainWindow(MSFluentWindow):
         if dialog.exec() == 0 and dialog.clickedButton() == yes_button:
             # 获取要恢复的数据库文件
             file_path, _ = QFileDialog.getOpenFileName(
-                self, "选择要恢复的数据库文件", "", "SQLite Database (*.sqlite);;All Files (*)"
+                self, "选择要恢复的数据库文件", "",
+                "SQLite Database (*.sqlite *.sqlite.gz);;All Files (*)"
             )
 
             if not file_path:
                 return
 
-            try:
-                # 执行恢复
-                import shutil
-                import os
-
-                # 关闭数据库连接
-                self.db.close_connection()
-                self.score_db.close()
-
-                # 备份当前数据库
-                db_path = self.db.get_db_path()
-                backup_path = db_path + ".bak"
+            db_path = self.db.get_db_path()
 
-                # 如果已有备份则删除
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
+            def work(task):
+                # 先备份当前数据库，再恢复
+                backup.backup_database(db_path, db_path + ".bak")
+                backup.restore_database(file_path, db_path, progress=task.progress)
+                return file_path
 
-                # 创建备份
-                shutil.copy2(db_path, backup_path)
+            def on_error(message):
+                InfoBar.error(
+                    title='恢复失败',
+                    content=f"恢复数据库时发生错误: {message}",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=5000,
+                    parent=self
+                )
 
-                # 替换数据库
-                shutil.copy2(file_path, db_path)
+            def on_success(result):
+                # 恢复的数据库内容不同，丢弃缓存；共用该文件的每个数据库对象重新准备表结构
+                self.db.manager.refresh_after_restore()
+                if self.score_db.manager is not self.db.manager:
+                    self.score_db.manager.refresh_after_restore()
+                self.db.log_operation("管理员", "数据库恢复", f"数据库已从 {result} 恢复")
+                # 通知各页面重新加载数据
+                self.db.manager.record_change(ALL_TABLES, None, RESET)
 
-                # 重新启动应用
+                # 部分页面的数据在重新打开时刷新，也可以重启应用
                 reply = MessageBox(
                     '恢复成功',
-                    '数据库已成功恢复。需要重启应用以应用更改。是否立即重启？',
+                    '数据库已成功恢复。是否重启应用以刷新所有页面？',
                     self
                 )
                 yes_button = reply.addButton('是', MessageBox.ButtonRole.YesRole)
@@ -448,16 +500,8 @@ class MainWindow(MSFluentWindow):
                 if reply.exec() == 0 and reply.clickedButton() == yes_button:
                     self.restartApplication()
 
-            except Exception as e:
-                InfoBar.error(
-                    title='恢复失败',
-                    content=f"恢复数据库时发生错误: {str(e)}",
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=5000,
-                    parent=self
-                )
+            # 恢复开始后不允许中途取消
+            self._startBackupTask("正在恢复", work, on_success, on_error, cancellable=False)
 
     def restartApplication(self):
         """重启应用"""
@@ -482,6 +526,9 @@ class MainWindow(MSFluentWindow):
 
     def closeEvent(self, event):
         """窗口关闭事件"""
+        # 等待正在进行的后台任务（导入、备份等）完成
+        wait_for_tasks()
+
         # 关闭数据库连接
         self.db.close_connection()
         self.score_db.close()
@@ -1,30 +1,40 @@
 from PyQt5.QtCore import Qt, QDateTime
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, 
-    QTableView, QHeaderView, QTableWidgetItem
+    QTableView, QHeaderView, QTableWidgetItem, QDialog
 )
 from PyQt5.QtGui import QFont, QStandardItemModel, QStandardItem
 from qfluentwidgets import (
     LineEdit, PushButton, CardWidget, FluentIcon, 
     InfoBar, InfoBarPosition, SearchLineEdit, ComboBox,
     CalendarPicker, TitleLabel, BodyLabel, TableWidget,
-    Dialog
+    Dialog, SubtitleLabel
 )
+import bisect
 import datetime
 
+from ..models.data_events import ALL_TABLES
+
 class OperationLogsView(QWidget):
     """操作日志视图，用于显示系统操作日志"""
     
+    # 表格中最多显示的日志条数
+    LOG_LIMIT = 1000
+    
     def __init__(self, db, parent=None):
         super().__init__(parent)
         self.db = db
         self.parent = parent
+        # 已显示日志的最大ID，收到新日志通知时只读取比它新的日志
+        self.last_log_id = 0
         
         # 初始化UI
         self.initUI()
         
         # 加载日志数据
         self.loadLogs()
+        
+        self.db.manager.events.dataChanged.connect(self.onDataChanged)
     
     def initUI(self):
         """初始化UI"""
@@ -129,6 +139,12 @@ class OperationLogsView(QWidget):
         self.clear_btn.clicked.connect(self.clearFilters)
         bottom_bar.addWidget(self.clear_btn)
         
+        # SQL语句统计和慢查询日志
+        self.query_stats_btn = PushButton('SQL性能', self)
+        self.query_stats_btn.setIcon(FluentIcon.SPEED_HIGH)
+        self.query_stats_btn.clicked.connect(self.showQueryStats)
+        bottom_bar.addWidget(self.query_stats_btn)
+        
         main_layout.addLayout(bottom_bar)
         
         self.setLayout(main_layout)
@@ -142,7 +158,8 @@ class OperationLogsView(QWidget):
                 column_widths.append(self.logs_table.columnWidth(i))
         
         # 获取操作日志
-        logs = self.db.get_operation_logs(limit=1000)
+        logs = self.db.get_operation_logs(limit=self.LOG_LIMIT)
+        self.last_log_id = max((log['id'] for log in logs), default=0)
         
         # 清空现有数据
         self.logs_table.clearContents()
@@ -151,17 +168,7 @@ class OperationLogsView(QWidget):
         # 添加日志数据到表格
         for row, log in enumerate(logs):
             self.logs_table.insertRow(row)
-            
-            # 设置单元格数据
-            self.logs_table.setItem(row, 0, QTableWidgetItem(str(log.get('id', ''))))
-            self.logs_table.setItem(row, 1, QTableWidgetItem(str(log.get('user', ''))))
-            self.logs_table.setItem(row, 2, QTableWidgetItem(str(log.get('operation', ''))))
-            self.logs_table.setItem(row, 3, QTableWidgetItem(str(log.get('details', ''))))
-            
-            # 格式化时间戳，只显示到秒
-            timestamp = log.get('timestamp', '')
-            formatted_timestamp = self.formatTimestamp(timestamp)
-            self.logs_table.setItem(row, 4, QTableWidgetItem(formatted_timestamp))
+            self._setLogRow(row, log)
         
         # 更新状态栏
         self.status_label.setText(f"总计: {len(logs)} 条日志记录")
@@ -182,6 +189,54 @@ class OperationLogsView(QWidget):
             self.logs_table.setColumnWidth(2, 150)  # 操作类型
             self.logs_table.setColumnWidth(4, 180)  # 时间
     
+    def _setLogRow(self, row, log):
+        """设置一行日志的单元格数据"""
+        self.logs_table.setItem(row, 0, QTableWidgetItem(str(log.get('id', ''))))
+        self.logs_table.setItem(row, 1, QTableWidgetItem(str(log.get('user', ''))))
+        self.logs_table.setItem(row, 2, QTableWidgetItem(str(log.get('operation', ''))))
+        self.logs_table.setItem(row, 3, QTableWidgetItem(str(log.get('details', ''))))
+        
+        # 格式化时间戳，只显示到秒
+        timestamp = log.get('timestamp', '')
+        formatted_timestamp = self.formatTimestamp(timestamp)
+        self.logs_table.setItem(row, 4, QTableWidgetItem(formatted_timestamp))
+    
+    def onDataChanged(self, table, key, operation):
+        """数据修改通知（见 app.models.data_events），有新日志时只插入新的行"""
+        if table == ALL_TABLES:
+            self.loadLogs()
+        elif table == 'operation_logs':
+            self.appendNewLogs()
+    
+    def appendNewLogs(self):
+        """读取比已显示日志更新的日志，插入到表格顶部"""
+        logs = self.db.get_operation_logs(limit=self.LOG_LIMIT, after_id=self.last_log_id)
+        if not logs:
+            return
+        self.last_log_id = max(self.last_log_id, max(log['id'] for log in logs))
+        
+        for row, log in enumerate(logs):
+            self.logs_table.insertRow(row)
+            self._setLogRow(row, log)
+        # 超出显示条数的旧日志从底部移除
+        if self.logs_table.rowCount() > self.LOG_LIMIT:
+            self.logs_table.setRowCount(self.LOG_LIMIT)
+        
+        # 新的操作类型加入筛选下拉框（保持排序）
+        self.operation_filter.blockSignals(True)
+        for operation in {log.get('operation') for log in logs}:
+            if operation and self.operation_filter.findText(operation) < 0:
+                existing = [self.operation_filter.itemText(i) for i in range(1, self.operation_filter.count())]
+                self.operation_filter.insertItem(1 + bisect.bisect(existing, operation), operation)
+        self.operation_filter.blockSignals(False)
+        
+        # 有筛选条件时新插入的行也要筛选
+        operation_type = self.operation_filter.currentText()
+        if self.search_edit.text() or (operation_type and operation_type != "所有操作"):
+            self.filterLogs()
+        else:
+            self.status_label.setText(f"总计: {self.logs_table.rowCount()} 条日志记录")
+    
     def formatTimestamp(self, timestamp):
         """格式化时间戳，只显示到秒"""
         try:
@@ -357,4 +412,128 @@ class OperationLogsView(QWidget):
         # 创建并显示对话框
         dialog = Dialog(title, content, self)
         dialog.setContentCopyable(True)  # 允许复制内容
-        dialog.exec() 
\ No newline at end of file
+        dialog.exec() 
+    
+    def showQueryStats(self):
+        """显示SQL语句统计和慢查询日志"""
+        dialog = QueryStatsDialog(self.db, self)
+        dialog.exec_()
+
+
+class QueryStatsDialog(QDialog):
+    """SQL语句统计和慢查询日志对话框"""
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        
+        self.initUI()
+        self.loadData()
+    
+    def initUI(self):
+        """初始化界面"""
+        self.setWindowTitle("SQL性能")
+        self.resize(1000, 650)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+        
+        # 慢查询日志
+        layout.addWidget(SubtitleLabel("慢查询日志", self))
+        self.slow_table = self._createTable(['时间', '耗时(毫秒)', '行数', '参数哈希', '线程', 'SQL'])
+        layout.addWidget(self.slow_table, 1)
+        
+        # 语句统计
+        layout.addWidget(SubtitleLabel("语句统计（按总耗时排列）", self))
+        self.stats_table = self._createTable(['次数', '总耗时(毫秒)', 'P50', 'P95', '最长', '行数', 'SQL'])
+        layout.addWidget(self.stats_table, 2)
+        
+        # 底部按钮
+        button_layout = QHBoxLayout()
+        self.summary_label = BodyLabel("", self)
+        button_layout.addWidget(self.summary_label)
+        button_layout.addStretch()
+        
+        refresh_btn = PushButton('刷新', self)
+        refresh_btn.setIcon(FluentIcon.SYNC)
+        refresh_btn.clicked.connect(self.loadData)
+        button_layout.addWidget(refresh_btn)
+        
+        reset_btn = PushButton('清空统计', self)
+        reset_btn.setIcon(FluentIcon.DELETE)
+        reset_btn.clicked.connect(self.resetStats)
+        button_layout.addWidget(reset_btn)
+        
+        close_btn = PushButton('关闭', self)
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        
+        layout.addLayout(button_layout)
+    
+    def _createTable(self, headers):
+        """创建只读表格，最后一列（SQL）占据剩余宽度"""
+        table = TableWidget(self)
+        table.setEditTriggers(TableWidget.NoEditTriggers)
+        table.setSelectionBehavior(TableWidget.SelectRows)
+        table.verticalHeader().setVisible(False)
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        header = table.horizontalHeader()
+        for column in range(len(headers) - 1):
+            header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(len(headers) - 1, QHeaderView.Stretch)
+        return table
+    
+    def _fillTable(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column == len(values) - 1:
+                    # 完整SQL显示在提示中
+                    item.setToolTip(value)
+                table.setItem(row, column, item)
+    
+    def loadData(self):
+        """加载统计数据"""
+        slow_queries = self.db.get_slow_queries()
+        self._fillTable(self.slow_table, [
+            (
+                entry['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+                f"{entry['duration_ms']:.1f}",
+                str(entry['rows']),
+                entry['parameters_hash'],
+                entry['thread'],
+                entry['sql'],
+            )
+            for entry in slow_queries
+        ])
+        
+        statistics = self.db.get_query_statistics()
+        self._fillTable(self.stats_table, [
+            (
+                str(item['count']),
+                f"{item['total_ms']:.1f}",
+                f"{item['p50_ms']:.2f}",
+                f"{item['p95_ms']:.2f}",
+                f"{item['max_ms']:.2f}",
+                str(item['rows']),
+                item['sql'],
+            )
+            for item in statistics
+        ])
+        
+        total_count = sum(item['count'] for item in statistics)
+        cache_stats = self.db.get_lookup_cache_stats()
+        hits = sum(item['hits'] for item in cache_stats['lookups'].values())
+        lookups = hits + sum(item['misses'] for item in cache_stats['lookups'].values())
+        cache_text = f"，查找缓存命中 {hits}/{lookups}（{cache_stats['entries']} 条）" if lookups else ""
+        self.summary_label.setText(
+            f"共 {len(statistics)} 种语句，执行 {total_count} 次，慢查询 {len(slow_queries)} 条{cache_text}"
+        )
+    
+    def resetStats(self):
+        """清空统计后重新加载"""
+        self.db.reset_query_statistics()
+        self.loadData()
@@ -0,0 +1,102 @@
+import math
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+
+class ScoreMatrixModel(QAbstractTableModel):
+    """批量成绩录入数据模型 - 成绩保存在 员工 × 考核项目 的NumPy矩阵中，没有成绩为NaN"""
+
+    FIXED_HEADERS = ['工号', '姓名', '职级']
+
+    # 输入的分数不是数字时发出，参数为行号
+    invalidScore = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.employees = []
+        self.items = []
+        self.scores = None
+
+    def set_matrix(self, matrix):
+        """使用 ScoreDatabase.get_department_score_matrix 的结果重新填充"""
+        self.beginResetModel()
+        self.employees = matrix['employees']
+        self.items = matrix['items']
+        self.scores = matrix['scores'].copy()
+        self.endResetModel()
+
+    @property
+    def item_ids(self):
+        return [item['id'] for item in self.items]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.employees)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or not self.items:
+            return 0
+        return len(self.FIXED_HEADERS) + len(self.items)
+
+    def text(self, row, column):
+        """单元格显示的文本"""
+        fixed = len(self.FIXED_HEADERS)
+        if column < fixed:
+            value = self.employees[row][column]
+            if column == 2:
+                return value or "未设置"
+            return '' if value is None else str(value)
+        score = self.scores[row, column - fixed]
+        return '' if math.isnan(score) else str(float(score))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.text(index.row(), index.column())
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() >= len(self.FIXED_HEADERS):
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid() or index.column() < len(self.FIXED_HEADERS):
+            return False
+        text = str(value).strip()
+        try:
+            score = float(text) if text else math.nan
+        except ValueError:
+            self.invalidScore.emit(index.row())
+            return False
+        self.scores[index.row(), index.column() - len(self.FIXED_HEADERS)] = score
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        if section < len(self.FIXED_HEADERS):
+            return self.FIXED_HEADERS[section]
+        item = self.items[section - len(self.FIXED_HEADERS)]
+        return f"{item['assessment_name']} ({item['weight']})"
+
+    def score_rows(self, rows, assessment_year):
+        """指定行中已填写的成绩，返回成绩数据字典列表（用于 save_employee_scores_bulk）"""
+        import numpy as np
+        rows = np.asarray(rows, dtype=int)
+        item_ids = self.item_ids
+        filled_rows, filled_columns = np.nonzero(~np.isnan(self.scores[rows]))
+        return [
+            {
+                'employee_no': self.employees[row][0],
+                'assessment_year': assessment_year,
+                'assessment_item_id': item_ids[column],
+                'score': float(self.scores[row, column]),
+                'comment': ''  # 批量录入时不设置备注
+            }
+            for row, column in zip(rows[filled_rows].tolist(), filled_columns.tolist())
+        ]
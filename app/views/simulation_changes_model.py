@@ -0,0 +1,51 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class SimulationChangesModel(QAbstractTableModel):
+    """公式模拟结果数据模型 - 职级发生变化的员工"""
+
+    HEADERS = ['工号', '姓名', '总分', '当前职级', '预测职级', '变化']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.changes = []
+
+    def set_changes(self, changes):
+        """使用 FormulaSimulator.run 结果中的 changes 重新填充"""
+        self.beginResetModel()
+        self.changes = changes
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.changes)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        change = self.changes[index.row()]
+        column = index.column()
+        if column == 0:
+            return change['employee_no']
+        if column == 1:
+            return change['employee_name']
+        if column == 2:
+            return f"{change['total_score']:.2f}"
+        if column == 3:
+            return change['current_grade']
+        if column == 4:
+            return change['predicted_grade']
+        if change['promotion']:
+            return "晋升"
+        return "降级" if change['demotion'] else "平级变动"
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
@@ -14,6 +14,8 @@ import os
 import datetime
 import pandas as pd
 
+from ..utils.tasks import start_task
+
 class SkillScoringView(QWidget):
     """技能评分视图，用于导入和管理员工技能评分"""
     
@@ -266,38 +268,56 @@ class SkillScoringView(QWidget):
             else:
                 return
                 
-            # 执行导入
-            result = self.db.import_skill_scores(file_path, import_year, "管理员")
-            
-            if result and result.get('success', False):
-                # 更新当前年份并重新加载数据
-                self.current_year = import_year
-                self.year_combo.setCurrentText(str(import_year))
-                self.loadData()
-                
-                # 显示成功消息
-                added = result.get('added', 0)
-                updated = result.get('updated', 0)
-                InfoBar.success(
-                    title='导入成功',
-                    content=f"成功导入{added}条技能评分数据，更新{updated}条记录",
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=3000,
-                    parent=self
+            def work(task):
+                task.progress(0, 0, "正在导入技能评分...")
+                # 按读取的行数更新进度条，取消时 task.progress 抛出异常并回滚导入
+                return task.database(self.db).import_skill_scores(
+                    file_path, import_year, "管理员", progress=task.progress
                 )
-            else:
-                # 显示错误消息
+
+            def on_success(result):
+                if result and result.get('success', False):
+                    # 更新当前年份并重新加载数据
+                    self.current_year = import_year
+                    self.year_combo.setCurrentText(str(import_year))
+                    self.loadData()
+                    
+                    # 显示成功消息
+                    added = result.get('added', 0)
+                    InfoBar.success(
+                        title='导入成功',
+                        content=f"成功添加/更新{added}名员工的技能评分数据",
+                        orient=Qt.Horizontal,
+                        isClosable=True,
+                        position=InfoBarPosition.TOP,
+                        duration=3000,
+                        parent=self
+                    )
+                else:
+                    # 显示错误消息
+                    InfoBar.error(
+                        title='导入失败',
+                        content="导入技能评分数据失败，请检查文件格式",
+                        orient=Qt.Horizontal,
+                        isClosable=True,
+                        position=InfoBarPosition.TOP,
+                        duration=3000,
+                        parent=self
+                    )
+
+            def on_error(message):
                 InfoBar.error(
-                    title='导入失败',
-                    content="导入技能评分数据失败，请检查文件格式",
+                    title='导入异常',
+                    content=f"导入过程中发生异常: {message}",
                     orient=Qt.Horizontal,
                     isClosable=True,
                     position=InfoBarPosition.TOP,
-                    duration=3000,
+                    duration=5000,
                     parent=self
                 )
+
+            # 读取文件和写入数据库在后台线程中执行
+            start_task(self, "正在导入技能评分", work, on_success, on_error)
         except Exception as e:
             print(f"导入技能评分异常: {e}")
             InfoBar.error(
@@ -1,3 +1,5 @@
+import datetime
+
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QComboBox, 
@@ -9,6 +11,7 @@ from qfluentwidgets import (
     InfoBar, InfoBarPosition, ToolButton, ScrollArea,
     TitleLabel, BodyLabel, SubtitleLabel
 )
+from app.models.statistics import EmployeeStatistics
 from app.utils.chart_generator import ChartGenerator, MatplotlibCanvas
 import matplotlib.pyplot as plt
 
@@ -19,6 +22,9 @@ class StatisticsView(QWidget):
         super().__init__(parent)
         self.db = db
         self.parent = parent
+
+        # 统计数据（按数据版本缓存）
+        self.statistics = EmployeeStatistics(db)
         
         # 图表相关
         self.chart_generator = ChartGenerator()
@@ -58,8 +64,7 @@ class StatisticsView(QWidget):
         
         # 年份选择（针对职级分布和晋升分析）
         self.year_combo = ComboBox(self)
-        self.year_combo.addItems(["2020", "2021", "2022", "2023", "2024", "2025"])
-        self.year_combo.setCurrentText("2024")  # 默认选择当前年份
+        self.updateYearOptions()
         self.year_combo.currentTextChanged.connect(self.updateChart)
         top_bar.addWidget(BodyLabel("年份:"))
         top_bar.addWidget(self.year_combo)
@@ -136,9 +141,22 @@ class StatisticsView(QWidget):
         # 设置布局
         self.setLayout(main_layout)
     
+    def updateYearOptions(self):
+        """年份选项为职级历史中有记录的年份，默认选择最近一年"""
+        years = [str(year) for year in self.statistics.years()] or [str(datetime.date.today().year)]
+        current = self.year_combo.currentText()
+        self.year_combo.blockSignals(True)
+        self.year_combo.clear()
+        self.year_combo.addItems(years)
+        self.year_combo.setCurrentText(current if current in years else years[-1])
+        self.year_combo.blockSignals(False)
+    
     def loadStatistics(self):
         """加载统计数据"""
         try:
+            # 数据变化后可能有新的年份
+            self.updateYearOptions()
+            
             # 获取当前选中的图表类型
             chart_type = self.chart_type_combo.currentText()
             
@@ -251,27 +269,10 @@ class StatisticsView(QWidget):
     
     def generateGradeDistribution(self, ax, year):
         """生成职级分布图表"""
-        # 获取数据
-        employees = self.db.get_all_employees()
-        
-        # 按职级统计人数
-        grade_counts = {}
-        for emp in employees:
-            grade = emp.get(f'grade_{year}', '')
-            if grade:
-                grade_counts[grade] = grade_counts.get(grade, 0) + 1
-        
-        # 定义职级顺序
-        grade_order = {'G1': 1, 'G2': 2, 'G3': 3, 'G4B': 4, 'G4A': 5, 'Technian': 6}
-        
-        # 准备绘图数据，按照职级顺序排序
-        ordered_grades = []
-        ordered_counts = []
-        
-        # 按顺序添加数据
-        for grade in sorted(grade_counts.keys(), key=lambda g: grade_order.get(g, 0)):
-            ordered_grades.append(grade)
-            ordered_counts.append(grade_counts[grade])
+        # 获取按职级顺序排列的统计数据
+        distribution = self.statistics.grade_distribution(year)
+        ordered_grades = [grade for grade, _ in distribution]
+        ordered_counts = [count for _, count in distribution]
         
         # 绘制条形图
         bars = ax.bar(ordered_grades, ordered_counts)
@@ -298,19 +299,10 @@ class StatisticsView(QWidget):
     
     def generateDepartmentDistribution(self, ax):
         """生成部门分布图表"""
-        # 获取数据
-        employees = self.db.get_all_employees()
-        
-        # 按部门统计人数
-        dept_counts = {}
-        for emp in employees:
-            dept = emp.get('department', '')
-            if dept:
-                dept_counts[dept] = dept_counts.get(dept, 0) + 1
-        
-        # 准备绘图数据
-        departments = list(dept_counts.keys())
-        counts = list(dept_counts.values())
+        # 获取统计数据
+        distribution = self.statistics.department_distribution()
+        departments = [dept for dept, _ in distribution]
+        counts = [count for _, count in distribution]
         
         # 绘制饼图
         wedges, texts, autotexts = ax.pie(counts, autopct='%1.1f%%', startangle=90)
@@ -331,39 +323,11 @@ class StatisticsView(QWidget):
     
     def generateGradeTrend(self, ax):
         """生成职级趋势图表"""
-        # 获取数据
-        employees = self.db.get_all_employees()
-        
         # 年份列表
-        years = ["2020", "2021", "2022", "2023", "2024"]
+        years = [str(year) for year in self.statistics.years()]
         
-        # 获取所有职级
-        all_grades = set()
-        for emp in employees:
-            for year in years:
-                grade = emp.get(f'grade_{year}', '')
-                if grade:
-                    all_grades.add(grade)
-        
-        # 定义职级顺序
-        grade_order = {'G1': 1, 'G2': 2, 'G3': 3, 'G4B': 4, 'G4A': 5, 'Technian': 6}
-        
-        # 按顺序排列职级
-        all_grades = sorted(list(all_grades), key=lambda g: grade_order.get(g, 0))
-        
-        # 统计每年每个职级的人数
-        grade_counts = {grade: [] for grade in all_grades}
-        
-        for year in years:
-            year_counts = {grade: 0 for grade in all_grades}
-            
-            for emp in employees:
-                grade = emp.get(f'grade_{year}', '')
-                if grade in all_grades:
-                    year_counts[grade] += 1
-            
-            for grade in all_grades:
-                grade_counts[grade].append(year_counts[grade])
+        # 统计每年每个职级的人数（职级已按顺序排列）
+        grade_counts = self.statistics.grade_trend(years)
         
         # 绘制线图
         for grade, counts in grade_counts.items():
@@ -390,38 +354,11 @@ class StatisticsView(QWidget):
     
     def generatePromotionAnalysis(self, ax, year):
         """生成晋升分析图表"""
-        # 获取数据
-        employees = self.db.get_all_employees()
-        
         # 查找前一年
         prev_year = str(int(year) - 1)
         
-        # 定义职级顺序
-        grade_order = {'G1': 1, 'G2': 2, 'G3': 3, 'G4B': 4, 'G4A': 5, 'Technian': 6}
-        
         # 统计晋升情况
-        promotion_data = {'晋升': 0, '平级': 0, '降级': 0, '新入职': 0}
-        
-        for emp in employees:
-            curr_grade = emp.get(f'grade_{year}', '')
-            prev_grade = emp.get(f'grade_{prev_year}', '')
-            
-            if not curr_grade:
-                continue
-            
-            if not prev_grade:
-                promotion_data['新入职'] += 1
-            else:
-                # 根据职级顺序判断晋升情况
-                curr_level = grade_order.get(curr_grade, 0)
-                prev_level = grade_order.get(prev_grade, 0)
-                
-                if curr_level > prev_level:
-                    promotion_data['晋升'] += 1
-                elif curr_level < prev_level:
-                    promotion_data['降级'] += 1
-                else:
-                    promotion_data['平级'] += 1
+        promotion_data = self.statistics.promotion_analysis(year)
         
         # 准备绘图数据
         categories = list(promotion_data.keys())
@@ -0,0 +1,502 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库性能基准测试
+
+在临时目录中创建测试数据库并生成模拟数据，对比优化前后的耗时。
+用法:
+    python benchmark.py import --rows 20000
+    python benchmark.py predict --employees 5000
+    python benchmark.py search --rows 10000 100000 1000000
+    python benchmark.py audit --edits 2000
+    python benchmark.py grading --employees 100000
+    python benchmark.py startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from app.models import aut_grading
+from app.models.audit_log import DURABILITY_BATCH, DURABILITY_TRANSACTION
+from app.models.database import EmployeeDatabase
+from app.models.min_database import EmployeeDatabase as SkillDatabase
+from app.models.score_database import ScoreDatabase
+
+DEPARTMENTS = ['AUT', 'ASM', 'QA', 'ME', 'HR']
+GRADES = ['G1', 'G2', 'G3', 'G4A', 'G4B']
+
+
+def create_test_database(db_path):
+    """创建基准测试用的员工表和日志表（与正式数据库结构一致）"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+    CREATE TABLE IF NOT EXISTS employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_no TEXT NOT NULL,
+        gid TEXT,
+        name TEXT,
+        status TEXT,
+        department TEXT,
+        grade_2020 TEXT,
+        grade_2021 TEXT,
+        grade_2022 TEXT,
+        grade_2023 TEXT,
+        grade_2024 TEXT,
+        grade_2025 TEXT,
+        notes TEXT
+    );
+    CREATE TABLE IF NOT EXISTS operation_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user TEXT,
+        operation TEXT,
+        details TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def generate_employee_frame(rows, start=100000):
+    """生成模拟员工数据"""
+    rng = random.Random(rows)
+    return pd.DataFrame({
+        'employee_no': [str(start + i) for i in range(rows)],
+        'gid': [f"Z{start + i:07d}" for i in range(rows)],
+        'name': [f"员工{i}" for i in range(rows)],
+        'status': ['在职'] * rows,
+        'department': [rng.choice(DEPARTMENTS) for _ in range(rows)],
+        'grade_2024': [rng.choice(GRADES) for _ in range(rows)],
+        'grade_2025': [rng.choice(GRADES) for _ in range(rows)],
+        'notes': [''] * rows
+    })
+
+
+def _timed(func, *args, **kwargs):
+    """执行函数并返回(结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_import(rows, legacy_rows):
+    """对比逐行导入与批量导入员工数据的速度"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, count in (('逐行导入', legacy_rows), ('批量导入', rows)):
+            db_path = os.path.join(tmp_dir, f"{mode}.sqlite")
+            csv_path = os.path.join(tmp_dir, f"{mode}.csv")
+            create_test_database(db_path)
+            generate_employee_frame(count).to_csv(csv_path, index=False, encoding='utf-8')
+
+            db = EmployeeDatabase(db_path)
+            result, elapsed = _timed(db.import_from_excel, csv_path, "基准测试", bulk=(mode == '批量导入'))
+            db.close()
+
+            print(f"{mode}: {result['added']} 条记录, 耗时 {elapsed:.3f} 秒, "
+                  f"{result['added'] / elapsed:,.0f} 行/秒")
+
+
+def seed_department_scores(db_path, department, employees, items, year):
+    """为指定部门写入员工、考核项目、成绩和职级公式"""
+    rng = random.Random(employees)
+    frame = generate_employee_frame(employees)
+    frame['department'] = department
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO employees (employee_no, gid, name, status, department, grade_2024, grade_2025, notes) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        frame.itertuples(index=False, name=None)
+    )
+    conn.executemany(
+        "INSERT INTO department_assessment_items (department, assessment_name, weight, max_score) VALUES (?, ?, ?, ?)",
+        [(department, f"项目{i:02d}", round(1.0 / items, 4), 100.0) for i in range(items)]
+    )
+    item_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM department_assessment_items WHERE department = ?", (department,))]
+    conn.executemany(
+        "INSERT INTO employee_scores (employee_no, assessment_year, assessment_item_id, score, created_by) "
+        "VALUES (?, ?, ?, ?, ?)",
+        ((employee_no, year, item_id, rng.randint(40, 100), "基准测试")
+         for employee_no in frame['employee_no'] for item_id in item_ids)
+    )
+    conn.execute(
+        "INSERT INTO department_grade_formulas (department, formula, description) VALUES (?, ?, ?)",
+        (department, json.dumps({'grade_thresholds': [
+            {'grade': 'G1', 'min_score': 0, 'max_score': 60},
+            {'grade': 'G2', 'min_score': 60, 'max_score': 75},
+            {'grade': 'G3', 'min_score': 75, 'max_score': 90},
+            {'grade': 'G4A', 'min_score': 90, 'max_score': 100}
+        ]}), "基准测试公式")
+    )
+    conn.commit()
+    conn.close()
+    return frame['employee_no'].tolist()
+
+
+def bench_predict(employees, items):
+    """对比逐个员工计算与批量计算预测职级的速度"""
+    year = 2025
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "predict.sqlite")
+        create_test_database(db_path)
+        score_db = ScoreDatabase(db_path)
+        employee_nos = seed_department_scores(db_path, 'AUT', employees, items, year)
+
+        def per_employee():
+            return [score_db.calculate_predicted_grade(employee_no, year) for employee_no in employee_nos]
+
+        legacy_results, legacy_elapsed = _timed(per_employee)
+        bulk_result, bulk_elapsed = _timed(score_db.calculate_predicted_grades_bulk, 'AUT', year)
+
+        legacy_grades = {r['employee_no']: r['predicted_grade'] for r in legacy_results if r}
+        bulk_grades = {r['employee_no']: r['predicted_grade'] for r in bulk_result['results']}
+        score_db.close()
+
+        print(f"逐个计算: {len(legacy_grades)} 人, 耗时 {legacy_elapsed:.3f} 秒")
+        print(f"批量计算: {len(bulk_grades)} 人, 耗时 {bulk_elapsed:.3f} 秒")
+        print(f"结果一致: {legacy_grades == bulk_grades}")
+
+
+def bench_search(row_counts, queries, limit):
+    """对比LIKE全表扫描与FTS5全文索引的搜索延迟"""
+    rng = random.Random(queries)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in row_counts:
+            db_path = os.path.join(tmp_dir, f"search_{rows}.sqlite")
+            create_test_database(db_path)
+            frame = generate_employee_frame(rows)
+            conn = sqlite3.connect(db_path)
+            conn.executemany(
+                "INSERT INTO employees (employee_no, gid, name, status, department, grade_2024, grade_2025, notes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                frame.itertuples(index=False, name=None)
+            )
+            conn.commit()
+            conn.close()
+
+            # 首次连接时建立全文索引
+            db, index_elapsed = _timed(EmployeeDatabase, db_path)
+            terms = [f"员工{rng.randrange(rows)}" for _ in range(queries)]
+
+            # 两种方式都经过 search_employees，匹配相同的列并使用相同的LIMIT
+            def like_search():
+                db.fts_enabled = False
+                try:
+                    for term in terms:
+                        db.search_employees(term, limit)
+                finally:
+                    db.fts_enabled = True
+
+            def fts_search():
+                for term in terms:
+                    db.search_employees(term, limit)
+
+            _, like_elapsed = _timed(like_search)
+            _, fts_elapsed = _timed(fts_search)
+            db.close()
+
+            print(f"{rows:,} 行: 建立索引 {index_elapsed:.2f} 秒, "
+                  f"LIKE {like_elapsed / queries * 1000:.2f} 毫秒/次, "
+                  f"FTS {fts_elapsed / queries * 1000:.2f} 毫秒/次")
+
+
+def bench_audit(edits, synchronous):
+    """对比不同日志写入方式下每秒可完成的员工编辑次数"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "audit.sqlite")
+        create_test_database(db_path)
+        generate_employee_frame(edits).to_csv(os.path.join(tmp_dir, "employees.csv"), index=False)
+        db = EmployeeDatabase(db_path)
+        db.import_from_excel(os.path.join(tmp_dir, "employees.csv"), "基准测试")
+        db.conn.execute(f"PRAGMA synchronous = {synchronous}")
+
+        def separate_commits():
+            # 优化前的写法（与update_employee相同的查询）：数据修改和日志各提交一次
+            for employee_id in range(1, edits + 1):
+                db.cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
+                db.cursor.fetchone()
+                db.cursor.execute("UPDATE employees SET notes = ? WHERE id = ?", ("分开提交", employee_id))
+                db.manager.commit()
+                db.log_operation("基准测试", "更新员工信息", f"更新员工 ID: {employee_id}")
+
+        def unit_of_work(note):
+            def run():
+                for employee_id in range(1, edits + 1):
+                    db.update_employee(employee_id, {'notes': note}, "基准测试")
+                db.manager.audit_log.flush()
+            return run
+
+        for label, mode, func in (
+                ('数据与日志分开提交', DURABILITY_TRANSACTION, separate_commits),
+                ('日志与数据同一事务', DURABILITY_TRANSACTION, unit_of_work("同一事务")),
+                ('日志批量写入', DURABILITY_BATCH, unit_of_work("批量写入"))):
+            db.manager.audit_log.set_mode(mode)
+            _, elapsed = _timed(func)
+            print(f"{label}: {edits} 次编辑, 耗时 {elapsed:.3f} 秒, {edits / elapsed:,.0f} 次/秒")
+
+        db.cursor.execute("SELECT COUNT(*) FROM operation_logs")
+        print(f"日志条数: {db.cursor.fetchone()[0]}")
+        db.close()
+
+
+def seed_skill_scores(conn, employees, year):
+    """写入员工和某年的AUT技能评分"""
+    rng = random.Random(employees)
+    frame = generate_employee_frame(employees)
+    frame['department'] = 'AUT'
+    conn.executemany(
+        "INSERT INTO employees (employee_no, gid, name, status, department, grade_2024, grade_2025, notes) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        frame.itertuples(index=False, name=None)
+    )
+    rows = []
+    for employee_id in range(1, employees + 1):
+        scores = [rng.uniform(80, 100), rng.uniform(0, 200), rng.uniform(0, 50),
+                  rng.choice([0, 100]), rng.choice([0, 100])]
+        rows.append((employee_id, year, *scores, sum(scores) / 5))
+    conn.executemany(
+        "INSERT INTO skill_scores (employee_id, year, basic_knowledge_score, position_skill_score, "
+        "cross_department_score, technician_skill_score, management_skill_score, total_score, evaluated_grade) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'G1')",
+        rows
+    )
+    conn.commit()
+
+
+def _legacy_grade(score, thresholds):
+    """优化前 import_aut.update_employee_grades 的逐个员工判断"""
+    _, _, bk_score, ps_score, cd_score, ts_score, ms_score, total_score = score
+    for grade, bk_min, ps_min, cd_min, ts_min, ms_min, total_min in thresholds:
+        if total_score >= total_min and bk_score >= bk_min and ps_score >= ps_min:
+            if grade == 'G4B' and ms_score >= ms_min:
+                return grade
+            elif grade == 'G4A' and ts_score >= ts_min:
+                return grade
+            elif grade in ['G3', 'G2', 'G1']:
+                return grade
+    return 'G1'
+
+
+def bench_grading(employees, legacy_employees):
+    """对比逐个员工与向量化计算AUT评定职级的速度"""
+    year = 2025
+    thresholds = aut_grading.DEFAULT_THRESHOLDS
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, count in (('逐个计算', legacy_employees), ('向量化计算', employees)):
+            db_path = os.path.join(tmp_dir, f"{mode}.sqlite")
+            create_test_database(db_path)
+            db = SkillDatabase(db_path)
+            seed_skill_scores(db.conn, count, year)
+
+            def per_employee():
+                # 优化前的写法：每名员工两条写入、一次提交和一次姓名查询
+                cursor = db.conn.cursor()
+                scores = cursor.execute(
+                    "SELECT id, employee_id, basic_knowledge_score, position_skill_score, cross_department_score, "
+                    "technician_skill_score, management_skill_score, total_score FROM skill_scores WHERE year = ?",
+                    (year,)
+                ).fetchall()
+                for score in scores:
+                    grade = _legacy_grade(score, thresholds)
+                    cursor.execute("UPDATE skill_scores SET evaluated_grade = ? WHERE id = ?", (grade, score[0]))
+                    cursor.execute("""
+                    INSERT INTO employee_grades (employee_no, year, grade, comment)
+                    SELECT employee_no, ?, ?, 'AUT职级评定' FROM employees WHERE id = ?
+                    ON CONFLICT(employee_no, year) DO UPDATE SET
+                        grade = excluded.grade, comment = excluded.comment, updated_at = CURRENT_TIMESTAMP
+                    """, (year, grade, score[1]))
+                    db.conn.commit()
+                    cursor.execute("SELECT employee_no, name FROM employees WHERE id = ?", (score[1],))
+                    cursor.fetchone()
+
+            def vectorized():
+                counts = aut_grading.evaluate_year(db.conn, year)
+                db.conn.commit()
+                return counts
+
+            _, elapsed = _timed(per_employee if mode == '逐个计算' else vectorized)
+            grades = dict(db.conn.execute(
+                "SELECT e.employee_no, g.grade FROM employee_grades g JOIN employees e ON e.employee_no = g.employee_no "
+                "WHERE g.year = ?", (year,)
+            ).fetchall())
+            expected = {}
+            for score in db.conn.execute(
+                    "SELECT s.id, e.employee_no, basic_knowledge_score, position_skill_score, cross_department_score, "
+                    "technician_skill_score, management_skill_score, total_score "
+                    "FROM skill_scores s JOIN employees e ON e.id = s.employee_id WHERE year = ?", (year,)):
+                expected[score[1]] = _legacy_grade(score, thresholds)
+            db.close()
+
+            print(f"{mode}: {count} 人, 耗时 {elapsed:.3f} 秒, {count / elapsed:,.0f} 人/秒, "
+                  f"结果与逐个判断一致: {grades == expected}")
+
+
+# 在新进程中启动应用直到主窗口第一次绘制，输出各阶段的时间点
+_STARTUP_PROBE = r"""
+import json, sys, time
+started = time.time()
+from PyQt5.QtCore import QEvent, QObject
+from app.main import create_application, create_main_window
+imported = time.time()
+app = create_application(sys.argv[:1])
+window = create_main_window(sys.argv[1])
+constructed = time.time()
+painted = []
+
+class FirstPaintFilter(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and not painted:
+            painted.append(time.time())
+            app.quit()
+        return False
+
+paint_filter = FirstPaintFilter()
+window.installEventFilter(paint_filter)
+window.show()
+app.exec_()
+print("STARTUP " + json.dumps({
+    'started': started, 'imported': imported, 'constructed': constructed, 'painted': painted[0]
+}))
+"""
+
+
+def bench_startup(runs, employees, target, importtime):
+    """测量从启动进程到主窗口第一次绘制的时间
+
+    每次都在新的Python进程中启动，模块均未导入；如需测量磁盘缓存为空时的冷启动，
+    请在运行前清空操作系统的文件缓存。
+    """
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "startup.sqlite")
+        create_test_database(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO employees (employee_no, gid, name, status, department, grade_2024, grade_2025, notes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            generate_employee_frame(employees).itertuples(index=False, name=None)
+        )
+        conn.commit()
+        conn.close()
+        # 先连接一次，完成建表、建索引等一次性工作，使各次启动测量的都是日常启动
+        EmployeeDatabase(db_path).close()
+        ScoreDatabase(db_path).close()
+
+        totals = []
+        for run in range(runs):
+            command = [sys.executable]
+            if importtime and run == 0:
+                command += ['-X', 'importtime']
+            command += ['-c', _STARTUP_PROBE, db_path]
+
+            launched = time.time()
+            result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8',
+                                    errors='replace', env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+            lines = [line for line in result.stdout.splitlines() if line.startswith('STARTUP ')]
+            if result.returncode != 0 or not lines:
+                print(f"第{run + 1}次启动失败:\n{result.stderr[-2000:]}")
+                return
+            times = json.loads(lines[-1][len('STARTUP '):])
+
+            if importtime and run == 0:
+                _print_slowest_imports(result.stderr)
+
+            total = times['painted'] - launched
+            totals.append(total)
+            print(f"第{run + 1}次: 解释器启动 {times['started'] - launched:.3f} 秒, "
+                  f"导入模块 {times['imported'] - times['started']:.3f} 秒, "
+                  f"连接数据库并创建窗口 {times['constructed'] - times['imported']:.3f} 秒, "
+                  f"首次绘制 {times['painted'] - times['constructed']:.3f} 秒, 合计 {total:.3f} 秒")
+
+        median = statistics.median(totals)
+        print(f"启动到首次绘制: 最快 {min(totals):.3f} 秒, 中位数 {median:.3f} 秒, "
+              f"目标 {target:.1f} 秒以内: {'达到' if median <= target else '未达到'}")
+
+
+def _print_slowest_imports(importtime_output, count=10):
+    """输出 -X importtime 结果中累计耗时最长的顶层模块"""
+    entries = []
+    for line in importtime_output.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not line.startswith('import time:'):
+            continue
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2].rstrip()
+        # 只统计顶层导入（缩进最少的模块）
+        if len(name) - len(name.lstrip()) <= 1:
+            entries.append((cumulative, name.strip()))
+    print("导入耗时最长的模块:")
+    for cumulative, name in sorted(entries, reverse=True)[:count]:
+        print(f"  {name}: {cumulative / 1000:.1f} 毫秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库性能基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="员工数据导入")
+    import_parser.add_argument('--rows', type=int, default=20000, help="批量导入的行数")
+    import_parser.add_argument('--legacy-rows', type=int, default=2000,
+                               help="逐行导入的行数（逐行提交很慢，默认取较小规模）")
+
+    predict_parser = subparsers.add_parser('predict', help="部门预测职级计算")
+    predict_parser.add_argument('--employees', type=int, default=5000, help="部门员工人数")
+    predict_parser.add_argument('--items', type=int, default=10, help="考核项目数量")
+
+    search_parser = subparsers.add_parser('search', help="员工搜索（LIKE与全文索引对比）")
+    search_parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                               help="员工表行数，可指定多个规模")
+    search_parser.add_argument('--queries', type=int, default=50, help="每个规模执行的搜索次数")
+    search_parser.add_argument('--limit', type=int, default=100, help="每次搜索最多返回的记录数")
+
+    audit_parser = subparsers.add_parser('audit', help="编辑操作与操作日志写入")
+    audit_parser.add_argument('--edits', type=int, default=2000, help="编辑次数")
+    audit_parser.add_argument('--synchronous', choices=['OFF', 'NORMAL', 'FULL'], default='NORMAL',
+                              help="SQLite同步级别（FULL时每次提交都会刷盘）")
+
+    grading_parser = subparsers.add_parser('grading', help="AUT评定职级计算")
+    grading_parser.add_argument('--employees', type=int, default=100000, help="向量化计算的员工人数")
+    grading_parser.add_argument('--legacy-employees', type=int, default=2000,
+                                help="逐个计算的员工人数（逐个提交很慢，默认取较小规模）")
+
+    startup_parser = subparsers.add_parser('startup', help="应用启动到主窗口首次绘制的时间")
+    startup_parser.add_argument('--runs', type=int, default=5, help="启动次数")
+    startup_parser.add_argument('--employees', type=int, default=10000, help="测试数据库中的员工人数")
+    startup_parser.add_argument('--target', type=float, default=1.0, help="目标启动时间（秒）")
+    startup_parser.add_argument('--importtime', action='store_true', help="输出第一次启动时导入最慢的模块")
+
+    args = parser.parse_args()
+    if args.command == 'import':
+        bench_import(args.rows, args.legacy_rows)
+    elif args.command == 'predict':
+        bench_predict(args.employees, args.items)
+    elif args.command == 'search':
+        bench_search(args.rows, args.queries, args.limit)
+    elif args.command == 'audit':
+        bench_audit(args.edits, args.synchronous)
+    elif args.command == 'grading':
+        bench_grading(args.employees, args.legacy_employees)
+    elif args.command == 'startup':
+        bench_startup(args.runs, args.employees, args.target, args.importtime)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+检查数据库查询计划
+
+对实际执行的查询执行 EXPLAIN QUERY PLAN：语句注册表中的全部语句，
+以及员工列表按常用筛选条件和排序组合出的计数、分页语句。
+列出需要全表扫描的查询和需要对全部结果临时排序的查询。
+用法:
+    python check_query_plans.py [数据库文件] [--verbose]
+"""
+
+import sys
+
+from app.models.database import EmployeeDatabase
+from app.models.min_database import EmployeeDatabase as SkillDatabase
+from app.models.schema import (
+    EXPECTED_FULL_SCANS, REGISTERED_QUERIES, SCHEMA_VERSION, check_query_plans, get_schema_version
+)
+from app.models.score_database import ScoreDatabase
+
+# 员工列表检查的筛选条件：{说明: 筛选条件}
+EMPLOYEE_LIST_FILTERS = {
+    '部门': {'department': '部门'},
+    '状态': {'status': '在职'},
+    '部门和状态': {'department': '部门', 'status': '在职'},
+    '关键词': {'text': '关键词'},
+    '部门和关键词': {'department': '部门', 'text': '关键词'},
+}
+
+# 员工列表检查的排序列
+EMPLOYEE_LIST_SORTS = ['employee_no', 'name']
+
+
+def employee_list_queries(db):
+    """员工列表实际执行的计数和分页语句：{名称: SQL}"""
+    queries = {}
+    for label, filters in EMPLOYEE_LIST_FILTERS.items():
+        for sort_column in EMPLOYEE_LIST_SORTS:
+            count_sql, page_sql, _ = db.employee_list_statements(filters, sort_column)
+            queries[f"employees.list[{label}].count"] = count_sql
+            queries[f"employees.list[{label}].page[{sort_column}]"] = page_sql
+    return queries
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    verbose = '--verbose' in sys.argv
+    db_path = args[0] if args else 'employee_db.sqlite'
+
+    # 通过各数据库类连接，与程序运行时一样创建所需的表、索引和触发器
+    db = EmployeeDatabase(db_path)
+    score_db = ScoreDatabase(db_path)
+    skill_db = SkillDatabase(db_path)
+    try:
+        conn = db.conn
+        print(f"数据库: {db_path}, 结构版本: {get_schema_version(conn)}/{SCHEMA_VERSION}")
+
+        queries = {**REGISTERED_QUERIES, **employee_list_queries(db)}
+
+        flagged = 0
+        sorted_count = 0
+        for name, plan, full_scans, temp_sorts, error in check_query_plans(conn, queries):
+            if error:
+                print(f"[跳过] {name}: {error}")
+                continue
+            if full_scans and name in EXPECTED_FULL_SCANS:
+                if verbose:
+                    print(f"[预期的全表扫描] {name}: {EXPECTED_FULL_SCANS[name]}")
+                full_scans = []
+            elif full_scans:
+                flagged += 1
+                print(f"[全表扫描] {name}: {', '.join(full_scans)}")
+            if temp_sorts:
+                sorted_count += 1
+                print(f"[临时排序] {name}: {', '.join(temp_sorts)}")
+            if not full_scans and not temp_sorts and verbose:
+                print(f"[正常] {name}")
+            if verbose or full_scans:
+                for step in plan:
+                    print(f"    {step}")
+
+        print(f"共 {len(queries)} 个查询，{flagged} 个需要全表扫描，{sorted_count} 个需要临时排序")
+        return 1 if flagged else 0
+    finally:
+        skill_db.close()
+        score_db.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
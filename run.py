@@ -1,7 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from app.main import main
+import argparse
+import sys
+
+from app.utils import profiler
+
+
+def parse_args():
+    """解析启动参数，其余参数留给Qt处理"""
+    parser = argparse.ArgumentParser(description="员工管理系统")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='报告文件',
+                        help=f"开启性能分析，退出时写入报告（也可设置环境变量 {profiler.PROFILE_ENV}=1）")
+    args, qt_args = parser.parse_known_args()
+    sys.argv = sys.argv[:1] + qt_args
+    return args
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile is not None:
+        # 需要在连接数据库之前开启
+        profiler.enable(args.profile or None)
+
+    from app.main import main
     main()